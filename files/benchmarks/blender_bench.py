@@ -0,0 +1,89 @@
+# Benchmarks for the SWC Mesher stages that need Blender, run headless:
+#
+#   blender -b --factory-startup --python files/benchmarks/blender_bench.py -- --sizes 1000,100000 --output blender.json
+#
+# Takes the same options as swc_bench.py (after the "--"), and uses its neuron generator,
+# result format and regression check.
+
+import os
+import sys
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import swc_bench
+
+# swc_bench puts files/source on the path, so the add-on can be registered from the working copy
+import swc_mesher
+
+
+# Import a generated neuron as a cable model and make it the active one in the list
+def import_cable_model(morphology, workdir):
+    fpath = os.path.join(workdir, "neuron_%d.swc" % len(morphology))
+    swc_bench.write_morphology(morphology, fpath)
+    mnm = bpy.context.scene.make_neuron_meta
+    mnm.neuron_file_name = fpath
+    mnm.build_neuron_stick_from_file(bpy.context)
+    mnm.active_object_index = len(mnm.cable_model_list) - 1
+    return mnm
+
+
+def setup_build_neuron_stick(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+    return lambda: mnm.build_neuron_stick_from_file(bpy.context)
+
+
+def setup_read_segments_from_object(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+    return lambda: mnm.read_segments_from_object(bpy.context)
+
+
+def setup_check_duplicate_verts(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+
+    # Forget the last verification so the full check runs every time
+    def check():
+        mnm.get_active_cable_model_entry().verified_fingerprint = ""
+        mnm.check_duplicate_verts(bpy.context)
+    return check
+
+
+def setup_update_cable_model_post_edit(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+    return lambda: mnm.update_cable_model_post_edit(bpy.context)
+
+
+def setup_export_cable_model(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+    fpath = os.path.join(workdir, "export_%d.swc" % len(morphology))
+    return lambda: mnm.export_cable_model(bpy.context, fpath)
+
+
+def setup_make_spheres(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+    return lambda: mnm.make_spheres_from_object(bpy.context)
+
+
+def setup_build_neuron_meta(morphology, workdir):
+    mnm = import_cable_model(morphology, workdir)
+    segments = mnm.read_segments_from_object(bpy.context)
+    return lambda: mnm.build_neuron_meta_from_segments(bpy.context, segments)
+
+
+BLENDER_SCENARIOS = {
+    "build_neuron_stick": setup_build_neuron_stick,
+    "read_segments_from_object": setup_read_segments_from_object,
+    "check_duplicate_verts": setup_check_duplicate_verts,
+    "update_cable_model_post_edit": setup_update_cable_model_post_edit,
+    "export_cable_model": setup_export_cable_model,
+    "make_spheres": setup_make_spheres,
+    "build_neuron_meta": setup_build_neuron_meta,
+}
+
+
+if __name__ == "__main__":
+    swc_mesher.register()
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    exit_code = swc_bench.main(BLENDER_SCENARIOS, "Time the SWC Mesher add-on in headless Blender", argv)
+    swc_mesher.unregister()
+    sys.exit(exit_code)
@@ -0,0 +1,275 @@
+# Benchmarks for the SWC Mesher core.
+#
+# Generates seeded synthetic neurons of the requested sizes, times each processing stage
+# on them, stores the timings as JSON and flags regressions against a saved baseline:
+#
+#   python files/benchmarks/swc_bench.py --sizes 1000,100000 --output results.json
+#   python files/benchmarks/swc_bench.py --sizes 1000,100000 --baseline baseline.json
+#
+# The stages that need Blender are timed by blender_bench.py, which uses the same
+# generator, result format and regression check.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source"))
+from swc_mesher import core
+
+
+#######################################################
+#######################################################
+# Synthetic morphologies
+#######################################################
+#######################################################
+
+# Generate a branching neuron with num_nodes nodes (including a one-node soma).
+# Sections grow as persistent random walks of about mean_section_nodes nodes spaced node_spacing apart;
+# at the end of a section the process splits in two with probability branch_probability, and the
+# child radii follow Rall's rule r_child = r_parent * 2^(-1/rall_exponent).
+# Whenever every process has ended and nodes remain, a new stem leaves the soma.
+def generate_morphology(num_nodes, seed=0, num_stems=6, mean_section_nodes=30, branch_probability=0.9,
+                        node_spacing=1.0, tortuosity=0.15, soma_radius=8.0, stem_radius=1.5,
+                        taper=0.002, rall_exponent=1.5, min_radius=0.1, axon_stems=1):
+    rng = np.random.default_rng(seed)
+
+    co = np.zeros((num_nodes, 3))
+    radius = np.zeros(num_nodes)
+    parent = np.full(num_nodes, -1, dtype=np.int64)
+    segment_type = np.full(num_nodes, 3, dtype=np.int32)
+
+    # The soma
+    radius[0] = soma_radius
+    segment_type[0] = 1
+    n = 1
+
+    def random_direction():
+        d = rng.normal(size=3)
+        return d / np.linalg.norm(d)
+
+    def new_stem(i_stem):
+        d = random_direction()
+        return (0, d * soma_radius, d, stem_radius, 2 if i_stem < axon_stems else 3)
+
+    # Sections waiting to grow: (parent row, start point, direction, radius, type)
+    sections = deque(new_stem(i) for i in range(num_stems))
+    num_stems_made = num_stems
+
+    while n < num_nodes:
+        if len(sections) == 0:
+            sections.append(new_stem(num_stems_made))
+            num_stems_made += 1
+        parent_row, start, direction, r0, seg_type = sections.popleft()
+
+        # Grow the section as a persistent random walk
+        k = min(max(1, int(rng.geometric(1.0 / mean_section_nodes))), num_nodes - n)
+        steps = direction + np.cumsum(rng.normal(scale=tortuosity, size=(k, 3)), axis=0)
+        steps /= np.linalg.norm(steps, axis=1)[:, None]
+        rows = np.arange(n, n + k)
+        co[rows] = start + np.cumsum(steps * node_spacing, axis=0)
+        radius[rows] = np.maximum(r0 * (1 - taper * np.arange(1, k + 1)), min_radius)
+        parent[rows] = np.r_[parent_row, rows[:-1]]
+        segment_type[rows] = seg_type
+        n += k
+
+        # Split the end of the section in two
+        if rng.random() < branch_probability:
+            r_child = max(radius[rows[-1]] * 2 ** (-1.0 / rall_exponent), min_radius)
+            for i in range(2):
+                d = steps[-1] + random_direction() * 0.8
+                sections.append((rows[-1], co[rows[-1]], d / np.linalg.norm(d), r_child, seg_type))
+
+    index_number = np.arange(1, num_nodes + 1)
+    parent_index = np.where(parent >= 0, parent + 1, -1)
+    return core.Morphology(index_number, segment_type, co, radius, parent_index)
+
+
+# Write a generated morphology to an SWC file
+def write_morphology(morphology, fpath):
+    core.write_swc(fpath, morphology.index_number, morphology.segment_type, morphology.co,
+                   morphology.radius, morphology.parent_index)
+
+
+#######################################################
+#######################################################
+# Timing, results and regressions
+#######################################################
+#######################################################
+
+# Time func() and return the best of repeat runs in seconds
+def best_time(func, repeat):
+    best = None
+    for i in range(repeat):
+        t = time.perf_counter()
+        func()
+        t = time.perf_counter() - t
+        if best is None or t < best:
+            best = t
+    return best
+
+
+# Describe the machine the benchmarks ran on
+def run_info():
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor()}
+
+
+# Time every scenario at every size. scenarios maps a name to setup(morphology, workdir) -> func
+def run_scenarios(scenarios, sizes, repeat=3, seed=0, info=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for num_nodes in sizes:
+            morphology = generate_morphology(num_nodes, seed=seed)
+            for name, setup in scenarios.items():
+                func = setup(morphology, workdir)
+                seconds = best_time(func, repeat)
+                key = "%s@%d" % (name, num_nodes)
+                results[key] = {"scenario": name, "num_nodes": num_nodes, "seconds": seconds, "repeat": repeat}
+                print("%-40s %10.4f s" % (key, seconds))
+    return {"info": dict(run_info(), **(info or {})), "results": results}
+
+
+# Compare results against a baseline; returns a list of (key, baseline seconds, current seconds)
+# for every scenario that got slower by more than threshold (a fraction, 0.25 = 25%) and by more
+# than min_delta seconds (so timer noise on tiny inputs is not reported)
+def find_regressions(current, baseline, threshold, min_delta=0.005):
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is not None and result["seconds"] > base["seconds"] * (1 + threshold) and result["seconds"] - base["seconds"] > min_delta:
+            regressions.append((key, base["seconds"], result["seconds"]))
+    return regressions
+
+
+# Save the results, compare with the baseline and return the process exit code
+def report(current, output=None, baseline=None, threshold=0.25, save_baseline=False, min_delta=0.005):
+    if output:
+        with open(output, "w") as f:
+            json.dump(current, f, indent=2)
+        print("Results written to " + output)
+
+    if baseline is None:
+        return 0
+
+    if save_baseline or not os.path.exists(baseline):
+        with open(baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print("Baseline written to " + baseline)
+        return 0
+
+    with open(baseline) as f:
+        regressions = find_regressions(current, json.load(f), threshold, min_delta)
+    for key, base_seconds, seconds in regressions:
+        print("REGRESSION %s: %.4f s -> %.4f s (%+.0f%%)" % (key, base_seconds, seconds, 100 * (seconds / base_seconds - 1)))
+    if len(regressions) == 0:
+        print("No regressions above %.0f%% against %s" % (100 * threshold, baseline))
+    return 1 if len(regressions) > 0 else 0
+
+
+# Command line options shared by the benchmark runners
+def argument_parser(description, scenario_names):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Comma separated numbers of nodes of the generated neurons (default: %(default)s)")
+    parser.add_argument("--scenarios", default=",".join(scenario_names),
+                        help="Comma separated scenarios to run (default: all of %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the best is kept (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the neuron generator (default: %(default)s)")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="Baseline JSON file to compare against (written if it does not exist)")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown (fraction) above which a scenario is a regression (default: %(default)s)")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="Slowdowns of fewer seconds than this are never regressions (default: %(default)s)")
+    return parser
+
+
+# Parse the command line and run the selected scenarios
+def main(scenarios, description, argv=None):
+    args = argument_parser(description, list(scenarios)).parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    selected = {name: scenarios[name] for name in args.scenarios.split(",") if name}
+    current = run_scenarios(selected, sizes, args.repeat, args.seed)
+    return report(current, args.output, args.baseline, args.threshold, args.save_baseline, args.min_delta)
+
+
+#######################################################
+#######################################################
+# Core scenarios
+#######################################################
+#######################################################
+
+def setup_read_segments(morphology, workdir):
+    fpath = os.path.join(workdir, "neuron_%d.swc" % len(morphology))
+    write_morphology(morphology, fpath)
+    return lambda: core.read_segments(fpath)
+
+
+def setup_analyze_segments(morphology, workdir):
+    segments = morphology.segments()
+    return lambda: core.analyze_segments(segments)
+
+
+def setup_metaball_samples(morphology, workdir):
+    segments = morphology.segments()
+    return lambda: core.metaball_samples_from_segments(segments)
+
+
+def setup_renumber(morphology, workdir):
+    # Renumber the cable model as stored in a mesh whose vertices were shuffled by edits
+    order = np.random.default_rng(0).permutation(len(morphology))
+    rank = np.argsort(order)
+    edges = rank[morphology.edges()]
+    return lambda: core.renumber_cable_model(len(morphology), edges, morphology.index_number[order],
+                                             morphology.parent_index[order], morphology.segment_type[order])
+
+
+def setup_follow_links(morphology, workdir):
+    parent = morphology.parent_rows()
+    # Check that a cycle at the end of the tree is caught whatever its length, as pointer
+    # doubling comes to rest on cycles whose length is a power of two
+    for length in (1, 2, 3, 4):
+        cyclic = parent.copy()
+        tail = np.arange(len(parent) - length, len(parent))
+        cyclic[tail] = np.roll(tail, -1)
+        try:
+            core.follow_links(cyclic)
+        except ValueError:
+            continue
+        raise AssertionError("follow_links missed a cycle of length %d" % length)
+    return lambda: core.follow_links(parent)
+
+
+def setup_export_swc(morphology, workdir):
+    fpath = os.path.join(workdir, "export_%d.swc" % len(morphology))
+    mat = np.diag([2.0, 2.0, 2.0, 1.0])
+
+    def export():
+        core.write_swc(fpath, morphology.index_number, morphology.segment_type,
+                       core.transform_points(mat, morphology.co), morphology.radius, morphology.parent_index)
+    return export
+
+
+CORE_SCENARIOS = {
+    "read_segments": setup_read_segments,
+    "analyze_segments": setup_analyze_segments,
+    "metaball_samples": setup_metaball_samples,
+    "renumber": setup_renumber,
+    "follow_links": setup_follow_links,
+    "export_swc": setup_export_swc,
+}
+
+
+if __name__ == "__main__":
+    sys.exit(main(CORE_SCENARIOS, "Time the SWC Mesher core on synthetic neurons"))
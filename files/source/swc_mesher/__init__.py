@@ -0,0 +1,30 @@
+bl_info = {
+    "name": "SWC Mesher",
+    "author": "Bob Kuczewski, Oliver Ernst, Kadir Simsek",
+    "version": (1, 0, 1),
+    "blender": (3, 6, 0),
+    "location": "View 3D > Edit Mode > Tool Shelf",
+    "description": "Generate a Neuron Mesh from an SWC formatted file",
+    "warning": "",
+    "wiki_url": "http://salk.edu",
+    "tracker_url": "",
+    "category": "Add Mesh",
+}
+
+# The Blender side of the add-on (panel, operators and properties) is in addon.py.
+# It is only imported on registration, so the bpy-free core (swc_mesher.core)
+# can also be imported from a normal Python process.
+
+if "addon" in locals():
+    import importlib
+    importlib.reload(core)
+    importlib.reload(addon)
+
+
+def register():
+    from . import addon
+    addon.register()
+
+def unregister():
+    from . import addon
+    addon.unregister()
@@ -0,0 +1,3181 @@
+import math
+import mathutils
+from mathutils.bvhtree import BVHTree
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+import bpy
+from bpy.props import *
+import bmesh
+from bpy_extras.io_utils import ExportHelper
+from rna_prop_ui import PropertyPanel
+
+from . import core
+
+
+#######################################################
+#######################################################
+# Cable model vertex metadata
+#######################################################
+#######################################################
+
+# Per-vertex metadata stored on a cable model mesh as generic attributes.
+# Ids, parents and types are integers so they stay exact above 2^24.
+CABLE_MODEL_ATTRIBUTES = (
+    ("index_number", 'INT'),
+    ("parent_index", 'INT'),
+    ("segment_type", 'INT'),
+    ("radius", 'FLOAT'),
+)
+
+# NumPy buffer types matching the attribute types for foreach_get/foreach_set
+ATTRIBUTE_DTYPES = {'INT': np.int32, 'FLOAT': np.float32}
+
+
+# Check if a mesh carries the cable model metadata (either as attributes or as legacy float layers)
+def is_cable_model_mesh(mesh):
+    return all(name in mesh.attributes for name, data_type in CABLE_MODEL_ATTRIBUTES)
+
+
+# Create the cable model attributes, migrating legacy float layers to their typed attributes
+def ensure_cable_model_attributes(mesh):
+    n_v = len(mesh.vertices)
+    for name, data_type in CABLE_MODEL_ATTRIBUTES:
+        attr = mesh.attributes.get(name)
+        if attr is not None and attr.data_type == data_type and attr.domain == 'POINT':
+            continue
+
+        # Keep the old values (if any) so they can be copied into the new attribute
+        values = None
+        if attr is not None:
+            if attr.domain == 'POINT' and attr.data_type in ATTRIBUTE_DTYPES:
+                values = np.empty(n_v, dtype=ATTRIBUTE_DTYPES[attr.data_type])
+                attr.data.foreach_get("value", values)
+            print("Migrating cable model layer " + name + " to a " + data_type + " attribute")
+            mesh.attributes.remove(attr)
+
+        attr = mesh.attributes.new(name=name, type=data_type, domain='POINT')
+        if values is not None:
+            if data_type == 'INT':
+                values = np.rint(values)
+            attr.data.foreach_set("value", values.astype(ATTRIBUTE_DTYPES[data_type]))
+
+
+# Read one cable model attribute into a NumPy array
+def read_cable_model_attribute(mesh, name):
+    attr = mesh.attributes[name]
+    values = np.empty(len(mesh.vertices), dtype=ATTRIBUTE_DTYPES[attr.data_type])
+    attr.data.foreach_get("value", values)
+    return values
+
+
+# Write one cable model attribute from an array
+def write_cable_model_attribute(mesh, name, values):
+    attr = mesh.attributes[name]
+    attr.data.foreach_set("value", np.ascontiguousarray(values, dtype=ATTRIBUTE_DTYPES[attr.data_type]))
+
+
+# Read all cable model metadata: index numbers, parent indexes, segment types and radii
+def read_cable_model_attributes(mesh):
+    return tuple(read_cable_model_attribute(mesh, name) for name, data_type in CABLE_MODEL_ATTRIBUTES)
+
+
+# Write all cable model metadata in the same order as read_cable_model_attributes
+def write_cable_model_attributes(mesh, index_number, parent_index, segment_type, radius):
+    for (name, data_type), values in zip(CABLE_MODEL_ATTRIBUTES, (index_number, parent_index, segment_type, radius)):
+        write_cable_model_attribute(mesh, name, values)
+
+
+# Read the (local) vertex coordinates as an (n, 3) array
+def read_vertex_coords(mesh):
+    co = np.empty(3 * len(mesh.vertices), dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+
+# Write the (local) vertex coordinates from an (n, 3) array
+def write_vertex_coords(mesh, co):
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(co, dtype=np.float32).ravel())
+
+
+# Read the edges as an (m, 2) array of vertex numbers
+def read_edge_vertices(mesh):
+    ev = np.empty(2 * len(mesh.edges), dtype=np.int32)
+    mesh.edges.foreach_get("vertices", ev)
+    return ev.reshape(-1, 2)
+
+
+# Read a cable model mesh into a core.Morphology, with one row per vertex
+def read_cable_model_morphology(mesh):
+    index_number, parent_index, segment_type, radius = read_cable_model_attributes(mesh)
+    return core.Morphology(index_number, segment_type, read_vertex_coords(mesh), radius, parent_index)
+
+
+# Read the vertex selection as a boolean array
+def read_vertex_selection(mesh):
+    select = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get("select", select)
+    return select
+
+
+# Select exactly the given vertices, and the edges between them
+def write_vertex_selection(mesh, select):
+    select = np.ascontiguousarray(select, dtype=bool)
+    mesh.vertices.foreach_set("select", select)
+    mesh.edges.foreach_set("select", select[read_edge_vertices(mesh)].all(axis=1))
+
+
+# Cheap fingerprint of the topology and ids of a cable model.
+# Any extrusion, deletion, merge or renumbering changes it; moving vertices does not.
+def cable_model_fingerprint(mesh):
+    crc = zlib.crc32(read_edge_vertices(mesh).tobytes())
+    crc = zlib.crc32(read_cable_model_attribute(mesh, "index_number").tobytes(), crc)
+    crc = zlib.crc32(read_cable_model_attribute(mesh, "parent_index").tobytes(), crc)
+    return "%d:%d:%08x" % (len(mesh.vertices), len(mesh.edges), crc)
+
+
+# Build a new cable model mesh in bulk from coordinate, edge and metadata arrays
+def new_cable_model_mesh(mesh_name, co, edges, index_number, parent_index, segment_type, radius):
+    mesh = bpy.data.meshes.new(mesh_name)
+    fill_cable_model_mesh(mesh, co, edges, index_number, parent_index, segment_type, radius)
+    return mesh
+
+
+# Fill an empty mesh with a cable model in bulk
+def fill_cable_model_mesh(mesh, co, edges, index_number, parent_index, segment_type, radius):
+    mesh.vertices.add(len(co))
+    write_vertex_coords(mesh, co)
+    mesh.edges.add(len(edges))
+    mesh.edges.foreach_set("vertices", np.ascontiguousarray(edges, dtype=np.int32).ravel())
+    mesh.update()
+    ensure_cable_model_attributes(mesh)
+    write_cable_model_attributes(mesh, index_number, parent_index, segment_type, radius)
+
+
+# Run a block with the cable model out of Edit Mode, so its mesh data is current, and go back to Edit Mode after
+@contextmanager
+def out_of_edit_mode(context, ob):
+    was_editing = ob.mode == 'EDIT'
+    if was_editing:
+        context.view_layer.objects.active = ob
+        bpy.ops.object.mode_set(mode='OBJECT')
+    try:
+        yield
+    finally:
+        if was_editing:
+            bpy.ops.object.mode_set(mode='EDIT')
+
+
+#######################################################
+#######################################################
+# Cable displays
+#######################################################
+#######################################################
+
+# A cable display is a light stand-in for a large cable model: a curve with a poly spline for each section,
+# its thickness drawn by a bevel scaled by the radius of each point. The whole morphology is kept on the
+# curve as ID property arrays named with this prefix, so any region converts back to a cable model exactly.
+CABLE_DISPLAY_PREFIX = "swc_"
+CABLE_DISPLAY_ARRAYS = ("index_number", "segment_type", "co", "radius", "parent_index")
+
+
+# Check if an object is a cable display
+def is_cable_display(ob):
+    return ob is not None and ob.type == 'CURVE' and CABLE_DISPLAY_PREFIX + "index_number" in ob.data
+
+
+# Read the morphology kept on a cable display curve
+def read_cable_display_morphology(curve):
+    return core.Morphology(*(np.array(curve[CABLE_DISPLAY_PREFIX + name].to_list()) for name in CABLE_DISPLAY_ARRAYS))
+
+
+# Build a cable display curve from a morphology: one poly spline per section (headed by the node it hangs from)
+def new_cable_display_curve(curve_name, morphology):
+    curve = bpy.data.curves.new(curve_name, 'CURVE')
+    curve.dimensions = '3D'
+    curve.fill_mode = 'FULL'
+    curve.bevel_depth = 1.0
+    curve.bevel_resolution = 0
+
+    chain_rows, chain_offsets = core.section_chains(morphology.topology())[:2]
+    chain_ends = np.r_[chain_offsets[1:], len(chain_rows)]
+    points = np.column_stack((morphology.co[chain_rows], np.ones(len(chain_rows)))).astype(np.float32)
+    radius = np.maximum(morphology.radius[chain_rows], 0).astype(np.float32)
+    for a, b in zip(chain_offsets.tolist(), chain_ends.tolist()):
+        # A lone root has no length to draw
+        if b - a < 2:
+            continue
+        spline = curve.splines.new('POLY')
+        spline.points.add(b - a - 1)
+        spline.points.foreach_set("co", points[a:b].ravel())
+        spline.points.foreach_set("radius", radius[a:b])
+
+    for name in CABLE_DISPLAY_ARRAYS:
+        curve[CABLE_DISPLAY_PREFIX + name] = getattr(morphology, name).ravel().tolist()
+    return curve
+
+
+#######################################################
+#######################################################
+# Cable model regions
+#######################################################
+#######################################################
+
+# A region is a small cable model taken out of a large one to be edited on its own. Its nodes keep their ids,
+# and its mesh keeps, as ID properties, the ids it was taken with and the first id free in the large model.
+REGION_IDS_PROPERTY = "swc_region_ids"
+REGION_NEXT_ID_PROPERTY = "swc_region_next_id"
+
+
+#######################################################
+#######################################################
+# Surface mesh export
+#######################################################
+#######################################################
+
+# Read the (local) vertex coordinates of a mesh and its faces split into triangles:
+# returns an (n, 3) array of vertex positions and an (m, 3) array of vertex numbers
+def read_mesh_triangles(mesh):
+    mesh.calc_loop_triangles()
+    triangles = np.empty(3 * len(mesh.loop_triangles), dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", triangles)
+    return read_vertex_coords(mesh), triangles.reshape(-1, 3)
+
+
+# Replace the geometry of a mesh with vertices at co and the triangles between them, in bulk
+def write_mesh_triangles(mesh, co, triangles):
+    mesh.clear_geometry()
+    mesh.vertices.add(len(co))
+    mesh.loops.add(3 * len(triangles))
+    mesh.polygons.add(len(triangles))
+    write_vertex_coords(mesh, co)
+    mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(triangles, dtype=np.int32).ravel())
+    mesh.polygons.foreach_set("loop_start", np.arange(0, 3 * len(triangles), 3, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(triangles), 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+
+# Read the triangles of the evaluated mesh of an object (a mesh with its modifiers, or a meta object's surface)
+# in world coordinates: returns an (n, 3) array of vertex positions and an (m, 3) array of vertex numbers
+def read_surface_triangles(context, ob):
+    ob_eval = ob.evaluated_get(context.evaluated_depsgraph_get())
+    mesh = ob_eval.to_mesh()
+    try:
+        co, triangles = read_mesh_triangles(mesh)
+        co = core.transform_points(ob.matrix_world, co)
+    finally:
+        ob_eval.to_mesh_clear()
+    return co, triangles
+
+
+# Write the surface of a mesh or meta object to a binary PLY, binary STL, OBJ or MCell MDL file, chosen by
+# the suffix of the file name. Returns the numbers of vertices and triangles written. From a script:
+#   addon.export_surface_mesh(bpy.context, bpy.data.objects["Neuron"], "/tmp/neuron.ply")
+def export_surface_mesh(context, ob, fpath):
+    co, triangles = read_surface_triangles(context, ob)
+    print("Writing %d vertices and %d triangles to %s" % (len(co), len(triangles), fpath))
+    core.write_mesh(fpath, co, triangles, ob.name)
+    return len(co), len(triangles)
+
+
+#######################################################
+#######################################################
+# Surface mesh quality
+#######################################################
+#######################################################
+
+# Check the surface of a mesh or meta object for holes, non-manifold and flipped edges, degenerate triangles
+# and shells smaller than min_shell_size, and compare its area and volume with the cable estimates (if given,
+# in world units). Returns the dict of core.mesh_quality and its description in lines. From a script:
+#   quality, lines = addon.check_surface_mesh(bpy.context, bpy.data.objects["Neuron"], 0.1)
+def check_surface_mesh(context, ob, min_shell_size=0.0, cable_area=None, cable_volume=None):
+    co, triangles = read_surface_triangles(context, ob)
+    quality = core.mesh_quality(co, triangles, min_shell_size)
+    lines = core.describe_mesh_quality(quality, cable_area, cable_volume)
+    for line in lines:
+        print("Mesh check %s: %s" % (ob.name, line))
+    return quality, lines
+
+
+#######################################################
+#######################################################
+# Contacts between surfaces
+#######################################################
+#######################################################
+
+# Find where the surfaces of mesh or meta objects cross or come closer than gap, with BVH trees of their
+# world space triangles: crossing triangles come from BVHTree.overlap, and near contacts from the nearest
+# point of the other surface to each vertex of either one (only the vertices that core.points_near_surface
+# cannot rule out in one batched query are looked up).
+# Returns a list of (name a, name b, gap, location) with gap 0 where the surfaces cross, closest first.
+def find_surface_contacts(context, objects, gap):
+    surfaces = []
+    for ob in objects:
+        co, triangles = read_surface_triangles(context, ob)
+        surfaces.append((ob.name, co, triangles, BVHTree.FromPolygons(co.tolist(), triangles.tolist())))
+
+    contacts = []
+    for i_a, (name_a, co_a, triangles_a, tree_a) in enumerate(surfaces):
+        for name_b, co_b, triangles_b, tree_b in surfaces[i_a + 1:]:
+            # Skip surfaces whose bounds are farther apart than the gap
+            if len(co_a) == 0 or len(co_b) == 0 or (co_a.min(axis=0) - gap > co_b.max(axis=0)).any() or (co_b.min(axis=0) - gap > co_a.max(axis=0)).any():
+                continue
+
+            for t_a, t_b in tree_a.overlap(tree_b):
+                contacts.append((name_a, name_b, 0.0, tuple(co_a[triangles_a[t_a]].mean(axis=0))))
+
+            for co, tree, other_co, other_triangles in ((co_a, tree_b, co_b, triangles_b), (co_b, tree_a, co_a, triangles_a)):
+                near = core.points_near_surface(co, other_co, other_triangles, gap)
+                for v in co[near].tolist():
+                    location, normal, index, distance = tree.find_nearest(v, gap)
+                    if location is not None:
+                        contacts.append((name_a, name_b, distance, tuple(0.5 * (np.array(v) + np.array(location)))))
+
+    contacts.sort(key=lambda contact: contact[2])
+    return contacts
+
+
+#######################################################
+#######################################################
+# Node spatial index
+#######################################################
+#######################################################
+
+# Spatial index of the vertices of each cable model, keyed by object name
+node_index_cache = {}
+
+
+# Get the spatial index of a cable model's vertices, rebuilt only when the vertices moved or changed
+def get_node_index(ob):
+    co = read_vertex_coords(ob.data)
+    index = node_index_cache.get(ob.name)
+    if index is None or index.co.shape != co.shape or not np.array_equal(index.co, co):
+        index = core.NodeIndex(co)
+        node_index_cache[ob.name] = index
+    return index
+
+
+#######################################################
+#######################################################
+# Cable model topology
+#######################################################
+#######################################################
+
+# Topology index of each cable model with the key of the state it was built from, keyed by object name
+topology_cache = {}
+
+
+# Get the topology index (core.Topology, one row per vertex) of a cable model.
+# It is rebuilt only after an edit changed the topology, ids or positions.
+def get_cable_model_topology(ob):
+    mesh = ob.data
+    key = (cable_model_fingerprint(mesh), zlib.crc32(read_vertex_coords(mesh).tobytes()))
+    cached = topology_cache.get(ob.name)
+    if cached is None or cached[0] != key:
+        cached = (key, read_cable_model_morphology(mesh).topology())
+        topology_cache[ob.name] = cached
+    return cached[1]
+
+
+# Drop the cached indexes of a cable model
+def invalidate_cable_model_caches(ob_name):
+    node_index_cache.pop(ob_name, None)
+    topology_cache.pop(ob_name, None)
+
+
+#######################################################
+#######################################################
+# Repairing morphologies
+#######################################################
+#######################################################
+
+# Repair a morphology as set (see core.repair_morphology). Renumbering needs a tree, so when cycles are left in the
+# parent links (rerooting is off), the other repairs are done without it and a note says why.
+# Returns the repaired Morphology, the repairs done and the notes. It only calls the core, so it can run in worker threads.
+def repair_morphology(morphology, renumber=False, reroot=False, min_radius=None):
+    try:
+        morphology, repairs = core.repair_morphology(morphology, renumber=renumber, reroot=reroot, min_radius=min_radius)
+        return morphology, repairs, []
+    except ValueError as error:
+        if not renumber:
+            raise
+        morphology, repairs = core.repair_morphology(morphology, reroot=reroot, min_radius=min_radius)
+        return morphology, repairs, ["Not renumbered: " + str(error) + " Turn on Reroot to cut the cycles."]
+
+
+#######################################################
+#######################################################
+# Compact undo
+#######################################################
+#######################################################
+
+# Steps kept in the compact undo history (the oldest are dropped first)
+COMPACT_UNDO_STEPS = 32
+
+# The compact undo history of large data mode, newest last. It only holds steps of the file open now, so it is
+# cleared whenever a file is opened or a new one made. Each step is a dict with:
+#   message       what the step did
+#   objects       (name, session_uid) of the objects it made, removed on undo
+#   collections   (name, session_uid) of the collections it made, removed on undo once empty
+#   changes       one dict per cable model it changed in place, with its name, session_uid, fingerprint after the step, whether
+#                 it had vertex spheres before, and either delta (a core.morphology_delta back to before) or
+#                 morphology and edges (all of before)
+#   removed       one dict per cable model it removed, with its morphology and edges and the cable_model_placement
+#                 of it, made again on undo
+#   surfaces      one dict per surface mesh it changed in place, with its name, session_uid, its vertex and triangle counts
+#                 after the step, and its vertices and triangles before
+#   selections    one dict per cable model whose vertex selection it changed, with its name, session_uid and the
+#                 selection before as a bool array
+compact_undo_history = []
+
+
+# Read the morphology and the edges of a cable model as they are, out of Edit Mode
+def read_cable_model_snapshot(context, ob):
+    with out_of_edit_mode(context, ob):
+        return read_cable_model_morphology(ob.data), read_edge_vertices(ob.data)
+
+
+# Check that the edges of a cable model are exactly those of its parent links, so they can be made again from them
+def edges_follow_parents(morphology, edges):
+    n = len(morphology)
+    keys = np.sort(np.sort(np.asarray(edges, dtype=np.int64), axis=1) @ np.array([n, 1]))
+    parent_keys = np.sort(np.sort(morphology.edges(), axis=1) @ np.array([n, 1]))
+    return np.array_equal(keys, parent_keys)
+
+
+# Note how a cable model changed from before (its morphology and edges) to now: only the nodes that changed when
+# the ids are unique and the edges follow the parent links, else all of before
+def cable_model_change(context, ob, before, before_edges):
+    after, after_edges = read_cable_model_snapshot(context, ob)
+    change = {"name": ob.name, "session_uid": ob.session_uid, "fingerprint": cable_model_fingerprint(ob.data)}
+    delta = core.morphology_delta(before, after) if edges_follow_parents(before, before_edges) else None
+    if delta is not None:
+        change["delta"] = delta
+    else:
+        change["morphology"], change["edges"] = before, before_edges
+    return change
+
+
+# Note what it takes besides its nodes and edges to make a cable model again once it is removed: its name,
+# transform, collections, mesh properties (such as the ids of a region) and list entry
+def cable_model_placement(ob, entry):
+    return {"name": ob.name,
+            "matrix_world": ob.matrix_world.copy(),
+            "collections": [collection.name for collection in ob.users_collection],
+            "properties": {key: value.to_list() if hasattr(value, "to_list") else value for key, value in ob.data.items()},
+            "entry": None if entry is None else {key: getattr(entry, key) for key in ("region_of", "source_file", "source_mtime", "batch_selected")}}
+
+
+# Run a bulk operation as one undo step. Normally the operator's UNDO option makes that a step of Blender's global
+# undo, which keeps a copy of the changed data. In large data mode the bulk operators lose that option (see
+# set_global_undo) and the step goes into the compact undo history instead: the cable models in objects are
+# compared before and after (or kept whole if the step removes them), the meshes of the surface objects in surfaces
+# are kept as arrays, the vertex selections of the objects in selections are kept as masks, and the objects and
+# collections made are noted by name.
+@contextmanager
+def compact_undo_step(context, message, objects=(), surfaces=(), selections=()):
+    mnm = context.scene.make_neuron_meta
+    if not get_preferences().compact_undo:
+        yield
+        return
+
+    objects_before = set(ob.session_uid for ob in bpy.data.objects)
+    collections_before = set(collection.session_uid for collection in bpy.data.collections)
+    before = []
+    for ob in objects:
+        entry = mnm.cable_model_list.get(ob.name)
+        had_spheres = entry is not None and entry.spheres_object is not None
+        before.append((ob.name, read_cable_model_snapshot(context, ob), had_spheres, cable_model_placement(ob, entry)))
+    surfaces_before = []
+    for ob in surfaces:
+        with out_of_edit_mode(context, ob):
+            surfaces_before.append((ob.name, read_mesh_triangles(ob.data)))
+    selections_before = []
+    for ob in selections:
+        with out_of_edit_mode(context, ob):
+            selections_before.append((ob.name, ob.session_uid, read_vertex_selection(ob.data)))
+    yield
+
+    changes, removed = [], []
+    for name, (morphology, edges), had_spheres, placement in before:
+        if name in bpy.data.objects:
+            change = cable_model_change(context, bpy.data.objects[name], morphology, edges)
+            change["spheres"] = had_spheres
+            changes.append(change)
+        else:
+            removed.append(dict(placement, morphology=morphology, edges=edges, spheres=had_spheres))
+    surface_changes = []
+    for name, (co, triangles) in surfaces_before:
+        if name in bpy.data.objects:
+            mesh = bpy.data.objects[name].data
+            surface_changes.append({"name": name, "session_uid": bpy.data.objects[name].session_uid,
+                                    "counts": (len(mesh.vertices), len(mesh.polygons)),
+                                    "co": co, "triangles": triangles})
+    selection_changes = []
+    for name, session_uid, select in selections_before:
+        ob = bpy.data.objects.get(name)
+        if ob is not None and ob.session_uid == session_uid:
+            with out_of_edit_mode(context, ob):
+                if not np.array_equal(read_vertex_selection(ob.data), select):
+                    selection_changes.append({"name": name, "session_uid": session_uid, "select": select})
+    step = {"message": message,
+            "objects": [(ob.name, ob.session_uid) for ob in bpy.data.objects if ob.session_uid not in objects_before],
+            "collections": [(collection.name, collection.session_uid) for collection in bpy.data.collections
+                            if collection.session_uid not in collections_before],
+            "changes": changes,
+            "removed": removed,
+            "surfaces": surface_changes,
+            "selections": selection_changes}
+
+    # Steps with nothing to take back are not recorded
+    if any(len(step[key]) > 0 for key in ("objects", "collections", "changes", "removed", "surfaces", "selections")):
+        compact_undo_history.append(step)
+        del compact_undo_history[:-COMPACT_UNDO_STEPS]
+
+
+# Give the bulk operators (COMPACT_UNDO_OPERATORS) Blender's UNDO option, or take it away in large data mode.
+# The option is read when an operator class is registered, so the classes whose option changes are registered again.
+# This is safe from the update of the large data mode setting: that runs from the panel or the preferences, never
+# from inside one of these operators, it does not touch the preferences class that owns the setting, and buttons
+# look operators up by idname as they are drawn, so they find the class registered again.
+def set_global_undo(global_undo):
+    for cls in COMPACT_UNDO_OPERATORS:
+        options = (set(cls.bl_options) | {"UNDO"}) if global_undo else (set(cls.bl_options) - {"UNDO"})
+        if options != set(cls.bl_options):
+            bpy.utils.unregister_class(cls)
+            cls.bl_options = options
+            bpy.utils.register_class(cls)
+
+
+# Move the bulk operators out of global undo when large data mode is turned on, and back when it is turned off
+def compact_undo_change(self, context):
+    set_global_undo(not self.compact_undo)
+
+
+# Forget the compact undo history of the previous file when a file is opened or a new one made (its steps name
+# objects of that file)
+@bpy.app.handlers.persistent
+def compact_undo_load_post(*args):
+    compact_undo_history.clear()
+
+
+# Remove an object, and its data when nothing else uses it
+def remove_object_and_data(ob):
+    data, blocks = ob.data, {'MESH': bpy.data.meshes, 'META': bpy.data.metaballs, 'CURVE': bpy.data.curves}.get(ob.type)
+    bpy.data.objects.remove(ob)
+    if blocks is not None and data.users == 0:
+        blocks.remove(data)
+
+
+#######################################################
+#######################################################
+# Vertex spheres
+#######################################################
+#######################################################
+
+# Name of the shared geometry nodes group that draws the vertex spheres
+VERTEX_SPHERES_NODE_GROUP = "SWC Mesher Vertex Spheres"
+
+
+# Name of the vertex spheres collection and object of a cable model
+def vertex_spheres_name(ob_name):
+    return ob_name + "_vertex_spheres"
+
+
+# Get (or make) the node group instancing a unit sphere on every vertex, scaled by the "radius" attribute
+def get_vertex_spheres_node_group():
+    node_group = bpy.data.node_groups.get(VERTEX_SPHERES_NODE_GROUP)
+    if node_group is not None:
+        return node_group
+
+    node_group = bpy.data.node_groups.new(VERTEX_SPHERES_NODE_GROUP, 'GeometryNodeTree')
+    node_group.inputs.new('NodeSocketGeometry', "Geometry")
+    node_group.outputs.new('NodeSocketGeometry', "Geometry")
+    nodes = node_group.nodes
+    links = node_group.links
+
+    group_in = nodes.new('NodeGroupInput')
+    group_out = nodes.new('NodeGroupOutput')
+
+    # The one sphere shared by all instances
+    sphere = nodes.new('GeometryNodeMeshUVSphere')
+    sphere.inputs["Segments"].default_value = 16
+    sphere.inputs["Rings"].default_value = 8
+    sphere.inputs["Radius"].default_value = 1.0
+
+    # Per vertex radius
+    radius = nodes.new('GeometryNodeInputNamedAttribute')
+    radius.data_type = 'FLOAT'
+    radius.inputs["Name"].default_value = "radius"
+    radius_out = [s for s in radius.outputs if s.enabled][0]
+
+    instance = nodes.new('GeometryNodeInstanceOnPoints')
+    links.new(group_in.outputs["Geometry"], instance.inputs["Points"])
+    links.new(sphere.outputs["Mesh"], instance.inputs["Instance"])
+    links.new(radius_out, instance.inputs["Scale"])
+    links.new(instance.outputs["Instances"], group_out.inputs["Geometry"])
+
+    # Lay the nodes out left to right
+    for i, node in enumerate((group_in, sphere, radius, instance, group_out)):
+        node.location = (200 * i, 0)
+
+    return node_group
+
+
+# Read the positions, radii and ids of the vertex spheres (from the edit mesh while in Edit Mode)
+def read_vertex_spheres(spheres_ob):
+    mesh = spheres_ob.data
+    if spheres_ob.mode != 'EDIT':
+        return (read_vertex_coords(mesh),
+                read_cable_model_attribute(mesh, "radius"),
+                read_cable_model_attribute(mesh, "index_number"))
+
+    bm = bmesh.from_edit_mesh(mesh)
+    radius_layer = bm.verts.layers.float.get("radius")
+    index_layer = bm.verts.layers.int.get("index_number")
+    co = np.array([v.co[:] for v in bm.verts], dtype=np.float32).reshape(-1, 3)
+    radius = np.array([v[radius_layer] for v in bm.verts], dtype=np.float32)
+    index_number = np.array([v[index_layer] for v in bm.verts], dtype=np.int32)
+    return co, radius, index_number
+
+
+# Read the selection and radii of the vertex spheres (from the edit mesh while in Edit Mode)
+def read_vertex_sphere_radii(spheres_ob):
+    mesh = spheres_ob.data
+    if spheres_ob.mode != 'EDIT':
+        select = np.empty(len(mesh.vertices), dtype=bool)
+        mesh.vertices.foreach_get("select", select)
+        return select, read_cable_model_attribute(mesh, "radius")
+
+    bm = bmesh.from_edit_mesh(mesh)
+    radius_layer = bm.verts.layers.float.get("radius")
+    select = np.array([v.select for v in bm.verts], dtype=bool)
+    radius = np.array([v[radius_layer] for v in bm.verts], dtype=np.float32)
+    return select, radius
+
+
+# Write the radii of the selected vertex spheres (to the edit mesh while in Edit Mode)
+def write_vertex_sphere_radii(spheres_ob, select, radius):
+    mesh = spheres_ob.data
+    if spheres_ob.mode != 'EDIT':
+        all_radius = read_cable_model_attribute(mesh, "radius")
+        all_radius[select] = radius[select]
+        write_cable_model_attribute(mesh, "radius", all_radius)
+        mesh.update()
+        return
+
+    bm = bmesh.from_edit_mesh(mesh)
+    radius_layer = bm.verts.layers.float.get("radius")
+    bm.verts.ensure_lookup_table()
+    for i, r in zip(np.nonzero(select)[0].tolist(), radius[select].tolist()):
+        bm.verts[i][radius_layer] = r
+    bmesh.update_edit_mesh(mesh)
+
+
+#######################################################
+#######################################################
+# Live sync of vertex spheres
+#######################################################
+#######################################################
+
+# Seconds to wait after a sphere edit before writing it back (coalesces the updates of an interactive drag)
+SPHERE_SYNC_INTERVAL = 0.25
+
+# Below this many changed spheres, vertices are written one at a time rather than in bulk
+SPHERE_SYNC_BULK_THRESHOLD = 256
+
+# Sphere positions, radii and transform at the last sync, keyed by spheres object name
+sphere_sync_snapshots = {}
+
+# Names of the cable models whose spheres were edited since the last sync
+pending_sphere_syncs = set()
+
+
+# Write the pending sphere edits back to their cable models
+def sync_pending_vertex_spheres():
+    mnm = bpy.context.scene.make_neuron_meta
+    while len(pending_sphere_syncs) > 0:
+        ob_name = pending_sphere_syncs.pop()
+        entry = mnm.cable_model_list.get(ob_name)
+        ob = bpy.data.objects.get(ob_name)
+        if entry is not None and ob is not None and entry.spheres_object is not None:
+            mnm.sync_cable_model_from_spheres(ob, entry.spheres_object)
+
+    # Run once
+    return None
+
+
+# Collect the spheres objects changed by this update, and schedule a sync for them
+@bpy.app.handlers.persistent
+def vertex_spheres_depsgraph_update(scene, depsgraph):
+    mnm = scene.make_neuron_meta
+    if not mnm.live_sync_spheres:
+        return
+
+    # Cable model of each spheres object
+    cable_model_of_spheres = {d.spheres_object.name: d.name for d in mnm.cable_model_list if d.spheres_object is not None}
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and (update.is_updated_geometry or update.is_updated_transform):
+            ob_name = cable_model_of_spheres.get(update.id.original.name)
+            if ob_name is not None:
+                pending_sphere_syncs.add(ob_name)
+
+    if len(pending_sphere_syncs) > 0 and not bpy.app.timers.is_registered(sync_pending_vertex_spheres):
+        bpy.app.timers.register(sync_pending_vertex_spheres, first_interval=SPHERE_SYNC_INTERVAL)
+
+
+#######################################################
+#######################################################
+# Watching source files
+#######################################################
+#######################################################
+
+# Seconds between checks of the source files of the cable models
+SOURCE_WATCH_INTERVAL = 1.0
+
+
+# Reload the cable models whose source files changed, then wait for the next check (or stop when no longer watching)
+def watch_source_files():
+    scene = bpy.context.scene
+    if scene is None or not scene.make_neuron_meta.watch_source_files:
+        return None
+    scene.make_neuron_meta.reload_changed_source_files(bpy.context)
+    return SOURCE_WATCH_INTERVAL
+
+
+# Start the watch when it is turned on (the timer stops itself when it is turned off)
+def watch_source_files_change(self, context):
+    if self.watch_source_files and not bpy.app.timers.is_registered(watch_source_files):
+        bpy.app.timers.register(watch_source_files, first_interval=SOURCE_WATCH_INTERVAL, persistent=True)
+
+
+class MakeNeuronMeta_Panel(bpy.types.Panel):
+
+    bl_label = "SWC Mesher"
+    bl_idname = "PT_MAKE_NEURON_META"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "SWC Mesher"
+
+    @classmethod
+    def poll(cls, context):
+        return (context.scene is not None)
+
+    def draw(self, context):
+        layout = self.layout
+        mnm = context.scene.make_neuron_meta
+        mnm.draw(layout)
+
+class MakeNeuronStick_Operator(bpy.types.Operator):
+    bl_idname = "mnm.make_line_mesh"
+    bl_label = "Make Cable Model from File"
+    bl_description = "Generate a skeleton of line segments from the SWC file directly"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label):
+            mnm.build_neuron_stick_from_file(context)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+class MakeCableDisplay_Operator(bpy.types.Operator):
+    bl_idname = "mnm.make_cable_display"
+    bl_label = "Make Cable Display from File"
+    bl_description = "Show the file as a light curve (one spline per section, thick by radius) that converts back to a cable model region by region"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        with compact_undo_step(context, self.bl_label):
+            context.scene.make_neuron_meta.build_cable_display_from_file(context)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+class ConvertCableDisplay_Operator(bpy.types.Operator):
+    bl_idname = "mnm.convert_cable_display"
+    bl_label = "Convert to Cable Model"
+    bl_description = "Make an editable cable model from all of the active cable display, or from its nodes near the 3D cursor"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        return is_cable_display(context.active_object)
+
+    def execute(self, context):
+        with compact_undo_step(context, self.bl_label):
+            num_nodes = context.scene.make_neuron_meta.cable_model_from_display(context, context.active_object)
+        self.report({'INFO'}, "Made a cable model of %d nodes" % num_nodes)
+        return {"FINISHED"}
+
+class ImportCircuit_Operator(bpy.types.Operator):
+    bl_idname = "mnm.import_circuit"
+    bl_label = "Import Circuit"
+    bl_description = "Place a cell for every row of the circuit table, with the cells of the same morphology sharing one cable model (or surface mesh)"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        with compact_undo_step(context, self.bl_label):
+            num_cells, num_morphologies, failures = context.scene.make_neuron_meta.import_circuit(context)
+        message = "Placed %d cells sharing %d morphologies" % (num_cells, num_morphologies)
+        if len(failures) > 0:
+            self.report({'WARNING'}, message + "; failed: " + "; ".join(failures))
+        else:
+            self.report({'INFO'}, message)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+class MakeEmptyStick_Operator(bpy.types.Operator):
+    bl_idname = "mnm.make_new_cable"
+    bl_label = "Make New Cable Model"
+    bl_description = "Make a new cable model from scratch"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        mnm.make_new_cable_model(context)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        mnm = context.scene.make_neuron_meta
+        mnm.make_new_cable_model(context)
+        return {"FINISHED"}
+
+
+
+#######################################################
+#######################################################
+# Operators to update a cable model from recent edits
+#######################################################
+#######################################################
+
+
+# Report the shape of a cable model from its topology index
+def report_topology(operator, topology):
+    operator.report({'INFO'}, "%d nodes, %d sections, %d branch points, %d tips, branch order up to %d" % (
+        len(topology), topology.num_sections, len(topology.branch_points), len(topology.tips),
+        topology.branch_order.max() if len(topology) > 0 else 0))
+
+
+# Class to update the cable model post editing it
+class UpdateCablePostEdit_Operator(bpy.types.Operator):
+    bl_idname = "mnm.update_cable_from_cable"
+    bl_label = "Update Cable Model from Geometry"
+    bl_description = "Update the internal cable model from the current geometry"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, [mnm.get_active_cable_model()]):
+            mnm.check_duplicate_verts(context)
+        report_topology(self, get_cable_model_topology(mnm.get_active_cable_model()))
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+
+class ReloadCableModel_Operator(bpy.types.Operator):
+    bl_idname = "mnm.reload_cable_model"
+    bl_label = "Reload from File"
+    bl_description = "Update the cable model with the changes made to the file it was imported from"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, [mnm.get_active_cable_model()]):
+            diff = mnm.reload_cable_model_from_file(context)
+        self.report({'INFO'}, "%d nodes added, %d removed, %d moved, %d radii changed, %d relinked" % tuple(
+            len(diff[key]) for key in ("added", "removed", "moved", "resized", "relinked")))
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+
+class ExtractRegion_Operator(bpy.types.Operator):
+    bl_idname = "mnm.extract_region"
+    bl_label = "Extract Region"
+    bl_description = "Take the nodes in the box, or the subtree of the node nearest the 3D cursor, out into a small cable model to edit on its own"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        with compact_undo_step(context, self.bl_label):
+            num_nodes = context.scene.make_neuron_meta.extract_region(context)
+        self.report({'INFO'}, "Extracted a region of %d nodes" % num_nodes)
+        return {"FINISHED"}
+
+
+class MergeRegion_Operator(bpy.types.Operator):
+    bl_idname = "mnm.merge_region"
+    bl_label = "Merge Region Back"
+    bl_description = "Splice the edits of the active region into the cable model it was taken from, and remove the region"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        entry = mnm.get_active_cable_model_entry()
+        region = [bpy.data.objects[name] for name in (entry.name, entry.region_of) if name in bpy.data.objects]
+        with compact_undo_step(context, self.bl_label, region):
+            diff = mnm.merge_region(context)
+        self.report({'INFO'}, "%d nodes added, %d removed, %d moved, %d radii changed, %d relinked" % tuple(
+            len(diff[key]) for key in ("added", "removed", "moved", "resized", "relinked")))
+        return {"FINISHED"}
+
+
+class MergeCloseNodes_Operator(bpy.types.Operator):
+    bl_idname = "mnm.merge_close_nodes"
+    bl_label = "Merge Close Nodes"
+    bl_description = "Merge the nodes of the cable model that are closer than the merge distance, moving their children to the merged node"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, [mnm.get_active_cable_model()]):
+            num_merged = mnm.merge_close_nodes(context)
+        self.report({'INFO'}, "Merged away %d nodes" % num_merged)
+        return {"FINISHED"}
+
+
+class SnapToNearestNode_Operator(bpy.types.Operator):
+    bl_idname = "mnm.snap_to_nearest_node"
+    bl_label = "Snap Selected to Nearest Node"
+    bl_description = "Move each selected node onto its nearest unselected node (Merge Close Nodes then joins them)"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, [mnm.get_active_cable_model()]):
+            num_snapped = mnm.snap_to_nearest_node(context)
+        self.report({'INFO'}, "Snapped %d nodes" % num_snapped)
+        return {"FINISHED"}
+
+
+class SelectNodesInRadius_Operator(bpy.types.Operator):
+    bl_idname = "mnm.select_nodes_in_radius"
+    bl_label = "Select Nodes in Radius"
+    bl_description = "Also select every node within the search radius of a selected node"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, selections=[mnm.get_active_cable_model()]):
+            num_selected = mnm.select_nodes_in_radius(context)
+        self.report({'INFO'}, "%d nodes selected" % num_selected)
+        return {"FINISHED"}
+
+
+class ResampleCableModel_Operator(bpy.types.Operator):
+    bl_idname = "mnm.resample_cable_model"
+    bl_label = "Resample Cable Model"
+    bl_description = "Make a new cable model whose unbranched sections are resampled at the target spacing"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, [mnm.get_active_cable_model()]):
+            new_obj = mnm.resample_cable_model(context)
+        self.report({'INFO'}, "Resampled into " + new_obj.name + " (%d nodes)" % len(new_obj.data.vertices))
+        return {"FINISHED"}
+
+
+class SimplifyCableModel_Operator(bpy.types.Operator):
+    bl_idname = "mnm.simplify_cable_model"
+    bl_label = "Simplify Cable Model"
+    bl_description = "Remove the nodes of unbranched sections that are within the position and radius tolerances of the line through their neighbors"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label, [mnm.get_active_cable_model()]):
+            num_before, num_after = mnm.simplify_cable_model(context)
+        self.report({'INFO'}, "Simplified %d nodes to %d (%.1fx fewer)" % (num_before, num_after, num_before / max(num_after, 1)))
+        return {"FINISHED"}
+
+
+#######################################################
+#######################################################
+# Operators to export files
+#######################################################
+#######################################################
+
+
+# Export a cable model to SWC file
+class ExportCableModel_Operator(bpy.types.Operator, ExportHelper):
+    bl_idname = "mnm.export_swc"
+    bl_label = "Export Cable Model to SWC file"
+    bl_description = "Generate an SWC file of segments from the skeleton"
+    bl_options = {"REGISTER"}
+
+    filename_ext = ".swc"  # allowed extensions
+
+    def execute(self, context):
+
+        # Check that an object is selected
+        if context.active_object is None:
+            raise TypeError("Please select the cable model to export.")
+
+        # Export the SWC file
+        context.scene.make_neuron_meta.export_cable_model(context, self.filepath)
+
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+# Export the surface of the active object to a mesh file
+class ExportSurfaceMesh_Operator(bpy.types.Operator):
+    bl_idname = "mnm.export_surface_mesh"
+    bl_label = "Export Surface Mesh"
+    bl_description = "Write the surface of the active mesh or meta object to a binary PLY, binary STL, OBJ or MCell MDL file"
+    bl_options = {"REGISTER"}
+
+    filepath: bpy.props.StringProperty(subtype='FILE_PATH')
+    filter_glob: bpy.props.StringProperty(default="*.ply;*.stl;*.obj;*.mdl", options={'HIDDEN'})
+    file_format: bpy.props.EnumProperty(
+        items=[('PLY', "PLY", "Binary PLY"),
+               ('STL', "STL", "Binary STL"),
+               ('OBJ', "OBJ", "Wavefront OBJ"),
+               ('MDL', "MDL", "MCell MDL polygon list")],
+        default='PLY', description="File type, used when the file name has no mesh file suffix")
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None and context.active_object.type in {'MESH', 'META'}
+
+    def execute(self, context):
+        fpath = bpy.path.abspath(self.filepath)
+        if os.path.splitext(fpath)[1].lower() not in core.MESH_WRITERS:
+            fpath += "." + self.file_format.lower()
+        num_vertices, num_triangles = export_surface_mesh(context, context.active_object, fpath)
+        self.report({'INFO'}, "Wrote %d vertices and %d triangles to %s" % (num_vertices, num_triangles, fpath))
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+# Check the surface of the active object before it is used in a simulation
+class CheckSurfaceMesh_Operator(bpy.types.Operator):
+    bl_idname = "mnm.check_surface_mesh"
+    bl_label = "Check Surface Mesh"
+    bl_description = "Check the surface of the active mesh or meta object for holes, non-manifold edges, flipped and degenerate triangles and small shells, and compare its area and volume with the analyzed file"
+    bl_options = {"REGISTER"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None and context.active_object.type in {'MESH', 'META'}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        # The surface is built from the file data scaled by scale_file_data
+        scale = mnm.scale_file_data
+        cable_area = mnm.cable_area * scale ** 2 if mnm.file_analyzed else None
+        cable_volume = mnm.cable_volume * scale ** 3 if mnm.file_analyzed else None
+        quality, lines = check_surface_mesh(context, context.active_object, mnm.mesh_resolution, cable_area, cable_volume)
+        mnm.mesh_quality_summary = "\n".join(lines)
+
+        problems = [key for key, description in core.MESH_QUALITY_PROBLEMS if len(quality[key]) > 0]
+        if len(problems) > 0 or quality["volume"] < 0:
+            self.report({'WARNING'}, "Found problems in %s (listed in the panel and the console)" % context.active_object.name)
+        else:
+            self.report({'INFO'}, "%s is watertight and manifold in %d shells" % (context.active_object.name, len(quality["shell_size"])))
+        return {"FINISHED"}
+
+# Decimate the active surface mesh, with the sizes allowed at each place following the radius of the active cable model
+class DecimateSurfaceMesh_Operator(bpy.types.Operator):
+    bl_idname = "mnm.decimate_surface_mesh"
+    bl_label = "Decimate Surface Mesh"
+    bl_description = "Collapse the short edges of the active surface mesh, made from the active cable model, keeping it watertight and following the radius of the cable"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None and context.active_object.type == 'MESH'
+
+    def execute(self, context):
+        with compact_undo_step(context, self.bl_label, surfaces=[context.active_object]):
+            num_before, num_after = context.scene.make_neuron_meta.decimate_surface_mesh(context, context.active_object)
+        self.report({'INFO'}, "Decimated %s from %d to %d triangles" % (context.active_object.name, num_before, num_after))
+        return {"FINISHED"}
+
+#######################################################
+#######################################################
+# Operators to edit cable model spheres
+#######################################################
+#######################################################
+
+# Class to make spheres
+class MakeSpheres_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.make_spheres"
+	bl_label = "Make Spheres for each Vertex"
+	bl_description = "Generate a sphere at each vertex of the cable model"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+	bl_context = "objectmode"
+
+	def execute ( self, context ):
+		mnm = context.scene.make_neuron_meta
+		with compact_undo_step ( context, self.bl_label, [mnm.get_active_cable_model()] ):
+			mnm.make_spheres_from_object ( context )
+		return {"FINISHED"}
+
+	def invoke ( self, context, event ):
+		return self.execute ( context )
+
+# Class to update the cable model from the sphere locations/radii
+class UpdateCableFromSpheres_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.update_cable_from_spheres"
+	bl_label = "Update Cable Model from Spheres"
+	bl_description = "Update the cable model from sphere locations/radii"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+	bl_context = "objectmode"
+
+	def execute ( self, context ):
+		mnm = context.scene.make_neuron_meta
+		with compact_undo_step ( context, self.bl_label, [mnm.get_active_cable_model()] ):
+			mnm.update_cable_model_from_spheres ( context )
+		return {"FINISHED"}
+
+	def invoke ( self, context, event ):
+		return self.execute ( context )
+
+# Class to show all vertex spheres
+class ShowVertexSpheres_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.show_spheres"
+	bl_label = "Show"
+	bl_description = "Show all vertex spheres"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+	bl_context = "objectmode"
+
+	def execute ( self, context ):
+		context.scene.make_neuron_meta.hide_vertex_spheres ( context, False )
+		return {"FINISHED"}
+
+	def invoke ( self, context, event ):
+		context.scene.make_neuron_meta.hide_vertex_spheres ( context, False )
+		return {"FINISHED"}
+
+# Class to hide all vertex spheres
+class HideVertexSpheres_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.hide_spheres"
+	bl_label = "Hide"
+	bl_description = "Hide all vertex spheres"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+	bl_context = "objectmode"
+
+	def execute ( self, context ):
+		context.scene.make_neuron_meta.hide_vertex_spheres ( context, True )
+		return {"FINISHED"}
+
+	def invoke ( self, context, event ):
+		context.scene.make_neuron_meta.hide_vertex_spheres ( context, True )
+		return {"FINISHED"}
+
+# Class to set the radius of the selected vertex spheres
+class SetVertexSphereRadius_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.set_sphere_radius"
+	bl_label = "Set Radius of Selected Spheres"
+	bl_description = "Set the radius of the selected vertex spheres to the new sphere radius"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+
+	def execute ( self, context ):
+		context.scene.make_neuron_meta.set_vertex_sphere_radius ( context )
+		return {"FINISHED"}
+
+	def invoke ( self, context, event ):
+		context.scene.make_neuron_meta.set_vertex_sphere_radius ( context )
+		return {"FINISHED"}
+
+# Class to scale the radius of the selected vertex spheres with the mouse
+class ScaleVertexSpheres_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.scale_spheres"
+	bl_label = "Scale Selected Spheres"
+	bl_description = "Scale the radius of the selected vertex spheres by moving the mouse (click to confirm, right click or Esc to cancel)"
+	bl_options = {"REGISTER", "UNDO"}
+
+	# Pixels of horizontal mouse motion that scale the radii by a factor e
+	pixels_per_scale = 200.0
+
+	def invoke ( self, context, event ):
+		spheres_ob = context.scene.make_neuron_meta.get_active_vertex_spheres()
+		self.spheres_ob = spheres_ob
+		self.select, self.radius = read_vertex_sphere_radii ( spheres_ob )
+		if not self.select.any():
+			self.report ( {"WARNING"}, "No spheres selected" )
+			return {"CANCELLED"}
+		self.mouse_x = event.mouse_x
+		context.window_manager.modal_handler_add ( self )
+		return {"RUNNING_MODAL"}
+
+	def modal ( self, context, event ):
+		if event.type == 'MOUSEMOVE':
+			factor = math.exp ( (event.mouse_x - self.mouse_x) / self.pixels_per_scale )
+			write_vertex_sphere_radii ( self.spheres_ob, self.select, self.radius * np.float32(factor) )
+			if context.area is not None:
+				context.area.header_text_set ( "Sphere radius scale: %.3f" % factor )
+		elif event.type in {'LEFTMOUSE', 'RET', 'NUMPAD_ENTER'} and event.value == 'PRESS':
+			if context.area is not None:
+				context.area.header_text_set ( None )
+			return {"FINISHED"}
+		elif event.type in {'RIGHTMOUSE', 'ESC'} and event.value == 'PRESS':
+			write_vertex_sphere_radii ( self.spheres_ob, self.select, self.radius )
+			if context.area is not None:
+				context.area.header_text_set ( None )
+			return {"CANCELLED"}
+		return {"RUNNING_MODAL"}
+
+# Class to show all vertex spheres
+class DeleteAllVertexSpheres_Operator( bpy.types.Operator ):
+	bl_idname = "mnm.delete_all_spheres"
+	bl_label = "Delete All"
+	bl_description = "Delete all vertex spheres"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+	bl_context = "objectmode"
+
+	def execute ( self, context ):
+		mnm = context.scene.make_neuron_meta
+		with compact_undo_step ( context, self.bl_label, [mnm.get_active_cable_model()] ):
+			mnm.delete_vertex_spheres ( context )
+		return {"FINISHED"}
+
+	def invoke ( self, context, event ):
+		return self.execute ( context )
+
+
+#######################################################
+#######################################################
+# Cable model list operators: draw/add/remove/etc cable models to edit
+#######################################################
+#######################################################
+
+# Class to hold the cable model
+class CableModelObject(bpy.types.PropertyGroup):
+    name: bpy.props.StringProperty(name="Name", default="", description="Cable Model Name")
+
+    # Fingerprint of the cable model the last time its ids were verified
+    verified_fingerprint: bpy.props.StringProperty(default="")
+
+    # File the cable model was imported from, and its modification time when it was last read
+    source_file: bpy.props.StringProperty(default="")
+    source_mtime: bpy.props.FloatProperty(default=0.0)
+
+    # Cable model this one is a region of (empty if it is not a region)
+    region_of: bpy.props.StringProperty(default="")
+
+    # Collection owning the vertex spheres of this cable model, and the spheres object in it
+    spheres_collection: bpy.props.PointerProperty(type=bpy.types.Collection)
+    spheres_object: bpy.props.PointerProperty(type=bpy.types.Object)
+
+    # Include in batch operations over checked cable models
+    batch_selected: bpy.props.BoolProperty(default=False, description="Include this cable model in batch operations on checked cable models")
+
+    # Draw in list of objects
+    def draw_item_in_row(self, row):
+        row.prop(self, "batch_selected", text="")
+        col = row.column()
+        col.label(text=str(self.name))
+
+# Cable model object item to draw in the list
+class SWCMesher_UL_object(bpy.types.UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        # The item will be a CableModelObject
+        # Let it draw itself in a new row:
+        item.draw_item_in_row(layout.row())
+
+# Button to add cable model
+class CableModelAdd(bpy.types.Operator):
+    bl_idname = "mnm.cable_model_add"
+    bl_label = "Add Cable Model"
+    bl_description = "Add a cable model to edit"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        context.scene.make_neuron_meta.cable_model_add_func(context)
+        return {'FINISHED'}
+
+# Button to remove cable model
+class CableModelRemove(bpy.types.Operator):
+    bl_idname = "mnm.cable_model_remove"
+    bl_label = "Remove Cable Model"
+    bl_description = "Remove a cable model"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        context.scene.make_neuron_meta.cable_model_remove_func(context)
+        return {'FINISHED'}
+
+# Button to remove all cable models
+class CableModelRemoveAll(bpy.types.Operator):
+    bl_idname = "mnm.cable_model_remove_all"
+    bl_label = "Remove all Cable Models"
+    bl_description = "Remove all cable models"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        context.scene.make_neuron_meta.cable_model_remove_all_func(context)
+        return {'FINISHED'}
+
+
+#######################################################
+#######################################################
+# Operators to make surface mesh
+#######################################################
+#######################################################
+
+
+class MakeNeuronFromFile_Operator(bpy.types.Operator):
+    bl_idname = "mnm.make_neuron_from_file"
+    bl_label = "Make Surface Mesh from File"
+    bl_description = "Generate a surface mesh from the SWC file"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label):
+            segments = mnm.read_segments_from_file(for_meshing=True)
+            mnm.build_neuron_meta_from_segments(context, segments)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+class MakeNeuronFromData_Operator(bpy.types.Operator):
+    bl_idname = "mnm.make_neuron_from_data"
+    bl_label = "Make Surface Mesh from Cable Model"
+    bl_description = "Generate a surface mesh from the current skeleton"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, self.bl_label):
+            segments = mnm.read_segments_from_object(context)
+            mnm.build_neuron_meta_from_segments(context, segments)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+#######################################################
+#######################################################
+# Operators to run over many cable models
+#######################################################
+#######################################################
+
+
+# Report the outcome of a batch operation
+def report_batch(operator, action, result):
+    num_models, failures = result
+    if len(failures) > 0:
+        operator.report({'WARNING'}, action + " %d of %d cable models; failed: %s" % (num_models - len(failures), num_models, "; ".join(failures)))
+    else:
+        operator.report({'INFO'}, action + " %d cable models" % num_models)
+
+
+class FindContacts_Operator(bpy.types.Operator):
+    bl_idname = "mnm.find_contacts"
+    bl_label = "Find Contacts"
+    bl_description = "Find where different neurons (cable models in the list, or the selected surface meshes) overlap or come closer than the gap"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        # Only the selection of the cable models may change
+        marked = mnm.get_batch_objects() if mnm.contact_source == 'CABLE' and mnm.mark_contacts else []
+        with compact_undo_step(context, self.bl_label, selections=marked):
+            if mnm.contact_source == 'CABLE':
+                gaps = mnm.find_cable_model_contacts(context)
+            else:
+                objects = [ob for ob in context.selected_objects if ob.type in {'MESH', 'META'}]
+                contacts = find_surface_contacts(context, objects, mnm.contact_gap)
+                for name_a, name_b, gap, location in contacts:
+                    print("Contact: %s and %s, gap %g at (%g, %g, %g)" % ((name_a, name_b, gap) + location))
+                gaps = [contact[2] for contact in contacts]
+        if len(gaps) > 0:
+            self.report({'WARNING'}, "Found %d contacts, the closest with a gap of %g (listed in the console)" % (len(gaps), min(gaps)))
+        else:
+            self.report({'INFO'}, "No contacts closer than %g" % mnm.contact_gap)
+        return {"FINISHED"}
+
+
+class BatchUpdateCablePostEdit_Operator(bpy.types.Operator):
+    bl_idname = "mnm.batch_update_cable_from_cable"
+    bl_label = "Update"
+    bl_description = "Update the internal cable model of all (or all checked) cable models from their current geometry"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        mnm = context.scene.make_neuron_meta
+        with compact_undo_step(context, "Update Cable Models", mnm.get_batch_objects()):
+            report_batch(self, "Updated", mnm.batch_check_duplicate_verts(context))
+        return {"FINISHED"}
+
+
+class BatchExportCableModels_Operator(bpy.types.Operator):
+    bl_idname = "mnm.batch_export_swc"
+    bl_label = "Export"
+    bl_description = "Export all (or all checked) cable models to SWC files in a directory"
+    bl_options = {"REGISTER"}
+
+    directory: bpy.props.StringProperty(subtype='DIR_PATH')
+    filter_folder: bpy.props.BoolProperty(default=True, options={'HIDDEN'})
+
+    def execute(self, context):
+        report_batch(self, "Exported", context.scene.make_neuron_meta.batch_export_cable_models(context, self.directory))
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+
+class BatchMakeNeuronFromData_Operator(bpy.types.Operator):
+    bl_idname = "mnm.batch_make_neuron_from_data"
+    bl_label = "Surface Mesh"
+    bl_description = "Generate a surface mesh from each of all (or all checked) cable models"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        with compact_undo_step(context, "Make Surface Meshes"):
+            report_batch(self, "Meshed", context.scene.make_neuron_meta.batch_build_neuron_meta(context))
+        return {"FINISHED"}
+
+
+# Preferences of the add-on. Large data mode is one setting for all scenes and files, as the UNDO option of the
+# operators it switches is shared by all of them.
+class SWCMesherPreferences(bpy.types.AddonPreferences):
+    bl_idname = __package__
+
+
+    def draw(self, context):
+        self.layout.prop(self, "compact_undo", text="Large Data Mode")
+
+
+# Get the preferences of the add-on
+def get_preferences():
+    return bpy.context.preferences.addons[__package__].preferences
+
+
+# Undo the newest step of the compact undo history of large data mode
+class CompactUndo_Operator(bpy.types.Operator):
+    bl_idname = "mnm.compact_undo"
+    bl_label = "Undo Bulk Step"
+    bl_description = "Undo the newest bulk operation recorded in large data mode (cable model changes are kept as compact array deltas instead of global undo steps)"
+    bl_options = {"REGISTER"}
+
+    @classmethod
+    def poll(cls, context):
+        return len(compact_undo_history) > 0
+
+    def execute(self, context):
+        message = context.scene.make_neuron_meta.undo_compact_step(context)
+        self.report({'INFO'}, "Undid " + message)
+        return {"FINISHED"}
+
+
+class MakeNeuronMetaAnalyze_Operator(bpy.types.Operator):
+    bl_idname = "mnm.analyze_file"
+    bl_label = "Analyze File"
+    bl_description = "Read the file to determine numbers of segments, nodes, and various size ranges"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        context.scene.make_neuron_meta.read_segments_from_file()
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        context.scene.make_neuron_meta.read_segments_from_file()
+        return {"FINISHED"}
+
+def file_name_change(self, context):
+    context.scene.make_neuron_meta.file_name_change()
+
+
+#######################################################
+#######################################################
+# Main GUI property group
+#######################################################
+#######################################################
+
+class MakeNeuronMetaPropGroup(bpy.types.PropertyGroup):
+    neuron_file_name: bpy.props.StringProperty(subtype='FILE_PATH', default="", update=file_name_change)
+    neuron_file_data: bpy.props.StringProperty(default="")
+
+    convert_to_mesh: bpy.props.BoolProperty(name="Convert to Mesh", default=False)
+    show_analysis: bpy.props.BoolProperty(default=False)
+    show_stick: bpy.props.BoolProperty(default=False)
+    file_analyzed: bpy.props.BoolProperty(default=False)
+    num_lines_in_file: bpy.props.IntProperty(default=-1)
+    num_segments_in_file: bpy.props.IntProperty(default=-1)
+    num_nodes_in_file: bpy.props.IntProperty(default=-1)
+    largest_radius_in_file: bpy.props.FloatProperty(default=-1)
+    smallest_radius_in_file: bpy.props.FloatProperty(default=-1)
+    min_x: bpy.props.FloatProperty(default=-1)
+    max_x: bpy.props.FloatProperty(default=-1)
+    min_y: bpy.props.FloatProperty(default=-1)
+    max_y: bpy.props.FloatProperty(default=-1)
+    min_z: bpy.props.FloatProperty(default=-1)
+    max_z: bpy.props.FloatProperty(default=-1)
+    cable_area: bpy.props.FloatProperty(default=-1)
+    cable_volume: bpy.props.FloatProperty(default=-1)
+
+    validation_summary: bpy.props.StringProperty(default="", description="Problems found in the SWC file, one per line")
+    repair_renumber: bpy.props.BoolProperty(default=False, description="Renumber the nodes of SWC files with problems 1, 2, 3, ... with parents before children")
+    repair_reroot: bpy.props.BoolProperty(default=False, description="Make orphans roots, cut cycles, reroot trees at their soma and join extra trees to the main tree in SWC files with problems")
+    repair_clamp_radii: bpy.props.BoolProperty(default=False, description="Raise radii below the minimum radius in SWC files with problems")
+    repair_min_radius: bpy.props.FloatProperty(default=0.1, min=0.0, precision=4, description="Smallest radius kept by Clamp Radii")
+
+    display_region: bpy.props.EnumProperty(
+        items=[('ALL', "All", "Convert the whole cable display"),
+               ('CURSOR', "Near Cursor", "Convert the nodes within the region radius of the 3D cursor")],
+        default='CURSOR', description="Nodes of a cable display converted to a cable model")
+    display_region_radius: bpy.props.FloatProperty(default=50.0, min=0.0, precision=4, description="Distance from the 3D cursor of the nodes converted to a cable model")
+
+    circuit_file_name: bpy.props.StringProperty(subtype='FILE_PATH', default="", description="Circuit table (CSV, .npy or .npz) with the morphology file and transform of each cell")
+    circuit_instance_type: bpy.props.EnumProperty(
+        items=[('CABLE', "Cable Models", "Cells share the cable model of their morphology"),
+               ('SURFACE', "Surface Meshes", "Cells share the surface mesh of their morphology")],
+        default='CABLE', description="Data shared by the cells of a circuit")
+
+    scale_file_data: bpy.props.FloatProperty(default=1.0, precision=4, description="Scale factor applied to data read from a file")
+    meta_ball_scale_factor: bpy.props.FloatProperty(default=1.0, precision=4, description="Scale factor applied to mesh radius")
+
+    mesh_resolution: bpy.props.FloatProperty(default=0.1, precision=4, description="Intended resolution of the final mesh")
+    decimate_target_triangles: bpy.props.IntProperty(default=0, min=0, description="Number of triangles to decimate surface meshes to (0 for as few as the other limits allow)")
+    decimate_edge_length: bpy.props.FloatProperty(default=0.0, min=0.0, precision=4, description="Longest edge made by decimation (0 for no limit)")
+    decimate_radius_factor: bpy.props.FloatProperty(default=1.0, min=0.0, precision=4, description="Longest edge made by decimation as a multiple of the local radius of the cable")
+    decimate_min_radius: bpy.props.FloatProperty(default=0.0, min=0.0, precision=4, description="Processes thinner than this radius (in mesh units) are not decimated")
+    mesh_quality_summary: bpy.props.StringProperty(default="", description="Results of the last surface mesh check, one per line")
+    min_forced_radius: bpy.props.FloatProperty(default=0.0, precision=4, description="Smallest radius allowed in all segments (smaller forced up to this radius)")
+    num_segs_limit: bpy.props.IntProperty(default=0, description="Only generate this number of segments (useful for testing settings in large neurons)")
+
+    new_sphere_radius: bpy.props.FloatProperty(default=1, description="Radius of new vertex spheres")
+    live_sync_spheres: bpy.props.BoolProperty(default=False, description="Write sphere edits back to the cable model as they happen")
+    watch_source_files: bpy.props.BoolProperty(default=False, update=watch_source_files_change, description="Reload cable models when the files they were imported from change")
+
+    merge_distance: bpy.props.FloatProperty(default=0.01, min=0.0, precision=4, description="Nodes closer than this are merged into one")
+    node_search_radius: bpy.props.FloatProperty(default=1.0, min=0.0, precision=4, description="Distance from the selected nodes within which nodes are selected")
+
+    region_type: bpy.props.EnumProperty(
+        items=[('BOX', "Box", "The nodes inside the bounding box of the region box object"),
+               ('SUBTREE', "Subtree", "The subtree of the node nearest the 3D cursor")],
+        default='BOX', description="Nodes taken out into a region")
+    region_box_object: bpy.props.PointerProperty(type=bpy.types.Object, description="Object whose bounding box (in world coordinates) holds the region")
+
+    simplify_position_tolerance: bpy.props.FloatProperty(default=0.1, min=0.0, precision=4, description="Nodes this close to the line through their kept neighbors can be removed by simplification")
+    simplify_radius_tolerance: bpy.props.FloatProperty(default=0.05, min=0.0, precision=4, description="Nodes whose radius is this close to the radius interpolated between their kept neighbors can be removed by simplification")
+    simplify_on_import: bpy.props.BoolProperty(default=False, description="Simplify cable models made from SWC files")
+    simplify_before_meshing: bpy.props.BoolProperty(default=False, description="Simplify the cable (or SWC file) before making a surface mesh from it")
+
+    resample_spacing: bpy.props.FloatProperty(default=1.0, min=0.0001, precision=4, description="Target distance between the nodes of resampled sections")
+    resample_radius_factor: bpy.props.FloatProperty(default=0.0, min=0.0, precision=4, description="If not 0, resampled nodes are this many radii apart where that is more than the spacing")
+    resample_before_meshing: bpy.props.BoolProperty(default=False, description="Resample the cable (or SWC file) before making a surface mesh from it")
+
+    # List of Cable Models
+    cable_model_list: bpy.props.CollectionProperty(type=CableModelObject)
+    active_object_index: bpy.props.IntProperty(name="Active Object Index", default=0)
+
+    # Contacts between neurons
+    contact_source: bpy.props.EnumProperty(
+        items=[('CABLE', "Cable Models", "Look for contacts between the cable models in the list (all or checked)"),
+               ('SURFACE', "Surfaces", "Look for contacts between the selected surface meshes")],
+        default='CABLE', description="Neurons to look for contacts between")
+    contact_gap: bpy.props.FloatProperty(default=0.1, min=0.0, precision=4, description="Neurons closer than this are in contact")
+    mark_contacts: bpy.props.BoolProperty(default=True, description="Select the cable model nodes nearest each contact")
+
+    # Cable models that batch operations apply to
+    batch_scope: bpy.props.EnumProperty(
+        items=[('ALL', "All", "Apply batch operations to every cable model in the list"),
+               ('CHECKED', "Checked", "Apply batch operations to the checked cable models only")],
+        default='ALL', description="Cable models that batch operations apply to")
+
+
+    def draw(self, layout):
+        row = layout.row(align=True)
+        preferences = get_preferences()
+        row.prop(preferences, "compact_undo", text="Large Data Mode", toggle=True)
+        if preferences.compact_undo:
+            text = "Undo " + compact_undo_history[-1]["message"] if len(compact_undo_history) > 0 else "Undo"
+            row.operator("mnm.compact_undo", text=text, icon='LOOP_BACK')
+
+        box = layout.box()
+        row = box.row(align=True)
+        row.alignment = 'LEFT'
+
+
+        ###
+		# Load, analyze and create a cable model from an SWC file
+		###
+
+        if not self.show_analysis:
+            row.prop(self, "show_analysis", icon='TRIA_RIGHT_BAR', text="Import Cable Model from SWC File", emboss=False)
+        else:
+            row.prop(self, "show_analysis", icon='TRIA_DOWN_BAR', text="Import Cable Model from SWC File", emboss=False)
+
+            row = box.row()
+            row.prop(self, "neuron_file_name", text="")
+
+            row = box.row()
+            row.operator("mnm.analyze_file")
+
+            row = box.row()
+            row.operator("mnm.make_line_mesh")
+            row.prop(self, "simplify_on_import", text="Simplify")
+
+            row = box.row()
+            row.operator("mnm.make_cable_display")
+            row = box.row(align=True)
+            row.operator("mnm.convert_cable_display")
+            row.prop(self, "display_region", text="")
+            if self.display_region == 'CURSOR':
+                row.prop(self, "display_region_radius", text="Radius")
+
+            row = box.row(align=True)
+            row.label(text="Repair:")
+            row.prop(self, "repair_renumber", text="Renumber", toggle=True)
+            row.prop(self, "repair_reroot", text="Reroot", toggle=True)
+            row.prop(self, "repair_clamp_radii", text="Clamp Radii", toggle=True)
+            row.prop(self, "repair_min_radius", text="Min")
+
+            row = box.row()
+            row.label(text="Circuit:")
+            row.prop(self, "circuit_file_name", text="")
+            row = box.row(align=True)
+            row.operator("mnm.import_circuit")
+            row.prop(self, "circuit_instance_type", expand=True)
+
+            if self.file_analyzed:
+                row = box.row()
+                box = row.box()
+                row = box.row()
+                row.label(text="File contains " + str(self.num_lines_in_file) + " lines.")
+                row = box.row()
+                row.label(text="File contains " + str(self.num_segments_in_file) + " segments.")
+                row = box.row()
+                row.label(text="File contains " + str(self.num_nodes_in_file) + " nodes.")
+                row = box.row()
+                row.label(text="Largest radius is %g" % self.largest_radius_in_file)
+                row = box.row()
+                row.label(text="Smallest radius is %g" % self.smallest_radius_in_file)
+                row = box.row()
+                row.label(text="X range: %g to %g" % (self.min_x, self.max_x))
+                row = box.row()
+                row.label(text="Y range: %g to %g" % (self.min_y, self.max_y))
+                row = box.row()
+                row.label(text="Z range: %g to %g" % (self.min_z, self.max_z))
+                row = box.row()
+                row.label(text="Cable area is %g, volume is %g" % (self.cable_area, self.cable_volume))
+                for line in self.validation_summary.splitlines():
+                    row = box.row()
+                    row.label(text=line, icon='INFO' if line.startswith("Repaired") else 'ERROR')
+
+        box = layout.box()
+        row = box.row(align=True)
+        row.alignment = 'LEFT'
+
+        ###
+		# Edit cable models and make surface mesh
+		###
+
+
+        if not self.show_stick:
+            row.prop(self, "show_stick", icon='TRIA_RIGHT_BAR', text="Edit Cable Model", emboss=False)
+        else:
+            row.prop(self, "show_stick", icon='TRIA_DOWN_BAR', text="Edit Cable Model", emboss=False)
+
+            ###
+            # Cable model chooser
+            ###
+
+            row = box.row()
+            row.label(text="List of Cable Models", icon='CURVE_DATA')
+
+            row = box.row()
+            row.operator("mnm.make_new_cable")
+
+            row = box.row()
+            col = row.column()
+
+            col.template_list("SWCMesher_UL_object", "",
+                            self, "cable_model_list",
+                            self, "active_object_index",
+                            rows=1)
+
+            col = row.column(align=True)
+            col.operator("mnm.cable_model_add", icon='ZOOM_IN', text="")
+            col.operator("mnm.cable_model_remove", icon='ZOOM_OUT', text="")
+            col.operator("mnm.cable_model_remove_all", icon='X', text="")
+
+            ###
+            # Batch operations over the cable models in the list
+            ###
+
+            row = box.row()
+            row.label(text="Batch:")
+            row.prop(self, "batch_scope", expand=True)
+            row = box.row(align=True)
+            row.operator("mnm.batch_update_cable_from_cable")
+            row.operator("mnm.batch_export_swc")
+            row.operator("mnm.batch_make_neuron_from_data")
+            row = box.row()
+            row.label(text="Contacts:")
+            row.prop(self, "contact_source", expand=True)
+            row = box.row(align=True)
+            row.operator("mnm.find_contacts")
+            row.prop(self, "contact_gap", text="Gap")
+            if self.contact_source == 'CABLE':
+                row.prop(self, "mark_contacts", text="Select Nodes", toggle=True)
+
+            ###
+            # Edit the cable model
+            ###
+
+            row = box.row()
+            row.label(text="Edit Selected Cable Model", icon='GREASEPENCIL')
+
+            row = box.row()
+            subbox = row.box()
+
+            # Apply edits to cable model
+
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="After editing the geometry:")
+            col.operator("mnm.update_cable_from_cable")
+
+            # Follow changes to the source file
+
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="After the source file changed:")
+            subrow = col.row()
+            subrow.operator("mnm.reload_cable_model")
+            subrow.prop(self, "watch_source_files", text="Watch Files")
+
+            # Merge, snap and select nodes by position
+
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="To clean up nodes by position:")
+            subrow = col.row()
+            subrow.operator("mnm.merge_close_nodes")
+            subrow.prop(self, "merge_distance", text="Distance")
+            subrow = col.row()
+            subrow.operator("mnm.select_nodes_in_radius")
+            subrow.prop(self, "node_search_radius", text="Radius")
+            col.operator("mnm.snap_to_nearest_node")
+
+            # Edit a region on its own
+
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="To edit a region on its own:")
+            subrow = col.row(align=True)
+            subrow.prop(self, "region_type", expand=True)
+            if self.region_type == 'BOX':
+                col.prop(self, "region_box_object", text="Box")
+            subrow = col.row()
+            subrow.operator("mnm.extract_region")
+            subrow.operator("mnm.merge_region")
+
+            # Simplify the sections
+
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="To remove redundant nodes:")
+            subrow = col.row(align=True)
+            subrow.prop(self, "simplify_position_tolerance", text="Position Tolerance")
+            subrow.prop(self, "simplify_radius_tolerance", text="Radius Tolerance")
+            col.operator("mnm.simplify_cable_model")
+
+            # Resample the sections
+
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="To even out the node spacing:")
+            subrow = col.row(align=True)
+            subrow.prop(self, "resample_spacing", text="Spacing")
+            subrow.prop(self, "resample_radius_factor", text="Radius Factor")
+            col.operator("mnm.resample_cable_model")
+
+
+            # Make spheres
+
+            row = subbox.row()
+            split = subbox.split()
+            col = split.column(align=True)
+            col.label(text="To edit the radii:")
+            subrow = col.row()
+            subrow.operator("mnm.make_spheres")
+            subrow.prop(self, "new_sphere_radius", text="New Sphere Radius")
+            rw = col.row()
+            rw.operator("mnm.show_spheres")
+            rw.operator("mnm.hide_spheres")
+            rw.operator("mnm.delete_all_spheres")
+            rw = col.row()
+            rw.operator("mnm.set_sphere_radius")
+            rw.operator("mnm.scale_spheres")
+            col.label(text="After editing the radii:")
+            col.operator("mnm.update_cable_from_spheres")
+            col.prop(self, "live_sync_spheres", text="Live Update from Spheres")
+
+            row = box.row()
+            row.operator("mnm.export_swc")
+
+            ###
+            # Extrapolate surface mesh from cable model
+            ###
+
+            row = box.row()
+            row.label(text="Extrapolate Surface Mesh", icon='SURFACE_NCYLINDER')
+
+            row = box.row()
+            subbox = row.box()
+
+            row = subbox.row()
+            row.prop(self, "scale_file_data", text="Scale File Factor")
+            row = subbox.row()
+            row.prop(self, "meta_ball_scale_factor", text="Scale Radius Factor")
+            row = subbox.row()
+            row.prop(self, "mesh_resolution", text="Resolution of the Final Mesh")
+            row = subbox.row()
+            row.prop(self, "min_forced_radius", text="Minimum Forced Radius")
+            row = subbox.row()
+            row.prop(self, "num_segs_limit", text="Limit Number of Segments")
+            row = subbox.row()
+            row.prop(self, "simplify_before_meshing", text="Simplify Before Meshing")
+            row.prop(self, "resample_before_meshing", text="Resample Before Meshing")
+            row = subbox.row()
+            row.operator("mnm.make_neuron_from_file")
+            row.operator("mnm.make_neuron_from_data")
+            row = subbox.row()
+            row.operator("mnm.export_surface_mesh")
+            row.operator("mnm.check_surface_mesh")
+            row = subbox.row(align=True)
+            row.prop(self, "decimate_target_triangles", text="Triangles")
+            row.prop(self, "decimate_edge_length", text="Edge")
+            row = subbox.row(align=True)
+            row.prop(self, "decimate_radius_factor", text="Radius Factor")
+            row.prop(self, "decimate_min_radius", text="Min Radius")
+            row = subbox.row()
+            row.operator("mnm.decimate_surface_mesh")
+            for i, line in enumerate(self.mesh_quality_summary.splitlines()):
+                row = subbox.row()
+                row.label(text=line, icon='INFO' if i < 2 or " times " in line else 'ERROR')
+
+    ###
+	# Function to make a new cable model from scratch
+	###
+
+    def make_new_cable_model(self, context):
+        # Get the current cursor location
+        cursor_loc = context.scene.cursor.location
+
+        # New vertex locations
+        v1 = (cursor_loc[0] - 2.0, cursor_loc[1], cursor_loc[2])
+        v2 = (cursor_loc[0] + 2.0, cursor_loc[1], cursor_loc[2])
+        vs = [v1, v2]
+
+        # Connecting line
+        ls = [(0, 1)]
+
+        # Make new mesh with its metadata
+        # Indexes 1, 2; vertex 2 is the child of vertex 1; radii unset; segment type - just make it a dendrite
+        new_mesh = new_cable_model_mesh("cable_model_mesh", vs, ls,
+                                        index_number=[1, 2],
+                                        parent_index=[-1, 1],
+                                        segment_type=[3, 3],
+                                        radius=[-1.0, -1.0])
+        new_obj = bpy.data.objects.new("cable_model_mesh", new_mesh)
+        context.collection.objects.link(new_obj)
+
+        # Finally, add the new cable model to the list of cable models to edit
+
+        # Deselect all objects currently selected
+        bpy.ops.object.select_all(action='DESELECT')
+
+        # Select the new obj and make it active
+        new_obj.select_set(True)
+        context.view_layer.objects.active = new_obj
+
+        # Add to the list
+        self.cable_model_add_func(context)
+
+	#####
+	# Functions to add/remove cable models from the list of cable models to edit
+	#####
+
+    # Add a cable model to the list
+    def cable_model_add_func(self, context):
+        print("Adding cable model to the list")
+
+        # Get the active object
+        obj_list = bpy.context.selected_objects
+        if len(obj_list) > 0:
+            for obj in obj_list:
+                # Check that the object has the required attributes
+                if obj.type != 'MESH' or not is_cable_model_mesh(obj.data):
+                    raise TypeError("Object: " + str(obj.name) + " is not a cable model (does not have the correct vertex attributes). Select a different object, or re-import the cable from the SWC file.")
+
+                # Upgrade cable models saved with float layers
+                ensure_cable_model_attributes(obj.data)
+
+                # Check by name if the object is already in the list
+                current_object_names = [d.name for d in self.cable_model_list]
+                if obj.name not in current_object_names:
+                    new_obj = self.cable_model_list.add()
+                    new_obj.name = obj.name
+
+    # Remove a cable model 
+    def cable_model_remove_func(self, context):
+        print("Removing cable model from the list")
+
+        if len(self.cable_model_list) > 0:
+            self.cable_model_list.remove(self.active_object_index)
+            if self.active_object_index > 0:
+                self.active_object_index -= 1
+
+    # Remove all cable models
+    def cable_model_remove_all_func(self, context):
+        print("Removing all cable models")
+
+        while len(self.cable_model_list) > 0:
+            self.cable_model_list.remove(0)
+        self.active_object_index = 0
+
+
+	###
+	# Functions to edit the cable model
+	###
+
+    # Get the cable model selected in the list of cable models, upgrading its metadata if needed
+    def get_active_cable_model(self):
+        # Get the object
+        ob = bpy.data.objects[self.get_active_cable_model_entry().name]
+
+        # Ensure the metadata is stored as typed attributes
+        ensure_cable_model_attributes(ob.data)
+
+        return ob
+
+    # Get the list entry of the active cable model
+    def get_active_cable_model_entry(self):
+        if not len(self.cable_model_list) > 0:
+            raise TypeError("List of cable models to edit is empty.")
+        return self.cable_model_list[self.active_object_index]
+
+    # Get the vertex spheres object of the active cable model
+    def get_active_vertex_spheres(self):
+        entry = self.get_active_cable_model_entry()
+        if entry.spheres_object is None:
+            raise TypeError("Cable model: " + entry.name + " has no vertex spheres. Make the spheres first.")
+        return entry.spheres_object
+
+    # Remember that the active cable model is valid in its current state
+    def mark_cable_model_verified(self, ob):
+        self.get_active_cable_model_entry().verified_fingerprint = cable_model_fingerprint(ob.data)
+
+    # Check that there are no duplicate vertices in the cable model (based on their id)
+    def check_duplicate_verts(self, context):
+
+        # Get the object
+        ob = self.get_active_cable_model()
+
+        # Nothing to do if the topology and ids are unchanged since the last check
+        if cable_model_fingerprint(ob.data) == self.get_active_cable_model_entry().verified_fingerprint:
+            return
+
+        # Regions keep their ids, so they are relinked after any change rather than renumbered
+        if self.get_active_cable_model_entry().region_of != "":
+            self.update_cable_model_post_edit(context)
+            return
+
+        # Get the idxs
+        idx_vals = read_cable_model_attribute(ob.data, "index_number")
+        n_v = len(idx_vals)
+
+        # Check against duplicates
+        if n_v > 0 and (len(np.unique(idx_vals)) != n_v or idx_vals.max() != n_v):
+            # Duplicates exist OR deletion has occurred
+            self.update_cable_model_post_edit(context)
+        else:
+            # No duplicates
+            self.mark_cable_model_verified(ob)
+
+        return
+    
+    	# Update cable model post extrusion/deletion
+    def update_cable_model_post_edit(self, context):
+        print("Updating cable model post editing.")
+
+        # Get the object
+        ob = self.get_active_cable_model()
+        ob_name = ob.name
+
+        # Number of vertices
+        n_v = len(ob.data.vertices)
+
+        # Renumber every connected piece from its root (relink regions, keeping their ids)
+        metadata = (n_v,
+                    read_edge_vertices(ob.data),
+                    read_cable_model_attribute(ob.data, "index_number"),
+                    read_cable_model_attribute(ob.data, "parent_index"),
+                    read_cable_model_attribute(ob.data, "segment_type"))
+        if self.get_active_cable_model_entry().region_of != "":
+            index_number, parent_index = core.relink_region(*metadata, ob.data[REGION_NEXT_ID_PROPERTY])
+        else:
+            index_number, parent_index = core.renumber_cable_model(*metadata)
+
+        # Write the new ids back in bulk
+        write_cable_model_attribute(ob.data, "index_number", index_number)
+        write_cable_model_attribute(ob.data, "parent_index", parent_index)
+        invalidate_cable_model_caches(ob_name)
+        self.mark_cable_model_verified(ob)
+
+        # Do spheres already exist
+        if not self.get_active_cable_model_entry().spheres_object is None:
+            # Remake all the spheres, since ids changed (their radii come from the radius attribute)
+            self.make_spheres_from_object(context)
+
+
+    # Merge the nodes of the active cable model closer than the merge distance, returns the number of nodes removed
+    def merge_close_nodes(self, context):
+        ob = self.get_active_cable_model()
+
+        with out_of_edit_mode(context, ob):
+            # Make sure the ids and parents follow the current edges
+            self.check_duplicate_verts(context)
+
+            mesh = ob.data
+            morphology = read_cable_model_morphology(mesh)
+            merged, num_merged = core.merge_close_nodes(morphology, self.merge_distance, get_node_index(ob))
+            if num_merged > 0:
+                self.replace_cable_model_mesh(context, ob, merged)
+
+        return num_merged
+
+    # Simplify the sections of the active cable model, returns the number of nodes before and after
+    def simplify_cable_model(self, context):
+        ob = self.get_active_cable_model()
+
+        with out_of_edit_mode(context, ob):
+            # Make sure the ids and parents follow the current edges
+            self.check_duplicate_verts(context)
+
+            morphology = read_cable_model_morphology(ob.data)
+            simplified = self.simplify_morphology(morphology)
+            if len(simplified) < len(morphology):
+                self.replace_cable_model_mesh(context, ob, simplified)
+
+        return len(morphology), len(simplified)
+
+    # Simplify a morphology with the simplification tolerances
+    def simplify_morphology(self, morphology):
+        simplified, num_removed = core.simplify_sections(morphology, self.simplify_position_tolerance, self.simplify_radius_tolerance)
+        print("Simplified %d nodes to %d (%.1fx fewer)" % (len(morphology), len(simplified), len(morphology) / max(len(simplified), 1)))
+        return simplified
+
+    # Resample the sections of a morphology with the resampling settings
+    def resample_morphology(self, morphology):
+        resampled = core.resample_sections(morphology, self.resample_spacing, self.resample_radius_factor)
+        print("Resampled %d nodes to %d" % (len(morphology), len(resampled)))
+        return resampled
+
+    # Simplify and/or resample a morphology before making a surface mesh from it, as set
+    def prepare_morphology_for_meshing(self, morphology):
+        if self.simplify_before_meshing:
+            morphology = self.simplify_morphology(morphology)
+        if self.resample_before_meshing:
+            morphology = self.resample_morphology(morphology)
+        return morphology
+
+    # Decimate a surface mesh made from the active cable model (see core.decimate_mesh). The radius at each vertex
+    # is that of the nearest metaball sphere of the cable model, sampled with the current surface mesh settings.
+    # Returns the numbers of triangles before and after.
+    def decimate_surface_mesh(self, context, ob):
+        cable = self.get_active_cable_model()
+        with out_of_edit_mode(context, cable):
+            morphology = read_cable_model_morphology(cable.data)
+        morphology.radius[morphology.radius < 0] = self.new_sphere_radius
+        morphology = self.prepare_morphology_for_meshing(morphology)
+        sample_co, sample_radius = core.metaball_samples_from_segments(morphology.segments(), self.scale_file_data,
+                                                                       self.min_forced_radius, self.meta_ball_scale_factor)
+
+        with out_of_edit_mode(context, ob):
+            co, triangles = read_mesh_triangles(ob.data)
+            radius = core.local_radius(co, sample_co, sample_radius)
+            co, new_triangles = core.decimate_mesh(co, triangles, radius, self.decimate_target_triangles,
+                                                   self.decimate_edge_length if self.decimate_edge_length > 0 else np.inf,
+                                                   self.decimate_radius_factor, self.decimate_min_radius)
+            write_mesh_triangles(ob.data, co, new_triangles)
+
+        print("Decimated %s from %d to %d triangles" % (ob.name, len(triangles), len(new_triangles)))
+        return len(triangles), len(new_triangles)
+
+    # Make a new cable model (added to the list and made active) from the resampled active cable model
+    def resample_cable_model(self, context):
+        ob = self.get_active_cable_model()
+
+        with out_of_edit_mode(context, ob):
+            # Make sure the ids and parents follow the current edges
+            self.check_duplicate_verts(context)
+            resampled = self.resample_morphology(read_cable_model_morphology(ob.data))
+
+        # Same place and collections as the original
+        name = ob.name + "_resampled"
+        new_mesh = new_cable_model_mesh(name + "_mesh", resampled.co, resampled.edges(), resampled.index_number,
+                                        resampled.parent_index, resampled.segment_type, resampled.radius)
+        new_obj = bpy.data.objects.new(name, new_mesh)
+        new_obj.matrix_world = ob.matrix_world.copy()
+        for collection in ob.users_collection:
+            collection.objects.link(new_obj)
+
+        # Add it to the list and make it the one being edited, with contiguous ids
+        self.cable_model_list.add().name = new_obj.name
+        self.active_object_index = len(self.cable_model_list) - 1
+        self.update_cable_model_post_edit(context)
+
+        return new_obj
+
+    # Replace the mesh of a cable model with one built from a morphology (keeping the mesh name)
+    def replace_cable_model_mesh(self, context, ob, morphology):
+        mesh = ob.data
+        mesh_name = mesh.name
+        ob.data = new_cable_model_mesh(mesh_name, morphology.co, morphology.edges(), morphology.index_number,
+                                       morphology.parent_index, morphology.segment_type, morphology.radius)
+        bpy.data.meshes.remove(mesh)
+        ob.data.name = mesh_name
+
+        # Ids are no longer contiguous: renumber (and remake the spheres)
+        self.update_cable_model_post_edit(context)
+
+    # Bring a cable model up to date with a new version of its morphology, matching nodes by id and touching
+    # only what changed: kept nodes keep their vertices (and selection), removed ones are dropped and added ones
+    # appended. Returns the core.diff_morphologies dict.
+    def apply_morphology_diff(self, context, ob, morphology):
+        mesh = ob.data
+        current = read_cable_model_morphology(mesh)
+
+        # Compare at the precision the mesh stores, so unchanged nodes are not seen as moved
+        morphology = core.Morphology(morphology.index_number, morphology.segment_type, morphology.co.astype(np.float32),
+                                     morphology.radius.astype(np.float32), morphology.parent_index)
+        diff = core.diff_morphologies(current, morphology)
+        kept_old, kept_new, added = diff["kept_old"], diff["kept_new"], diff["added"]
+
+        if len(diff["removed"]) == 0 and len(added) == 0 and len(diff["relinked"]) == 0:
+            # Same nodes and edges: write the new positions and radii in place
+            if len(diff["moved"]) > 0:
+                co = current.co.copy()
+                co[kept_old] = morphology.co[kept_new]
+                write_vertex_coords(mesh, co)
+            if len(diff["resized"]) > 0:
+                radius = current.radius.copy()
+                radius[kept_old] = morphology.radius[kept_new]
+                write_cable_model_attribute(mesh, "radius", radius)
+        else:
+            # Kept nodes stay in their order with the added ones after them; rebuild the geometry in bulk
+            rows = np.r_[kept_new, added]
+            select = np.r_[read_vertex_selection(mesh)[kept_old], np.zeros(len(added), dtype=bool)]
+            updated = morphology.take(rows)
+            mesh.clear_geometry()
+            fill_cable_model_mesh(mesh, updated.co, updated.edges(), updated.index_number,
+                                  updated.parent_index, updated.segment_type, updated.radius)
+            write_vertex_selection(mesh, select)
+        mesh.update()
+        invalidate_cable_model_caches(ob.name)
+
+        return diff
+
+    # Update the active cable model from the file it was imported from, returns the core.diff_morphologies dict
+    def reload_cable_model_from_file(self, context):
+        entry = self.get_active_cable_model_entry()
+        if entry.source_file == "":
+            raise TypeError("Cable model " + entry.name + " was not imported from a file.")
+        ob = self.get_active_cable_model()
+
+        print("Reloading " + entry.name + " from " + entry.source_file)
+        entry.source_mtime = os.path.getmtime(entry.source_file)
+        morphology = self.file_morphology_loader()(entry.source_file)
+        with out_of_edit_mode(context, ob):
+            diff = self.apply_morphology_diff(context, ob, morphology)
+
+        # Remake the spheres if there are any and anything changed
+        if entry.spheres_object is not None and any(len(diff[key]) > 0 for key in ("added", "removed", "moved", "resized", "relinked")):
+            self.make_spheres_from_object(context)
+
+        return diff
+
+    # Undo the newest step of the compact undo history: remove the objects and collections it made, bring back
+    # the cable models it changed (writing only the nodes that changed) or removed and the surface meshes it changed,
+    # and make again the vertex spheres it removed. Returns the message of the step.
+    def undo_compact_step(self, context):
+        if len(compact_undo_history) == 0:
+            raise TypeError("Nothing to undo in large data mode.")
+        step = compact_undo_history[-1]
+
+        # Objects with the names of those the step made, but not made by it, are not touched
+        for name, session_uid in step["objects"]:
+            ob = bpy.data.objects.get(name)
+            if ob is not None and ob.session_uid != session_uid:
+                raise TypeError("Object " + name + " is not the one made by " + step["message"] + ", which can no longer be undone.")
+        for name, session_uid in step["collections"]:
+            collection = bpy.data.collections.get(name)
+            if collection is not None and collection.session_uid != session_uid:
+                raise TypeError("Collection " + name + " is not the one made by " + step["message"] + ", which can no longer be undone.")
+        for removed in step["removed"]:
+            if removed["name"] in bpy.data.objects:
+                raise TypeError("An object named " + removed["name"] + " exists again: " + step["message"] + " can not be undone.")
+
+        # Cable models and surfaces edited since the step can not be taken back to before it
+        for change in step["changes"]:
+            ob = bpy.data.objects.get(change["name"])
+            if ob is None or ob.session_uid != change["session_uid"]:
+                raise TypeError("Cable model " + change["name"] + " no longer exists: " + step["message"] + " can not be undone.")
+            with out_of_edit_mode(context, ob):
+                if cable_model_fingerprint(ob.data) != change["fingerprint"]:
+                    raise TypeError("Cable model " + change["name"] + " changed after " + step["message"] + ", which can no longer be undone.")
+        for change in step["surfaces"]:
+            ob = bpy.data.objects.get(change["name"])
+            if ob is None or ob.session_uid != change["session_uid"] or (len(ob.data.vertices), len(ob.data.polygons)) != change["counts"]:
+                raise TypeError("Surface mesh " + change["name"] + " changed after " + step["message"] + ", which can no longer be undone.")
+        compact_undo_history.pop()
+
+        for name, session_uid in step["objects"]:
+            if name in bpy.data.objects:
+                remove_object_and_data(bpy.data.objects[name])
+                index = self.cable_model_list.find(name)
+                if index >= 0:
+                    self.cable_model_list.remove(index)
+        for name, session_uid in step["collections"]:
+            collection = bpy.data.collections.get(name)
+            if collection is not None and len(collection.all_objects) == 0:
+                bpy.data.collections.remove(collection)
+        self.active_object_index = min(self.active_object_index, max(len(self.cable_model_list) - 1, 0))
+
+        for change in step["changes"]:
+            ob = bpy.data.objects[change["name"]]
+            with out_of_edit_mode(context, ob):
+                if "delta" in change:
+                    before = core.revert_morphology_delta(read_cable_model_morphology(ob.data), change["delta"])
+                    self.apply_morphology_diff(context, ob, before)
+                else:
+                    before = change["morphology"]
+                    ob.data.clear_geometry()
+                    fill_cable_model_mesh(ob.data, before.co, change["edges"], before.index_number,
+                                          before.parent_index, before.segment_type, before.radius)
+                    ob.data.update()
+                    invalidate_cable_model_caches(ob.name)
+
+        for removed in step["removed"]:
+            morphology = removed["morphology"]
+            mesh = new_cable_model_mesh(removed["name"] + "_mesh", morphology.co, removed["edges"], morphology.index_number,
+                                        morphology.parent_index, morphology.segment_type, morphology.radius)
+            for key, value in removed["properties"].items():
+                mesh[key] = value
+            ob = bpy.data.objects.new(removed["name"], mesh)
+            ob.matrix_world = removed["matrix_world"]
+            for name in removed["collections"]:
+                collection = bpy.data.collections.get(name) or context.scene.collection
+                collection.objects.link(ob)
+            if removed["entry"] is not None:
+                entry = self.cable_model_list.add()
+                entry.name = ob.name
+                for key, value in removed["entry"].items():
+                    setattr(entry, key, value)
+                entry.verified_fingerprint = cable_model_fingerprint(mesh)
+
+        for change in step["surfaces"]:
+            ob = bpy.data.objects[change["name"]]
+            with out_of_edit_mode(context, ob):
+                write_mesh_triangles(ob.data, change["co"], change["triangles"])
+
+        # Selections go back onto the same objects, as long as they still have as many vertices
+        for change in step["selections"]:
+            ob = bpy.data.objects.get(change["name"])
+            if ob is not None and ob.session_uid == change["session_uid"]:
+                with out_of_edit_mode(context, ob):
+                    if len(ob.data.vertices) == len(change["select"]):
+                        write_vertex_selection(ob.data, change["select"])
+                        ob.data.update()
+
+        # Spheres are made from their cable model as it is now, so they come back after it
+        active_index = self.active_object_index
+        try:
+            for change in step["changes"] + step["removed"]:
+                index = self.cable_model_list.find(change["name"])
+                if change["spheres"] and index >= 0 and self.cable_model_list[index].spheres_object is None:
+                    self.active_object_index = index
+                    self.make_spheres_from_object(context)
+        finally:
+            self.active_object_index = active_index
+
+        print("Undid " + step["message"])
+        return step["message"]
+
+    # Take the nodes of the active cable model in the region (inside the box object, or the subtree of the node
+    # nearest the 3D cursor) out into a region cable model, added to the list and made active.
+    # Returns the number of nodes taken.
+    def extract_region(self, context):
+        ob = self.get_active_cable_model()
+
+        with out_of_edit_mode(context, ob):
+            self.check_duplicate_verts(context)
+            morphology = read_cable_model_morphology(ob.data)
+
+            if self.region_type == 'BOX':
+                box = self.region_box_object
+                if box is None:
+                    raise TypeError("Choose the object whose bounding box holds the region.")
+                corners = core.transform_points(np.array(box.matrix_world), [corner[:] for corner in box.bound_box])
+                co = core.transform_points(np.array(ob.matrix_world), morphology.co)
+                rows = np.nonzero(((co >= corners.min(axis=0)) & (co <= corners.max(axis=0))).all(axis=1))[0]
+            else:
+                center = core.transform_points(np.array(ob.matrix_world.inverted()), [context.scene.cursor.location[:]])[0]
+                row = get_node_index(ob).nearest(center)[0]
+                rows = np.sort(get_cable_model_topology(ob).subtree(row)) if row >= 0 else np.zeros(0, dtype=np.int64)
+
+        if len(rows) == 0:
+            raise TypeError("No nodes of " + ob.name + " in the region.")
+        region = morphology.take(rows)
+
+        # Same place and collections as the original
+        name = ob.name + "_region"
+        new_mesh = new_cable_model_mesh(name + "_mesh", region.co, region.edges(), region.index_number,
+                                        region.parent_index, region.segment_type, region.radius)
+        new_mesh[REGION_IDS_PROPERTY] = region.index_number.tolist()
+        new_mesh[REGION_NEXT_ID_PROPERTY] = int(morphology.index_number.max()) + 1
+        new_obj = bpy.data.objects.new(name, new_mesh)
+        new_obj.matrix_world = ob.matrix_world.copy()
+        for collection in ob.users_collection:
+            collection.objects.link(new_obj)
+
+        # Add it to the list and make it the one being edited
+        entry = self.cable_model_list.add()
+        entry.name = new_obj.name
+        entry.region_of = ob.name
+        self.active_object_index = len(self.cable_model_list) - 1
+        self.mark_cable_model_verified(new_obj)
+        bpy.ops.object.select_all(action='DESELECT')
+        new_obj.select_set(True)
+        context.view_layer.objects.active = new_obj
+
+        return len(region)
+
+    # Splice the active region back into the cable model it was taken from, changing only what the edits
+    # changed, then remove the region. Returns the core.diff_morphologies dict of the changes.
+    def merge_region(self, context):
+        entry = self.get_active_cable_model_entry()
+        if entry.region_of == "":
+            raise TypeError(entry.name + " is not a region of another cable model.")
+        if self.cable_model_list.find(entry.region_of) < 0 or bpy.data.objects.get(entry.region_of) is None:
+            raise TypeError("The cable model " + entry.region_of + " of this region is gone.")
+        region_index = self.active_object_index
+        region_ob = self.get_active_cable_model()
+        target = bpy.data.objects[entry.region_of]
+
+        # The edited region (relinked) in the coordinates of the target; it is removed after, so it stays out of Edit Mode
+        if region_ob.mode == 'EDIT':
+            context.view_layer.objects.active = region_ob
+            bpy.ops.object.mode_set(mode='OBJECT')
+        self.check_duplicate_verts(context)
+        region = read_cable_model_morphology(region_ob.data)
+        region_ids = np.array(region_ob.data[REGION_IDS_PROPERTY].to_list())
+        region.co = core.transform_points(np.array(target.matrix_world.inverted() @ region_ob.matrix_world), region.co)
+
+        # Remove the region with its spheres
+        self.delete_vertex_spheres(context)
+        bpy.data.batch_remove([region_ob, region_ob.data])
+        self.cable_model_list.remove(region_index)
+
+        # Splice it in, then renumber in bulk if new ids were added
+        self.active_object_index = self.cable_model_list.find(target.name)
+        with out_of_edit_mode(context, target):
+            spliced = core.splice_region(read_cable_model_morphology(target.data), region_ids, region)
+            diff = self.apply_morphology_diff(context, target, spliced)
+            self.check_duplicate_verts(context)
+
+        return diff
+
+    # Reload the cable models whose source files changed since they were last read.
+    # Cable models in Edit Mode are left until they are out of it.
+    def reload_changed_source_files(self, context):
+        active_index = self.active_object_index
+        try:
+            for i, entry in enumerate(self.cable_model_list):
+                ob = bpy.data.objects.get(entry.name)
+                if entry.source_file == "" or ob is None or ob.mode == 'EDIT' or not os.path.exists(entry.source_file):
+                    continue
+                if os.path.getmtime(entry.source_file) == entry.source_mtime:
+                    continue
+                self.active_object_index = i
+                try:
+                    self.reload_cable_model_from_file(context)
+                except Exception as e:
+                    print("Reload failure: " + entry.name + ": " + str(e))
+        finally:
+            self.active_object_index = active_index
+
+    # Move each selected node of the active cable model onto its nearest unselected node, returns the number moved
+    def snap_to_nearest_node(self, context):
+        ob = self.get_active_cable_model()
+
+        with out_of_edit_mode(context, ob):
+            mesh = ob.data
+            select = read_vertex_selection(mesh)
+            co = read_vertex_coords(mesh)
+
+            # Look up all the selected nodes at once in an index of the unselected ones
+            unselected = np.nonzero(~select)[0]
+            rows, distance = core.NodeIndex(co[unselected]).nearest_rows(co[select])
+            snapped = rows >= 0
+            moved = np.nonzero(select)[0][snapped]
+            co[moved] = co[unselected[rows[snapped]]]
+            num_snapped = len(moved)
+            write_vertex_coords(mesh, co)
+            mesh.update()
+
+        return num_snapped
+
+    # Add every node within the search radius of a selected node to the selection, returns the number selected
+    def select_nodes_in_radius(self, context):
+        ob = self.get_active_cable_model()
+
+        with out_of_edit_mode(context, ob):
+            mesh = ob.data
+            select = read_vertex_selection(mesh)
+            co = read_vertex_coords(mesh)
+
+            # Every node near any selected node, in one query against an index of the selected nodes
+            new_select = select | core.NodeIndex(co[select]).within(co, self.node_search_radius)
+            write_vertex_selection(mesh, new_select)
+            mesh.update()
+
+        return int(new_select.sum())
+
+    # Add spheres to the cable model for visualizing the vertices
+    # All spheres are instances of one sphere mesh, placed by a geometry nodes modifier
+    # on a vertex-only mesh that carries the id and radius of each cable vertex
+    def make_spheres_from_object(self, context):
+        # Get the object
+        ob = self.get_active_cable_model()
+        ob_name = ob.name
+
+        # Ensure that the object is ok post any extrusion/deletion of vertices that may have occured
+        self.check_duplicate_verts(context)
+
+        # Replace any existing spheres
+        self.delete_vertex_spheres(context)
+
+        # Positions, radii and ids
+        co = read_vertex_coords(ob.data)
+        radius = read_cable_model_attribute(ob.data, "radius")
+        radius[radius < 0] = self.new_sphere_radius
+        index_number = read_cable_model_attribute(ob.data, "index_number")
+
+        # Make one vertex per sphere, in the cable model's own coordinates
+        spheres_name = vertex_spheres_name(ob_name)
+        mesh = bpy.data.meshes.new(spheres_name + "_mesh")
+        mesh.vertices.add(len(co))
+        write_vertex_coords(mesh, co)
+        mesh.attributes.new(name="index_number", type='INT', domain='POINT')
+        mesh.attributes.new(name="radius", type='FLOAT', domain='POINT')
+        write_cable_model_attribute(mesh, "index_number", index_number)
+        write_cable_model_attribute(mesh, "radius", radius)
+        mesh.update()
+
+        # Make the object and place it on top of the cable model, in a collection of its own
+        spheres_collection = bpy.data.collections.new(spheres_name)
+        context.scene.collection.children.link(spheres_collection)
+        spheres_ob = bpy.data.objects.new(spheres_name, mesh)
+        spheres_ob.matrix_world = ob.matrix_world.copy()
+        spheres_collection.objects.link(spheres_ob)
+
+        # Register them with the cable model
+        entry = self.get_active_cable_model_entry()
+        entry.spheres_collection = spheres_collection
+        entry.spheres_object = spheres_ob
+
+        # Instance a sphere on each vertex
+        modifier = spheres_ob.modifiers.new(name="Vertex Spheres", type='NODES')
+        modifier.node_group = get_vertex_spheres_node_group()
+
+        # The spheres start out in sync with the cable model
+        sphere_sync_snapshots[spheres_name] = (co, radius, np.array(ob.matrix_world.inverted() @ spheres_ob.matrix_world))
+
+    # Update the cable model based on the sphere locations
+    def update_cable_model_from_spheres(self, context):
+        # Get the object
+        ob = self.get_active_cable_model()
+
+        # Get the spheres
+        spheres_ob = self.get_active_vertex_spheres()
+
+        # Forget the last sync so every sphere is written
+        sphere_sync_snapshots.pop(spheres_ob.name, None)
+        self.sync_cable_model_from_spheres(ob, spheres_ob)
+
+    # Write the spheres that changed since the last sync back to the cable model, returns the number of vertices written
+    def sync_cable_model_from_spheres(self, ob, spheres_ob):
+        # Sphere positions, radii and ids
+        sphere_co, sphere_radius, sphere_index = read_vertex_spheres(spheres_ob)
+        mat = np.array(ob.matrix_world.inverted() @ spheres_ob.matrix_world)
+
+        # Find the spheres that moved or changed radius since the last sync
+        snapshot = sphere_sync_snapshots.get(spheres_ob.name)
+        if snapshot is not None and len(snapshot[0]) == len(sphere_co) and np.array_equal(snapshot[2], mat):
+            changed = np.nonzero((sphere_co != snapshot[0]).any(axis=1) | (sphere_radius != snapshot[1]))[0]
+        else:
+            changed = np.arange(len(sphere_co))
+        sphere_sync_snapshots[spheres_ob.name] = (sphere_co, sphere_radius, mat)
+        if len(changed) == 0:
+            return 0
+
+        # Match the changed spheres to the vertices with the same id; other vertices keep their current values
+        mesh = ob.data
+        i_v, i_sphere = core.match_index_numbers(read_cable_model_attribute(mesh, "index_number"), sphere_index[changed])
+        new_co = core.transform_points(mat, sphere_co[changed[i_sphere]])
+        new_radius = sphere_radius[changed[i_sphere]]
+
+        if len(i_v) < SPHERE_SYNC_BULK_THRESHOLD:
+            # A few spheres (typically an interactive edit): write just those vertices
+            radius_data = mesh.attributes["radius"].data
+            for i, c, r in zip(i_v.tolist(), new_co.tolist(), new_radius.tolist()):
+                mesh.vertices[i].co = c
+                radius_data[i].value = r
+        else:
+            # Many spheres: update the vertex data on the cable model in bulk
+            co = read_vertex_coords(mesh)
+            radius = read_cable_model_attribute(mesh, "radius")
+            co[i_v] = new_co
+            radius[i_v] = new_radius
+            write_vertex_coords(mesh, co)
+            write_cable_model_attribute(mesh, "radius", radius)
+        mesh.update()
+
+        return len(i_v)
+
+    # Set the radius of the selected vertex spheres to the new sphere radius
+    def set_vertex_sphere_radius(self, context):
+        spheres_ob = self.get_active_vertex_spheres()
+        select, radius = read_vertex_sphere_radii(spheres_ob)
+        radius[select] = self.new_sphere_radius
+        write_vertex_sphere_radii(spheres_ob, select, radius)
+
+
+    # Export a cable model to an SWC file
+    def export_cable_model(self, context, fpath):
+        # Construct the file to open
+        if not fpath.endswith(".swc"):
+            fpath += ".swc"
+
+        # Write things
+        swc_data = self.get_swc_from_mesh_stick(context)
+        if swc_data is None:
+            print("Unable to save file")
+        else:
+            core.write_swc(fpath, *swc_data)
+
+
+    # Show/Hide all vertex spheres
+    def hide_vertex_spheres(self, context, flag):
+        # Show/Hide the whole collection of spheres
+        entry = self.get_active_cable_model_entry()
+        if entry.spheres_collection is not None:
+            entry.spheres_collection.hide_viewport = flag
+
+    # Delete all vertex spheres
+    def delete_vertex_spheres(self, context):
+        entry = self.get_active_cable_model_entry()
+
+        # Delete the spheres object, its mesh and its collection in one go
+        ids = [entry.spheres_object, entry.spheres_collection]
+        if entry.spheres_object is not None:
+            sphere_sync_snapshots.pop(entry.spheres_object.name, None)
+            ids.append(entry.spheres_object.data)
+        bpy.data.batch_remove([i for i in ids if i is not None])
+        entry.spheres_object = None
+        entry.spheres_collection = None
+
+
+    ###
+	# Functions to run an operation over many cable models
+	###
+
+    # Indexes of the cable models that batch operations apply to
+    def get_batch_indexes(self):
+        if self.batch_scope == 'CHECKED':
+            return [i for i, d in enumerate(self.cable_model_list) if d.batch_selected]
+        return list(range(len(self.cable_model_list)))
+
+    # The objects of the batch cable models that exist
+    def get_batch_objects(self):
+        names = [self.cable_model_list[i].name for i in self.get_batch_indexes()]
+        return [bpy.data.objects[name] for name in names if name in bpy.data.objects]
+
+    # Make each batch cable model active in turn and call step(context) on it.
+    # A step may return (future, finish) to carry on in a worker thread; finish(result) then runs here once the future is done.
+    # Returns the number of cable models processed and a list of failures.
+    def run_batch(self, context, step):
+        indexes = self.get_batch_indexes()
+        if len(indexes) == 0:
+            raise TypeError("No cable models to process. Add cable models to the list, or check some of them.")
+
+        active_index = self.active_object_index
+        wm = context.window_manager
+        wm.progress_begin(0, 2 * len(indexes))
+        progress = 0
+        failures = []
+        pending = []
+        try:
+            # Steps that need Blender data run here, one cable model at a time
+            for i in indexes:
+                self.active_object_index = i
+                name = self.cable_model_list[i].name
+                try:
+                    result = step(context)
+                except Exception as e:
+                    failures.append(name + ": " + str(e))
+                    result = None
+                if result is not None:
+                    pending.append((name, result))
+                progress += 1
+                wm.progress_update(progress)
+
+            # Collect the work done in parallel
+            for name, (future, finish) in pending:
+                try:
+                    finish(future.result())
+                except Exception as e:
+                    failures.append(name + ": " + str(e))
+                progress += 1
+                wm.progress_update(progress)
+        finally:
+            wm.progress_end()
+            self.active_object_index = active_index
+
+        for failure in failures:
+            print("Batch failure: " + failure)
+
+        return len(indexes), failures
+
+    # Find the contacts between the batch cable models in world coordinates (see core.find_contacts), print them,
+    # and select the nodes nearest to them if marking is on. Returns the gaps of the contacts.
+    def find_cable_model_contacts(self, context):
+        objects = [bpy.data.objects[self.cable_model_list[i].name] for i in self.get_batch_indexes()]
+        if len(objects) < 2:
+            raise TypeError("Finding contacts needs at least two cable models.")
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        morphologies = []
+        for ob in objects:
+            morphology = read_cable_model_morphology(ob.data)
+            morphology.co = core.transform_points(ob.matrix_world, morphology.co)
+            morphology.radius[morphology.radius < 0] = self.new_sphere_radius
+            morphologies.append(morphology)
+
+        contacts = core.find_contacts(morphologies, self.contact_gap)
+        for a, node_a, b, node_b, gap, location in zip(*(contacts[key].tolist() for key in
+                ("morphology_a", "node_a", "morphology_b", "node_b", "gap", "location"))):
+            print("Contact: %s node %d and %s node %d, gap %g at (%g, %g, %g)" % ((
+                objects[a].name, morphologies[a].index_number[node_a], objects[b].name, morphologies[b].index_number[node_b], gap) + tuple(location)))
+
+        if self.mark_contacts:
+            for k, ob in enumerate(objects):
+                select = np.zeros(len(morphologies[k]), dtype=bool)
+                select[contacts["node_a"][contacts["morphology_a"] == k]] = True
+                select[contacts["node_b"][contacts["morphology_b"] == k]] = True
+                write_vertex_selection(ob.data, select)
+                ob.data.update()
+
+        return contacts["gap"].tolist()
+
+    # Validate (and renumber if needed) all batch cable models
+    def batch_check_duplicate_verts(self, context):
+        return self.run_batch(context, self.check_duplicate_verts)
+
+    # Export all batch cable models to SWC files named after them in a directory
+    def batch_export_cable_models(self, context, directory):
+        directory = bpy.path.abspath(directory)
+        with ThreadPoolExecutor() as pool:
+            def step(context):
+                fpath = os.path.join(directory, self.get_active_cable_model_entry().name + ".swc")
+                swc_data = self.get_swc_from_mesh_stick(context)
+                return pool.submit(core.write_swc, fpath, *swc_data), lambda result: None
+            return self.run_batch(context, step)
+
+    # Make a surface mesh for each batch cable model
+    def batch_build_neuron_meta(self, context):
+        with ThreadPoolExecutor() as pool:
+            def step(context):
+                name = self.get_active_cable_model_entry().name + "_surface"
+                segments = self.read_segments_from_object(context)
+                future = pool.submit(core.metaball_samples_from_segments, segments, self.scale_file_data, self.min_forced_radius, self.meta_ball_scale_factor)
+                return future, lambda samples: self.build_neuron_meta_from_samples(context, samples[0], samples[1], name)
+            return self.run_batch(context, step)
+
+
+    ###
+	# Functions to import a circuit of placed cells
+	###
+
+    # A function reading a morphology file for import, repaired and simplified (or resampled) as set for
+    # cable models or surface meshes. It only calls the core with settings read here, so it can run in worker threads.
+    def file_morphology_loader(self, surface=False):
+        repair = self.repair_renumber or self.repair_reroot or self.repair_clamp_radii
+        repair_settings = dict(renumber=self.repair_renumber, reroot=self.repair_reroot,
+                               min_radius=self.repair_min_radius if self.repair_clamp_radii else None)
+        simplify = self.simplify_before_meshing if surface else self.simplify_on_import
+        resample = surface and self.resample_before_meshing
+        tolerances = (self.simplify_position_tolerance, self.simplify_radius_tolerance)
+        resampling = (self.resample_spacing, self.resample_radius_factor)
+        sampling = (self.scale_file_data, self.min_forced_radius, self.meta_ball_scale_factor)
+
+        # Returns the Morphology, or its metaball samples for surface meshes
+        def load(file_name):
+            morphology = core.read_morphology(file_name)
+            if repair and any(len(rows) > 0 for rows in core.validate_morphology(morphology).values()):
+                morphology, repairs, notes = repair_morphology(morphology, **repair_settings)
+                for note in notes:
+                    print(file_name + ": " + note)
+            if simplify:
+                morphology = core.simplify_sections(morphology, *tolerances)[0]
+            if resample:
+                morphology = core.resample_sections(morphology, *resampling)
+            if surface:
+                return core.metaball_samples_from_segments(morphology.segments(), *sampling)
+            return morphology
+
+        return load
+
+    # Import the circuit table. Each morphology is read once (all of them in parallel) and made into one
+    # cable model or surface mesh, then each cell is an object linked to the mesh of its morphology and
+    # placed by its own transform, so memory grows with the number of morphologies rather than cells.
+    # Returns the number of cells placed, the number of morphologies they share and a list of failures.
+    def import_circuit(self, context):
+        file_name = bpy.path.abspath(self.circuit_file_name)
+        morphology_files, cell_names, matrices = core.read_circuit(file_name)
+        unique_files, cell_morphology = np.unique(np.asarray(morphology_files, dtype=str), return_inverse=True)
+        print("Circuit of %d cells with %d morphologies" % (len(cell_names), len(unique_files)))
+
+        surface = self.circuit_instance_type == 'SURFACE'
+        if surface:
+            # Surface meshes are scaled as they are made, so their positions must be too
+            matrices[:, :3, 3] *= self.scale_file_data
+
+        load = self.file_morphology_loader(surface)
+        meshes = [None] * len(unique_files)
+        failures = []
+        wm = context.window_manager
+        wm.progress_begin(0, len(unique_files) + 1)
+        try:
+            with ThreadPoolExecutor() as pool:
+                futures = [pool.submit(load, str(f)) for f in unique_files]
+
+                # Make the shared meshes here as the morphologies come in
+                for i, future in enumerate(futures):
+                    base_name = core.morphology_base_name(str(unique_files[i]))
+                    try:
+                        if surface:
+                            co, radius = future.result()
+                            meshes[i] = self.new_surface_mesh(context, co, radius, base_name + "_surface")
+                        else:
+                            m = future.result()
+                            meshes[i] = new_cable_model_mesh(base_name + "_mesh", m.co, m.edges(), m.index_number,
+                                                             m.parent_index, m.segment_type, m.radius)
+                    except Exception as e:
+                        failures.append(base_name + ": " + str(e))
+                    wm.progress_update(i + 1)
+
+            # One object per cell, all in a collection named after the table
+            collection = bpy.data.collections.new(os.path.splitext(os.path.basename(file_name))[0])
+            context.scene.collection.children.link(collection)
+            num_cells = 0
+            for name, i, matrix in zip(cell_names, cell_morphology, matrices):
+                if meshes[i] is None:
+                    continue
+                obj = bpy.data.objects.new(name, meshes[i])
+                obj.matrix_world = mathutils.Matrix(matrix.tolist())
+                collection.objects.link(obj)
+                num_cells += 1
+        finally:
+            wm.progress_end()
+
+        for failure in failures:
+            print("Circuit failure: " + failure)
+
+        return num_cells, len(unique_files) - len(failures), failures
+
+
+    ###
+	# Functions to make the surface mesh
+	###
+
+    def file_name_change ( self ):
+        self.read_segments_from_file()
+        # self.file_analyzed = True
+
+    def read_segments_from_object(self, context):
+        # Read from the selected cable model in the list
+        obj = self.get_active_cable_model()
+
+        # Make sure it's active and selected
+        context.view_layer.objects.active = obj
+        obj.select_set(True)
+
+        mesh = obj.data
+        print("Mesh has " + str(len(mesh.vertices)) + " verts")
+
+        # Read the coordinates and metadata in bulk
+        morphology = read_cable_model_morphology(mesh)
+        morphology.radius[morphology.radius < 0] = self.new_sphere_radius
+        morphology = self.prepare_morphology_for_meshing(morphology)
+
+        # Create the list of segments - one for each child that has a parent
+        segments = morphology.segments()
+        if self.num_segs_limit > 0:
+            # Limit the number of segments
+            segments = segments[:self.num_segs_limit]
+
+        self.num_lines_in_file = len(morphology)
+        self.num_nodes_in_file = len(morphology)
+        self.num_segments_in_file = len(segments)
+
+        self.perform_analysis(segments)
+
+        return segments
+
+
+    def read_segments_from_file(self, for_meshing=False):
+        morphology = self.read_morphology_from_file()
+
+        # Simplify or resample the sections
+        if for_meshing:
+            morphology = self.prepare_morphology_for_meshing(morphology)
+
+        segments = morphology.segments()
+        if self.num_segs_limit > 0:
+            # Limit the number of segments
+            segments = segments[:self.num_segs_limit]
+        self.num_segments_in_file = len(segments)
+
+        self.perform_analysis(segments)
+
+        return segments
+
+    # Read the file (in any supported format, compressed or not), validate it and apply the repairs that are turned on
+    def read_morphology_from_file(self):
+        print("Reading from file " + self.neuron_file_name)
+
+        morphology, self.num_lines_in_file = core.read_morphology_file(self.neuron_file_name)
+        self.num_nodes_in_file = len(morphology)
+
+        lines = core.describe_problems(morphology, core.validate_morphology(morphology))
+        if len(lines) > 0 and (self.repair_renumber or self.repair_reroot or self.repair_clamp_radii):
+            morphology, repairs, notes = repair_morphology(morphology, renumber=self.repair_renumber, reroot=self.repair_reroot,
+                                                           min_radius=self.repair_min_radius if self.repair_clamp_radii else None)
+            lines += notes + ["Repaired: " + repair for repair in repairs]
+
+        self.validation_summary = "\n".join(lines)
+        for line in lines:
+            print("Validation: " + line)
+
+        return morphology
+
+    def perform_analysis(self, segments):
+        # Find the bounds and the smallest and largest radius
+        for key, value in core.analyze_segments(segments).items():
+            setattr(self, key, value)
+
+        print("X range: %g to %g" % (self.min_x, self.max_x))
+        print("Y range: %g to %g" % (self.min_y, self.max_y))
+        print("Z range: %g to %g" % (self.min_z, self.max_z))
+        print("Largest radius = " + str(self.largest_radius_in_file))
+        print("Smallest radius = " + str(self.smallest_radius_in_file))
+
+        self.file_analyzed = True
+
+
+    # Convert the current stick mesh into swc format arrays (n, T, xyz, R, P) ordered by index
+
+    def get_swc_from_mesh_stick(self, context):
+        # Check that each id is assigned to only one vertex
+        self.check_duplicate_verts(context)
+
+        # Get the object
+        ob = self.get_active_cable_model()
+
+        # Get the data stored on the vertices, ordered by index
+        index_number, parent_index, segment_type, radius = read_cable_model_attributes(ob.data)
+        order = np.argsort(index_number, kind='stable')
+
+        # Move all vertices to world coordinates at once
+        co = core.transform_points(ob.matrix_world, read_vertex_coords(ob.data)[order])
+
+        # Unset radii get the new sphere radius
+        radius = radius[order].astype(np.float64)
+        radius[radius < 0] = self.new_sphere_radius
+
+        return index_number[order], segment_type[order], co, radius, parent_index[order]
+
+    # Build a cable display (a curve, see new_cable_display_curve) from the file, for cells too large to edit whole
+    def build_cable_display_from_file(self, context):
+        morphology = self.read_morphology_from_file()
+        self.num_segments_in_file = len(morphology.edges())
+        if self.simplify_on_import:
+            morphology = self.simplify_morphology(morphology)
+
+        base_name = core.morphology_base_name(self.neuron_file_name)
+        new_obj = bpy.data.objects.new(base_name + "_cable_display", new_cable_display_curve(base_name + "_curve", morphology))
+        context.scene.collection.objects.link(new_obj)
+
+        bpy.ops.object.select_all(action='DESELECT')
+        new_obj.select_set(True)
+        context.view_layer.objects.active = new_obj
+        return new_obj
+
+    # Make a cable model (added to the list and made active) from the nodes of a cable display in the display region.
+    # Returns the number of nodes converted.
+    def cable_model_from_display(self, context, ob):
+        morphology = read_cable_display_morphology(ob.data)
+        if self.display_region == 'CURSOR':
+            # The cursor in the display's own coordinates
+            center = core.transform_points(np.array(ob.matrix_world.inverted()), [context.scene.cursor.location[:]])[0]
+            rows = np.sort(core.NodeIndex(morphology.co).query_radius(center, self.display_region_radius))
+            morphology = morphology.take(rows)
+        if len(morphology) == 0:
+            raise TypeError("No nodes of " + ob.name + " within %g of the 3D cursor." % self.display_region_radius)
+
+        name = ob.name + ("_region" if self.display_region == 'CURSOR' else "_cable_model")
+        new_mesh = new_cable_model_mesh(name + "_mesh", morphology.co, morphology.edges(), morphology.index_number,
+                                        morphology.parent_index, morphology.segment_type, morphology.radius)
+        new_obj = bpy.data.objects.new(name, new_mesh)
+        new_obj.matrix_world = ob.matrix_world.copy()
+        for collection in ob.users_collection:
+            collection.objects.link(new_obj)
+
+        # Add it to the list and make it the one being edited
+        self.cable_model_list.add().name = new_obj.name
+        self.active_object_index = len(self.cable_model_list) - 1
+        bpy.ops.object.select_all(action='DESELECT')
+        new_obj.select_set(True)
+        context.view_layer.objects.active = new_obj
+
+        return len(morphology)
+
+    def build_neuron_stick_from_file(self, context):
+        # Read the file, updating the display
+        morphology = self.read_morphology_from_file()
+        segments = morphology.segments()
+        self.num_segments_in_file = len(segments)
+        self.perform_analysis(segments)
+
+        base_name = core.morphology_base_name(self.neuron_file_name)
+        if self.simplify_on_import:
+            morphology = self.simplify_morphology(morphology)
+
+        print("Making the mesh:")
+
+        # Build the Blender mesh with the metadata on each vertex
+        new_mesh = new_cable_model_mesh(base_name + "_mesh", morphology.co, morphology.edges(),
+                                        morphology.index_number, morphology.parent_index,
+                                        morphology.segment_type, morphology.radius)
+        new_obj = bpy.data.objects.new(base_name + "_cable_model", new_mesh)
+        context.scene.collection.objects.link(new_obj)
+
+        # Finally, add the new cable model to the list of cable models to edit, remembering its source
+        entry = self.cable_model_list.add()
+        entry.name = new_obj.name
+        entry.source_file = bpy.path.abspath(self.neuron_file_name)
+        entry.source_mtime = os.path.getmtime(entry.source_file)
+
+        # Deselect all objects currently selected
+        bpy.ops.object.select_all(action='DESELECT')
+
+        # Select the new obj and make it active
+        new_obj.select_set(True)
+        context.view_layer.objects.active = new_obj
+
+        # Switch to Edit Mode
+        bpy.ops.object.mode_set(mode='EDIT')
+
+        # Select all vertices
+        bpy.ops.mesh.select_all(action='SELECT')
+
+        # Switch back to Object Mode
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+        # Update the context to reflect changes
+        bpy.context.view_layer.update()
+
+        # Notify the user
+        # self.report({'INFO'}, "Neuron stick figure created from file.")
+
+    def build_neuron_meta_from_segments(self, context, segments, name="Neuron"):
+        # Generate the metashape spheres from the branch segments
+        co, radius = core.metaball_samples_from_segments(segments, self.scale_file_data, self.min_forced_radius, self.meta_ball_scale_factor)
+        return self.build_neuron_meta_from_samples(context, co, radius, name)
+
+    def build_neuron_meta_from_samples(self, context, co, radius, name="Neuron"):
+        obj = self.new_metaball_object(context, co, radius, name)
+
+        if self.convert_to_mesh:
+            bpy.ops.object.convert()
+
+        obj.select_set(True)
+
+        return obj
+
+    # Make a meta object with a sphere at each sample
+    def new_metaball_object(self, context, co, radius, name):
+        # Create the object to hold the metaballs
+        # Note that meta objects whose names share the same base name are merged into one surface
+        scene = bpy.context.scene
+        mball = bpy.data.metaballs.new(name.lower())
+        obj = bpy.data.objects.new(name, mball)
+        scene.collection.objects.link(obj)
+        mball.resolution = self.mesh_resolution
+        mball.render_resolution = self.mesh_resolution
+
+        print("=== Building " + str(len(co)) + " meta balls for " + name + " ===")
+
+        # Make all the spheres, then set their centers and radii in bulk
+        # (the metaball API has no bulk add, so elements can only be created one call at a time)
+        add_element = mball.elements.new
+        for i in range(len(co)):
+            add_element()
+        mball.elements.foreach_set("co", np.ascontiguousarray(co, dtype=np.float32).ravel())
+        mball.elements.foreach_set("radius", np.ascontiguousarray(radius, dtype=np.float32))
+
+        return obj
+
+    # Make a surface mesh from metaball samples without leaving the meta object behind
+    def new_surface_mesh(self, context, co, radius, name):
+        obj = self.new_metaball_object(context, co, radius, name)
+        mball = obj.data
+        mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(context.evaluated_depsgraph_get()))
+        mesh.name = name + "_mesh"
+        bpy.data.objects.remove(obj)
+        bpy.data.metaballs.remove(mball)
+        return mesh
+
+
+
+
+
+classes = (
+    MakeNeuronMeta_Panel,
+    MakeNeuronStick_Operator,
+    MakeCableDisplay_Operator,
+    ConvertCableDisplay_Operator,
+    ImportCircuit_Operator,
+    MakeEmptyStick_Operator,
+    UpdateCablePostEdit_Operator,
+    ReloadCableModel_Operator,
+    ExtractRegion_Operator,
+    MergeRegion_Operator,
+    MergeCloseNodes_Operator,
+    SnapToNearestNode_Operator,
+    SelectNodesInRadius_Operator,
+    SimplifyCableModel_Operator,
+    ResampleCableModel_Operator,
+    ExportCableModel_Operator,
+    ExportSurfaceMesh_Operator,
+    CheckSurfaceMesh_Operator,
+    DecimateSurfaceMesh_Operator,
+    MakeSpheres_Operator,
+    UpdateCableFromSpheres_Operator,
+    ShowVertexSpheres_Operator,
+    HideVertexSpheres_Operator,
+    SetVertexSphereRadius_Operator,
+    ScaleVertexSpheres_Operator,
+    DeleteAllVertexSpheres_Operator,
+    CableModelObject,
+    SWCMesher_UL_object,
+    CableModelAdd,
+    CableModelRemove,
+    CableModelRemoveAll,
+    MakeNeuronFromFile_Operator,
+    MakeNeuronFromData_Operator,
+    BatchUpdateCablePostEdit_Operator,
+    FindContacts_Operator,
+    BatchExportCableModels_Operator,
+    BatchMakeNeuronFromData_Operator,
+    SWCMesherPreferences,
+    CompactUndo_Operator,
+    MakeNeuronMetaAnalyze_Operator,
+    MakeNeuronMetaPropGroup
+)
+
+# Operators that run bulk operations through compact_undo_step, out of global undo in large data mode
+COMPACT_UNDO_OPERATORS = (
+    MakeNeuronStick_Operator,
+    MakeCableDisplay_Operator,
+    ConvertCableDisplay_Operator,
+    ImportCircuit_Operator,
+    UpdateCablePostEdit_Operator,
+    ReloadCableModel_Operator,
+    ExtractRegion_Operator,
+    MergeRegion_Operator,
+    MergeCloseNodes_Operator,
+    SnapToNearestNode_Operator,
+    SelectNodesInRadius_Operator,
+    ResampleCableModel_Operator,
+    SimplifyCableModel_Operator,
+    DecimateSurfaceMesh_Operator,
+    MakeSpheres_Operator,
+    UpdateCableFromSpheres_Operator,
+    DeleteAllVertexSpheres_Operator,
+    MakeNeuronFromFile_Operator,
+    MakeNeuronFromData_Operator,
+    FindContacts_Operator,
+    BatchUpdateCablePostEdit_Operator,
+    BatchMakeNeuronFromData_Operator,
+)
+
+
+
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+    bpy.types.Scene.make_neuron_meta = bpy.props.PointerProperty(type=MakeNeuronMetaPropGroup)
+    bpy.app.handlers.depsgraph_update_post.append(vertex_spheres_depsgraph_update)
+    bpy.app.handlers.load_post.append(compact_undo_load_post)
+    set_global_undo(not get_preferences().compact_undo)
+
+def unregister():
+    if compact_undo_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(compact_undo_load_post)
+    if vertex_spheres_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(vertex_spheres_depsgraph_update)
+    if bpy.app.timers.is_registered(sync_pending_vertex_spheres):
+        bpy.app.timers.unregister(sync_pending_vertex_spheres)
+    if bpy.app.timers.is_registered(watch_source_files):
+        bpy.app.timers.unregister(watch_source_files)
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
+    del bpy.types.Scene.make_neuron_meta
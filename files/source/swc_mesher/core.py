@@ -0,0 +1,1994 @@
+# Core of the SWC Mesher: parsing, morphology, analysis, metaball samples, and SWC and surface mesh export.
+# This module only depends on NumPy, so it can be imported, tested and profiled outside of Blender.
+# The Blender add-on (addon.py) is a thin layer that moves data between these functions and Blender.
+
+import bz2
+import csv
+import gzip
+import lzma
+import numpy as np
+from os.path import basename, dirname, isabs, join
+
+
+#######################################################
+#######################################################
+# Morphology
+#######################################################
+#######################################################
+
+# A neuron morphology as arrays with one row per node, following the columns of an SWC file:
+#   n (index_number), T (segment_type), x y z (co), R (radius), P (parent_index)
+class Morphology:
+
+    def __init__(self, index_number, segment_type, co, radius, parent_index):
+        self.index_number = np.asarray(index_number, dtype=np.int64)
+        self.segment_type = np.asarray(segment_type, dtype=np.int32)
+        self.co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+        self.radius = np.asarray(radius, dtype=np.float64)
+        self.parent_index = np.asarray(parent_index, dtype=np.int64)
+        self.topology_cache = None
+
+    def __len__(self):
+        return len(self.index_number)
+
+    # The Topology of the morphology, built on first use and kept until invalidate_topology is called
+    def topology(self):
+        if self.topology_cache is None:
+            self.topology_cache = Topology(self.parent_rows(), self.co)
+        return self.topology_cache
+
+    # Forget the cached Topology; call this after editing the parents (or the positions) in place
+    def invalidate_topology(self):
+        self.topology_cache = None
+
+    # The nodes at rows (an array of rows or a boolean mask) as a new Morphology. Parents left out keep
+    # their index numbers in parent_index, so those nodes are roots of the new morphology's topology.
+    def take(self, rows):
+        return Morphology(self.index_number[rows], self.segment_type[rows], self.co[rows],
+                          self.radius[rows], self.parent_index[rows])
+
+    # Row of the parent of each node, or -1 when the parent is not in the morphology
+    def parent_rows(self):
+        rows = np.full(len(self), -1, dtype=np.int64)
+        i_parent, i_child = match_index_numbers(self.index_number, self.parent_index)
+        rows[i_child] = i_parent
+        return rows
+
+    # Edges as an (m, 2) array of (parent row, child row), one for each node that has a parent
+    def edges(self):
+        parent = self.parent_rows()
+        has_parent = parent >= 0
+        return np.column_stack((parent[has_parent], np.nonzero(has_parent)[0]))
+
+    # Segments from parent to child as [[px, py, pz, pr], [cx, cy, cz, cr]], ordered by child index number
+    def segments(self):
+        edges = self.edges()
+        edges = edges[np.argsort(self.index_number[edges[:, 1]], kind='stable')]
+        points = np.column_stack((self.co, self.radius))
+        return np.stack((points[edges[:, 0]], points[edges[:, 1]]), axis=1).tolist()
+
+
+#######################################################
+#######################################################
+# Topology
+#######################################################
+#######################################################
+
+# Follow links (a row per node, -1 at the end of a chain) to the end of each chain by pointer doubling,
+# in O(n log length). Returns the number of links followed from each node (or the sum of the weights of
+# those links, weights[i] being that of the link from node i) and the row where its chain ends.
+# Raises ValueError if the links contain a cycle.
+def follow_links(links, weights=None):
+    links = np.asarray(links, dtype=np.int64)
+    rows = np.arange(len(links))
+    pointer = np.where(links >= 0, links, rows)
+    if weights is None:
+        steps = (links >= 0).astype(np.int64)
+    else:
+        steps = np.where(links >= 0, weights, 0.0)
+    for i in range(64):
+        next_pointer = pointer[pointer]
+        if np.array_equal(next_pointer, pointer):
+            # Every chain must end at a node without a link; a cycle whose length is a power
+            # of two also stops moving, but at a node that still has one
+            if (links[pointer] >= 0).any():
+                break
+            return steps, pointer
+        steps = steps + steps[pointer]
+        pointer = next_pointer
+    raise ValueError("The parent links of the morphology contain a cycle.")
+
+
+# Index of the tree structure of a morphology, built once in O(n log n) from the parent row of each node.
+#   children of node i:   children[child_offsets[i]:child_offsets[i + 1]]
+#   roots, branch_points (2 or more children) and tips (no children)
+#   sections:             unbranched runs of nodes, from a root or a child of a branch point down to a
+#                         branch point or tip; section s is section_nodes[section_offsets[s]:section_offsets[s + 1]]
+#                         in order from its head, and section_parent[s] is the section it hangs from (or -1)
+#   section_of[i]:        section of node i
+#   branch_order[i]:      number of branch points above node i (0 in the section of a root)
+#   depth[i]:             number of parent links from node i up to its root
+#   path_distance[i]:     length of the path from the root to node i (when positions are given)
+#   preorder:             rows in depth first order, each section in order before the sections hanging from it;
+#                         the subtree of node i is preorder[preorder_position[i]:subtree_end[i]]
+# The index does not follow edits: build a new one (or invalidate the cached one) after changing the parents.
+class Topology:
+
+    def __init__(self, parent_rows, co=None):
+        self.parent = np.asarray(parent_rows, dtype=np.int64)
+        n = len(self.parent)
+        has_parent = self.parent >= 0
+
+        # Children lists
+        self.num_children = np.bincount(self.parent[has_parent], minlength=n)
+        self.child_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.num_children, out=self.child_offsets[1:])
+        child_rows = np.nonzero(has_parent)[0]
+        self.children = child_rows[np.argsort(self.parent[has_parent], kind='stable')]
+        self.roots = np.nonzero(~has_parent)[0]
+        self.branch_points = np.nonzero(self.num_children >= 2)[0]
+        self.tips = np.nonzero(self.num_children == 0)[0]
+        self.depth = follow_links(self.parent)[0]
+
+        # Sections: every node belongs to the section of the nearest head at or above it
+        is_head = ~has_parent
+        is_head[has_parent] = self.num_children[self.parent[has_parent]] != 1
+        heads = np.nonzero(is_head)[0]
+        steps, head = follow_links(np.where(is_head, -1, self.parent))
+        head_section = np.full(n, -1, dtype=np.int64)
+        head_section[heads] = np.arange(len(heads))
+        section = head_section[head]
+        section_length = np.bincount(section, minlength=len(heads))
+        section_parent = np.where(has_parent[heads], section[np.maximum(self.parent[heads], 0)], -1)
+
+        # Walk the sections depth first to order them and find their subtree sizes and branch orders
+        has_section_parent = section_parent >= 0
+        child_section_offsets = np.zeros(len(heads) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(section_parent[has_section_parent], minlength=len(heads)), out=child_section_offsets[1:])
+        child_sections = np.nonzero(has_section_parent)[0][np.argsort(section_parent[has_section_parent], kind='stable')]
+        child_section_offsets = child_section_offsets.tolist()
+        child_sections = child_sections.tolist()
+        section_parent_list = section_parent.tolist()
+        section_order = []
+        section_branch_order = [0] * len(heads)
+        stack = np.nonzero(~has_section_parent)[0][::-1].tolist()
+        while len(stack) > 0:
+            s = stack.pop()
+            section_order.append(s)
+            p = section_parent_list[s]
+            if p >= 0:
+                section_branch_order[s] = section_branch_order[p] + 1
+            stack.extend(reversed(child_sections[child_section_offsets[s]:child_section_offsets[s + 1]]))
+        subtree_size = section_length.tolist()
+        for s in reversed(section_order):
+            p = section_parent_list[s]
+            if p >= 0:
+                subtree_size[p] += subtree_size[s]
+
+        # Renumber the sections in depth first order
+        section_order = np.array(section_order, dtype=np.int64)
+        new_section = np.empty(len(heads), dtype=np.int64)
+        new_section[section_order] = np.arange(len(heads))
+        self.section_of = new_section[section]
+        self.section_parent = np.where(has_section_parent, new_section[np.maximum(section_parent, 0)], -1)[section_order]
+        self.section_offsets = np.zeros(len(heads) + 1, dtype=np.int64)
+        np.cumsum(section_length[section_order], out=self.section_offsets[1:])
+        self.branch_order = np.array(section_branch_order, dtype=np.int64)[section]
+
+        # Depth first order of the nodes: the sections in order, each from its head
+        self.preorder_position = self.section_offsets[self.section_of] + steps
+        self.preorder = np.empty(n, dtype=np.int64)
+        self.preorder[self.preorder_position] = np.arange(n)
+        self.section_nodes = self.preorder
+        self.subtree_end = (self.section_offsets[:-1] + np.array(subtree_size, dtype=np.int64)[section_order])[self.section_of]
+
+        # Path distance from the root: the lengths of the edges above each node, summed
+        self.path_distance = None
+        if co is not None:
+            co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+            edge_length = np.zeros(n)
+            edge_length[has_parent] = np.linalg.norm(co[has_parent] - co[self.parent[has_parent]], axis=1)
+            self.path_distance = follow_links(self.parent, edge_length)[0]
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def num_sections(self):
+        return len(self.section_offsets) - 1
+
+    # Rows of the children of node i
+    def children_of(self, i):
+        return self.children[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    # Rows of the nodes of section s, from its head
+    def section(self, s):
+        return self.section_nodes[self.section_offsets[s]:self.section_offsets[s + 1]]
+
+    # Rows of node i and all its descendants
+    def subtree(self, i):
+        return self.preorder[self.preorder_position[i]:self.subtree_end[i]]
+
+    # True where node a is node b or one of its ancestors
+    def is_ancestor(self, a, b):
+        return (self.preorder_position[a] <= self.preorder_position[b]) & (self.preorder_position[b] < self.subtree_end[a])
+
+
+#######################################################
+#######################################################
+# Parsing
+#######################################################
+#######################################################
+
+# The format of an SWC file is fairly simple. It is a text file consisting of
+# a header with various fields beginning with a # character,
+# and a series of three dimensional points containing
+# an index, radius, type, and connectivity information.
+# The lines in the text file representing points have the following layout.
+#
+#             n T x y z R P
+#
+#             n is an integer label that identifies the current point and
+#                     increments by one from one line to the next.
+#
+#             T is an integer representing the type of neuronal segment,
+#                     such as soma, axon, apical dendrite, etc. The standard
+#                     accepted integer values are given below.
+#
+#                     0 = undefined
+#                     1 = soma
+#                     2 = axon
+#                     3 = dendrite
+#                     4 = apical dendrite
+#                     5 = fork point
+#                     6 = end point
+#                     7 = custom
+#
+#             x, y, z gives the cartesian coordinates of each node.
+#
+#             R is the radius at that node.
+#             P indicates the parent (the integer label) of the current
+#                     point or -1 to indicate an origin (soma).
+
+
+# Parse the lines of an SWC file into a Morphology
+def parse_swc(lines):
+    rows = []
+    for l in lines:
+        l = l.strip()
+        if len(l) > 0 and l[0] != "#":
+            rows.append(l.split()[:7])
+    table = np.array(rows, dtype=np.float64).reshape(-1, 7)
+    return Morphology(table[:, 0], table[:, 1], table[:, 2:5], table[:, 5], table[:, 6])
+
+
+# Build a Morphology (of undefined type 0) from chains of connected points: the (n, 4) array of
+# x, y, z, r of all the chains one after the other, and the number of points in each chain.
+# The formats made of chains do not say how the chains connect, so a chain whose first point is
+# exactly a point of an earlier chain hangs from that point (and its repeated first point is dropped);
+# any other chain starts a tree of its own. Nodes are numbered 1, 2, 3, ... in file order.
+def morphology_from_chains(points, chain_length):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 4)
+    chain_length = np.asarray(chain_length, dtype=np.int64)
+    n = len(points)
+    chain_start = np.cumsum(chain_length) - chain_length
+    chain_start = chain_start[chain_length > 0]
+    parent = np.arange(-1, n - 1)
+    parent[chain_start] = -1
+
+    # The first of each group of identical points is where the chains starting there hang from
+    order = np.lexsort(points[:, 2::-1].T)
+    same = np.r_[False, (points[order][1:, :3] == points[order][:-1, :3]).all(axis=1)]
+    group = np.cumsum(~same) - 1
+    first = order[~same][group]
+    first_of = np.empty(n, dtype=np.int64)
+    first_of[order] = first
+    attached = chain_start[first_of[chain_start] < chain_start]
+
+    # Drop the repeated first points, moving their children up to the point they repeat
+    drop = np.zeros(n, dtype=bool)
+    drop[attached] = True
+    children = attached + 1
+    children = children[(children < n) & (parent[np.minimum(children, n - 1)] == attached)]
+    parent[children] = first_of[children - 1]
+    keep = ~drop
+    new_row = np.cumsum(keep) - 1
+    index_number = new_row + 1
+    parent_index = np.where(parent >= 0, index_number[np.maximum(parent, 0)], -1)
+    return Morphology(index_number[keep], np.zeros(keep.sum()), points[keep, :3], points[keep, 3], parent_index[keep])
+
+
+# Parse Node Branch Format lines into a Morphology: each "Branch" line starts a chain and each
+# "Node x y z r" line adds a point to it
+def parse_nbf(lines):
+    values = []
+    chain_length = []
+    for l in lines:
+        l = l.strip()
+        if l[0:6] == "Branch":
+            chain_length.append(0)
+        elif l[0:4] == "Node":
+            if len(chain_length) == 0:
+                chain_length.append(0)
+            values.append(l.split()[1:5])
+            chain_length[-1] += 1
+    return morphology_from_chains(np.array(values, dtype=np.float64).reshape(-1, 4), chain_length)
+
+
+# Parse lines of the legacy format found from early work with Neuron into a Morphology:
+# each chain is a "1 <number of points>" line followed by that many "x y z r" lines
+def parse_legacy(lines):
+    values = []
+    chain_length = []
+    num_entries_to_read = 0
+    for l in lines:
+        fields = l.split()
+        if len(fields) == 0:
+            continue
+        if num_entries_to_read == 0:
+            # Look for a line containing a 1 and the number of fields
+            if len(fields) != 2:
+                print ( "Error: expected 2 values" )
+            else:
+                if int(fields[0]) != 1:
+                    print ( "Unexpected first value for line" + l )
+                num_entries_to_read = int(fields[1])
+                chain_length.append(0)
+        else:
+            # This is another entry in the current chain
+            values.append(fields[:4])
+            chain_length[-1] += 1
+            num_entries_to_read += -1
+    return morphology_from_chains(np.array(values, dtype=np.float64).reshape(-1, 4), chain_length)
+
+
+#######################################################
+#######################################################
+# Reading files
+#######################################################
+#######################################################
+
+# Readers of morphology files as (name, suffixes, parse), where parse(lines) returns a Morphology from
+# an iterable of text lines. Add readers with register_reader; the first one with a suffix ending the
+# file name (less any compression suffix) reads it, and files no reader claims are read as the legacy format.
+MORPHOLOGY_READERS = []
+LEGACY_READER = ("Legacy", (), parse_legacy)
+
+# Compressed files are decompressed as they are read
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+
+# Add a reader for the files ending with one of the suffixes
+def register_reader(name, suffixes, parse):
+    MORPHOLOGY_READERS.append((name, tuple(suffixes), parse))
+
+
+register_reader("SWC", (".swc", ".swc.txt"), parse_swc)
+register_reader("Node Branch Format", (".nbf",), parse_nbf)
+
+
+# Split a file name into the name without its compression suffix (if any) and the function to open it with
+def split_compression_suffix(file_name):
+    for suffix, opener in COMPRESSED_OPENERS.items():
+        if file_name.endswith(suffix):
+            return file_name[:-len(suffix)], opener
+    return file_name, open
+
+
+# The reader (name, suffixes, parse) for a file
+def find_reader(file_name):
+    name = split_compression_suffix(file_name)[0]
+    for reader in MORPHOLOGY_READERS:
+        if name.endswith(reader[1]):
+            return reader
+    return LEGACY_READER
+
+
+# Check if a file name is an SWC file (compressed or not)
+def is_swc_file_name(file_name):
+    return find_reader(file_name)[0] == "SWC"
+
+
+# File name without its directory, compression suffix and format suffix
+def morphology_base_name(file_name):
+    name = basename(split_compression_suffix(file_name)[0])
+    for suffix in sorted(find_reader(name)[1], key=len, reverse=True):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+# Iterate over lines while counting the non-comment ones (neither blank nor starting with "#")
+class CountedLines:
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.count = 0
+
+    def __iter__(self):
+        for line in self.lines:
+            stripped = line.lstrip()
+            if len(stripped) > 0 and stripped[0] != "#":
+                self.count += 1
+            yield line
+
+
+# Read a morphology file of any registered format, decompressing it on the fly.
+# Returns the Morphology and the number of non-comment lines in the file.
+def read_morphology_file(file_name):
+    opener = split_compression_suffix(file_name)[1]
+    with opener(file_name, 'rt') as f:
+        lines = CountedLines(f)
+        morphology = find_reader(file_name)[2](lines)
+    return morphology, lines.count
+
+
+# Read a morphology file of any registered format into a Morphology
+def read_morphology(file_name):
+    return read_morphology_file(file_name)[0]
+
+
+# Read the segments of a file in any supported format.
+# Returns the segments (each a [[px, py, pz, pr], [cx, cy, cz, cr]] pair from parent to child) and the counts shown for a file:
+#   num_lines_in_file, num_nodes_in_file, num_segments_in_file
+def read_segments(file_name, num_segs_limit=0):
+    morphology, num_lines = read_morphology_file(file_name)
+    segments = morphology.segments()
+
+    if num_segs_limit > 0:
+        # Limit the number of segments
+        segments = segments[0:num_segs_limit]
+
+    return segments, {"num_lines_in_file": num_lines,
+                      "num_nodes_in_file": len(morphology),
+                      "num_segments_in_file": len(segments)}
+
+
+#######################################################
+#######################################################
+# Circuits
+#######################################################
+#######################################################
+
+# A circuit table places cells: one row per cell naming its morphology file and giving its transform.
+# Tables are CSV files with a header line, or NumPy files with the same names as the fields of a
+# structured array (.npy) or as arrays (.npz). The columns are:
+#   morphology             file of the cell's morphology, relative to the table's directory unless absolute
+#   name                   name of the cell (optional, numbered after its morphology by default)
+#   x y z                  position (optional)
+#   rx ry rz               rotation as XYZ Euler angles in degrees, or
+#   qw qx qy qz            rotation as a quaternion (optional)
+#   scale or sx sy sz      scale (optional)
+#   m00 m01 ... m33        the whole 4x4 matrix, row by row, instead of the columns above
+CIRCUIT_POSITION = ("x", "y", "z")
+CIRCUIT_EULER = ("rx", "ry", "rz")
+CIRCUIT_QUATERNION = ("qw", "qx", "qy", "qz")
+CIRCUIT_SCALE = ("sx", "sy", "sz")
+CIRCUIT_MATRIX = tuple("m%d%d" % (i, j) for i in range(4) for j in range(4))
+
+
+# Read the columns of a circuit table as a dict of arrays
+def read_circuit_columns(file_name):
+    if file_name.endswith(".npz"):
+        with np.load(file_name) as data:
+            return {key: data[key] for key in data.files}
+    if file_name.endswith(".npy"):
+        data = np.load(file_name)
+        if data.dtype.names is None:
+            raise ValueError("A circuit table in a .npy file must be a structured array: " + file_name)
+        return {key: data[key] for key in data.dtype.names}
+    with open(file_name, newline='') as f:
+        rows = list(csv.reader(f))
+    if len(rows) == 0:
+        return {}
+    header = [key.strip() for key in rows[0]]
+    values = np.array([row for row in rows[1:] if len(row) > 0], dtype=str).reshape(-1, len(header))
+    return {key: np.char.strip(values[:, j]) for j, key in enumerate(header)}
+
+
+# Rotation matrices (n, 3, 3) from XYZ Euler angles in radians (rotate about X, then Y, then Z)
+def euler_matrices(angles):
+    cx, cy, cz = np.cos(angles).T
+    sx, sy, sz = np.sin(angles).T
+    return np.stack([np.stack([cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz], axis=-1),
+                     np.stack([cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz], axis=-1),
+                     np.stack([-sy, sx * cy, cx * cy], axis=-1)], axis=1)
+
+
+# Rotation matrices (n, 3, 3) from (w, x, y, z) quaternions, which are normalized first
+def quaternion_matrices(q):
+    w, x, y, z = (q / np.linalg.norm(q, axis=1)[:, None]).T
+    return np.stack([np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], axis=-1),
+                     np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], axis=-1),
+                     np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=-1)], axis=1)
+
+
+# The (n, 4, 4) transforms of the n cells of a circuit table from its columns (missing columns leave
+# the cells unmoved, unrotated or unscaled)
+def circuit_matrices(columns, n):
+    def numbers(keys, default=0.0):
+        return np.stack([np.asarray(columns[key], dtype=np.float64) if key in columns else np.full(n, default)
+                         for key in keys], axis=1)
+
+    if all(key in columns for key in CIRCUIT_MATRIX):
+        return numbers(CIRCUIT_MATRIX).reshape(n, 4, 4)
+
+    if all(key in columns for key in CIRCUIT_QUATERNION):
+        linear = quaternion_matrices(numbers(CIRCUIT_QUATERNION))
+    else:
+        linear = euler_matrices(np.radians(numbers(CIRCUIT_EULER)))
+    if "scale" in columns:
+        linear *= numbers(("scale",))[:, :, None]
+    else:
+        linear *= numbers(CIRCUIT_SCALE, 1.0)[:, None, :]
+
+    matrices = np.zeros((n, 4, 4))
+    matrices[:, :3, :3] = linear
+    matrices[:, :3, 3] = numbers(CIRCUIT_POSITION)
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+# Read a circuit table. Returns the morphology file of each cell (with relative paths resolved against
+# the table's directory), the name of each cell and the (n, 4, 4) transforms of the cells.
+def read_circuit(file_name):
+    columns = read_circuit_columns(file_name)
+    if "morphology" not in columns:
+        raise ValueError("A circuit table needs a morphology column: " + file_name)
+
+    directory = dirname(file_name)
+    morphologies = [m if isabs(m) else join(directory, m) for m in np.asarray(columns["morphology"], dtype=str)]
+    n = len(morphologies)
+
+    if "name" in columns:
+        names = [str(name) for name in np.asarray(columns["name"], dtype=str)]
+    else:
+        names = ["%s_%d" % (morphology_base_name(m), i) for i, m in enumerate(morphologies)]
+
+    return morphologies, names, circuit_matrices(columns, n)
+
+
+#######################################################
+#######################################################
+# Validation and repair
+#######################################################
+#######################################################
+
+# Problems found by validate_morphology, with how they are described
+VALIDATION_PROBLEMS = (
+    ("duplicate_ids", "nodes reuse an index number"),
+    ("missing_parents", "nodes have a parent that is not in the file"),
+    ("cycles", "nodes are on (or hang from) a cycle of parents"),
+    ("multiple_roots", "roots (there should be one)"),
+    ("non_positive_radii", "nodes have a radius of zero or less"),
+    ("non_contiguous_ids", "nodes are not numbered 1, 2, 3, ... in file order"),
+)
+
+
+# Follow every parent link for 2^k >= n steps: nodes whose parents lead to a root end up on it,
+# nodes on or below a cycle end up on the cycle. Returns where each node ends up.
+def walk_to_roots_or_cycles(parent):
+    pointer = np.where(parent >= 0, parent, np.arange(len(parent)))
+    for i in range(max(1, int(len(parent)).bit_length())):
+        pointer = pointer[pointer]
+    return pointer
+
+
+# Check a morphology in a few linear passes over its arrays (the cycle check is a log n of them).
+# Returns a dict with an array of the rows with each problem of VALIDATION_PROBLEMS (empty when there are none).
+def validate_morphology(morphology):
+    n = len(morphology)
+    rows = np.arange(n)
+    problems = {}
+
+    # Every occurrence of an index number after the first
+    order = np.argsort(morphology.index_number, kind='stable')
+    repeated = np.r_[False, morphology.index_number[order][1:] == morphology.index_number[order][:-1]]
+    problems["duplicate_ids"] = np.sort(order[repeated])
+
+    parent = morphology.parent_rows()
+    problems["missing_parents"] = np.nonzero((parent < 0) & (morphology.parent_index >= 0))[0]
+
+    end = walk_to_roots_or_cycles(parent)
+    problems["cycles"] = np.nonzero(parent[end] >= 0)[0]
+
+    roots = np.nonzero(morphology.parent_index < 0)[0]
+    problems["multiple_roots"] = roots if len(roots) > 1 else roots[:0]
+    problems["non_positive_radii"] = np.nonzero(morphology.radius <= 0)[0]
+    problems["non_contiguous_ids"] = np.nonzero(morphology.index_number != rows + 1)[0]
+    return problems
+
+
+# One line for each problem found by validate_morphology, naming the first few index numbers involved
+def describe_problems(morphology, problems, max_ids=5):
+    lines = []
+    for name, description in VALIDATION_PROBLEMS:
+        found = problems[name]
+        if len(found) > 0:
+            ids = ", ".join(str(i) for i in morphology.index_number[found[:max_ids]].tolist())
+            lines.append("%d %s (%s%s)" % (len(found), description, ids, ", ..." if len(found) > max_ids else ""))
+    return lines
+
+
+# Repair a morphology before building anything from it. Each repair is optional:
+#   reroot:     orphans (missing parents) become roots; each cycle is cut by making one of its nodes a root;
+#               a tree whose root is not a soma node (type 1) but that has one is rerooted at it, reversing
+#               the parent links on the way; then every other tree is joined by its root to the nearest
+#               node of the main tree (the largest one with a soma root, or the largest one)
+#   min_radius: radii below it are raised to it
+#   renumber:   nodes are reordered depth first and numbered 1, 2, 3, ... so parents come before children
+#               (duplicate index numbers are resolved to the first node that has them, and parents missing
+#               from the file become -1); needs a morphology without cycles, so it raises ValueError unless rerooted
+# Returns the repaired Morphology and one line describing each repair made.
+def repair_morphology(morphology, renumber=False, reroot=False, min_radius=None):
+    n = len(morphology)
+    parent = morphology.parent_rows()
+    segment_type = morphology.segment_type
+    radius = morphology.radius.copy()
+    repairs = []
+
+    if reroot:
+        missing = (parent < 0) & (morphology.parent_index >= 0)
+        if missing.any():
+            repairs.append("made %d orphans roots" % missing.sum())
+
+        # Cut each cycle at the node the walk landed on
+        end = walk_to_roots_or_cycles(parent)
+        landed = np.unique(end[parent[end] >= 0]).tolist()
+        on_cut_cycle = set()
+        num_cut = 0
+        for node in landed:
+            if node in on_cut_cycle:
+                continue
+            i = node
+            while True:
+                on_cut_cycle.add(i)
+                i = int(parent[i])
+                if i == node or i < 0:
+                    break
+            if i == node:
+                parent[node] = -1
+                num_cut += 1
+        if num_cut > 0:
+            repairs.append("cut %d cycles" % num_cut)
+
+        # Trees with a soma node below their root are rerooted at it
+        tree = follow_links(parent)[1]
+        soma = np.nonzero(segment_type == 1)[0]
+        soma_of_tree = {}
+        for i in soma[segment_type[tree[soma]] != 1].tolist():
+            soma_of_tree.setdefault(int(tree[i]), i)
+        for new_root in soma_of_tree.values():
+            previous, i = -1, new_root
+            while i >= 0:
+                parent[i], previous, i = previous, i, int(parent[i])
+        if len(soma_of_tree) > 0:
+            repairs.append("rerooted %d trees at their soma" % len(soma_of_tree))
+
+        # Join the other trees to the main tree
+        tree = follow_links(parent)[1]
+        roots = np.nonzero(parent < 0)[0]
+        if len(roots) > 1:
+            size = np.bincount(tree, minlength=n)[roots]
+            main = roots[np.lexsort((-size, segment_type[roots] != 1))[0]]
+            in_main = tree == main
+            index = NodeIndex(morphology.co[in_main])
+            main_rows = np.nonzero(in_main)[0]
+            for root in roots[roots != main].tolist():
+                nearest, distance = index.nearest(morphology.co[root])
+                parent[root] = main_rows[nearest]
+            repairs.append("joined %d trees to the main tree" % (len(roots) - 1))
+
+    if min_radius is not None:
+        small = radius < min_radius
+        if small.any():
+            radius[small] = min_radius
+            repairs.append("raised %d radii to %g" % (small.sum(), min_radius))
+
+    # Parent index numbers follow the parent rows (parents missing from the file are kept unless rerooted)
+    parent_index = np.where(parent >= 0, morphology.index_number[np.maximum(parent, 0)], -1)
+    if not reroot:
+        parent_index = np.where(parent >= 0, parent_index, morphology.parent_index)
+    repaired = Morphology(morphology.index_number, segment_type, morphology.co, radius, parent_index)
+
+    if renumber:
+        order = Topology(parent).preorder
+        new_index = np.empty(n, dtype=np.int64)
+        new_index[order] = np.arange(1, n + 1)
+        new_parent = np.where(parent >= 0, new_index[np.maximum(parent, 0)], -1)[order]
+        if not np.array_equal(order, np.arange(n)) or not np.array_equal(morphology.index_number, np.arange(1, n + 1)):
+            repairs.append("renumbered %d nodes" % n)
+        repaired = Morphology(np.arange(1, n + 1), segment_type[order], morphology.co[order], radius[order], new_parent)
+
+    return repaired, repairs
+
+
+#######################################################
+#######################################################
+# Analysis
+#######################################################
+#######################################################
+
+# Find the radius range and bounding box of all points in the segments (all -1 when there are none)
+def analyze_segments(segments):
+    points = np.array([c[:4] for seg in segments for c in seg], dtype=np.float64).reshape(-1, 4)
+    if len(points) == 0:
+        lo = hi = np.full(4, -1.0)
+    else:
+        lo = points.min(axis=0)
+        hi = points.max(axis=0)
+    area, volume = cable_area_volume(segments)
+    return {"largest_radius_in_file": float(hi[3]),
+            "smallest_radius_in_file": float(lo[3]),
+            "min_x": float(lo[0]), "max_x": float(hi[0]),
+            "min_y": float(lo[1]), "max_y": float(hi[1]),
+            "min_z": float(lo[2]), "max_z": float(hi[2]),
+            "cable_area": area,
+            "cable_volume": volume}
+
+
+# Estimate the membrane area and the volume of the cable from its segments, each a truncated cone
+# between the radii of its ends (the cones overlapping at branch points are counted in full)
+def cable_area_volume(segments):
+    starts, ends = segment_point_pairs(segments)
+    h = np.linalg.norm(ends[:, :3] - starts[:, :3], axis=1)
+    r1, r2 = starts[:, 3], ends[:, 3]
+    area = np.pi * (r1 + r2) * np.sqrt(h * h + (r1 - r2) ** 2)
+    volume = np.pi * h / 3 * (r1 * r1 + r1 * r2 + r2 * r2)
+    return float(area.sum()), float(volume.sum())
+
+
+#######################################################
+#######################################################
+# Index numbers
+#######################################################
+#######################################################
+
+# Match two arrays of index numbers: returns the positions (i, j) with index_number[i] == other[j]
+def match_index_numbers(index_number, other):
+    order = np.argsort(index_number, kind='stable')
+    sorted_index = index_number[order]
+    pos = np.clip(np.searchsorted(sorted_index, other), 0, max(len(sorted_index) - 1, 0))
+    found = (sorted_index[pos] == other) if len(sorted_index) > 0 else np.zeros(len(other), dtype=bool)
+    return order[pos[found]], np.nonzero(found)[0]
+
+
+# Compare two versions of a morphology node by node through their index numbers (unique in each).
+# Returns a dict of row arrays:
+#   removed     rows of old whose ids are not in new
+#   added       rows of new whose ids are not in old
+#   kept_old    rows of old whose ids are also in new (in the order of old)
+#   kept_new    rows of new with the same ids as kept_old
+#   moved       positions in kept_old / kept_new of the nodes that moved farther than tolerance
+#   resized     positions of the kept nodes whose radius changed by more than tolerance
+#   relinked    positions of the kept nodes whose parent or type changed
+def diff_morphologies(old, new, tolerance=0.0):
+    kept_new, kept_old = match_index_numbers(new.index_number, old.index_number)
+    removed = np.setdiff1d(np.arange(len(old)), kept_old, assume_unique=True)
+    added = np.setdiff1d(np.arange(len(new)), kept_new, assume_unique=True)
+
+    distance = np.linalg.norm(new.co[kept_new] - old.co[kept_old], axis=1)
+    return {"removed": removed,
+            "added": added,
+            "kept_old": kept_old,
+            "kept_new": kept_new,
+            "moved": np.nonzero(distance > tolerance)[0],
+            "resized": np.nonzero(np.abs(new.radius[kept_new] - old.radius[kept_old]) > tolerance)[0],
+            "relinked": np.nonzero((new.parent_index[kept_new] != old.parent_index[kept_old]) |
+                                   (new.segment_type[kept_new] != old.segment_type[kept_old]))[0]}
+
+
+# The change from old to new as what is needed to get old back from new: a dict with
+#   added_ids   index numbers of the nodes of new that old does not have
+#   restore     a Morphology of the nodes of old that new lost or changed (by position, radius, parent or type)
+# so it holds only the nodes that changed. Returns None when the index numbers of either are not unique.
+def morphology_delta(old, new):
+    if len(np.unique(old.index_number)) < len(old) or len(np.unique(new.index_number)) < len(new):
+        return None
+    diff = diff_morphologies(old, new)
+    changed = np.union1d(np.union1d(diff["moved"], diff["resized"]), diff["relinked"])
+    return {"added_ids": new.index_number[diff["added"]],
+            "restore": old.take(np.r_[diff["removed"], diff["kept_old"][changed]].astype(np.int64))}
+
+
+# Get old back from new and the morphology_delta(old, new). The nodes kept by new come first, in their order.
+def revert_morphology_delta(new, delta):
+    restore = delta["restore"]
+    kept = new.take(np.nonzero(~np.isin(new.index_number, np.r_[delta["added_ids"], restore.index_number]))[0])
+    return Morphology(np.r_[kept.index_number, restore.index_number], np.r_[kept.segment_type, restore.segment_type],
+                      np.r_[kept.co, restore.co], np.r_[kept.radius, restore.radius],
+                      np.r_[kept.parent_index, restore.parent_index])
+
+
+#######################################################
+#######################################################
+# Cable model renumbering
+#######################################################
+#######################################################
+
+# Build a CSR adjacency (offsets, neighbors) of an undirected edge list over n_v vertices
+def build_adjacency(n_v, edges):
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    ends = np.concatenate((edges[:, 0], edges[:, 1]))
+    others = np.concatenate((edges[:, 1], edges[:, 0]))
+    order = np.argsort(ends, kind='stable')
+    offsets = np.zeros(n_v + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=n_v), out=offsets[1:])
+    return offsets, others[order]
+
+
+# Walk every connected component of a cable model breadth first from its best root in O(V + E).
+# The root of a component is a soma vertex marked as a root if it has one, then any vertex marked as
+# a root, then any soma vertex, then the vertex with the lowest index number. Components are walked in
+# that same order of preference. Returns the vertices in walk order and the vertex each was reached from (-1 at roots).
+def walk_cable_model(n_v, edges, index_number, is_root, segment_type):
+    offsets, neighbors = build_adjacency(n_v, edges)
+    offsets = offsets.tolist()
+    neighbors = neighbors.tolist()
+
+    # Order all vertices by how good a root they would make
+    is_soma = segment_type == 1
+    rank = np.where(is_root & is_soma, 0, np.where(is_root, 1, np.where(is_soma, 2, 3)))
+    candidates = np.lexsort((np.arange(n_v), index_number, rank)).tolist()
+
+    # Walk each component from the best root candidate not yet reached
+    visited = bytearray(n_v)
+    bfs_order = []
+    bfs_parent = [-1] * n_v
+    for root in candidates:
+        if visited[root]:
+            continue
+        visited[root] = 1
+        head = len(bfs_order)
+        bfs_order.append(root)
+        while head < len(bfs_order):
+            i_check = bfs_order[head]
+            head += 1
+            for i_conn in neighbors[offsets[i_check]:offsets[i_check + 1]]:
+                if not visited[i_conn]:
+                    visited[i_conn] = 1
+                    bfs_parent[i_conn] = i_check
+                    bfs_order.append(i_conn)
+
+    return np.array(bfs_order, dtype=np.int64), np.array(bfs_parent, dtype=np.int64)
+
+
+# Renumber the vertices of a cable model from its edges in O(V + E).
+# Each connected component is walked breadth first from its root (see walk_cable_model, with
+# the vertices of parent -1 as roots), so parents always have smaller index numbers than their
+# children and the soma root keeps index number 1. Returns the new index numbers and parent indexes (per vertex).
+def renumber_cable_model(n_v, edges, index_number, parent_index, segment_type):
+    index_number = np.asarray(index_number)
+    parent_index = np.asarray(parent_index)
+    segment_type = np.asarray(segment_type)
+
+    new_index = np.zeros(n_v, dtype=np.int32)
+    new_parent = np.full(n_v, -1, dtype=np.int32)
+    if n_v == 0:
+        return new_index, new_parent
+
+    bfs_order, bfs_parent = walk_cable_model(n_v, edges, index_number, parent_index < 0, segment_type)
+
+    # Index numbers follow the walk order; parents are looked up through them
+    new_index[bfs_order] = np.arange(1, n_v + 1, dtype=np.int32)
+    has_parent = bfs_parent >= 0
+    new_parent[has_parent] = new_index[bfs_parent[has_parent]]
+
+    return new_index, new_parent
+
+
+# Relink the vertices of a region taken out of a larger cable model after it was edited, keeping its ids.
+# Parents follow the edges, walked from the vertices whose parent is outside of the region (or -1).
+# Each id is kept by the first vertex reached with it; the others (such as extruded copies) get new ids
+# counting up from next_id (or above the largest id, if that is higher). The root of each component keeps
+# a parent outside of the region, so it can be joined back to the rest of the model.
+# Returns the new index numbers and parent indexes (per vertex).
+def relink_region(n_v, edges, index_number, parent_index, segment_type, next_id):
+    index_number = np.asarray(index_number)
+    parent_index = np.asarray(parent_index)
+    segment_type = np.asarray(segment_type)
+
+    new_index = np.zeros(n_v, dtype=np.int32)
+    new_parent = np.full(n_v, -1, dtype=np.int32)
+    if n_v == 0:
+        return new_index, new_parent
+
+    outside = ~np.isin(parent_index, index_number)
+    bfs_order, bfs_parent = walk_cable_model(n_v, edges, index_number, outside, segment_type)
+
+    # The first vertex reached with each id keeps it
+    ids = index_number[bfs_order]
+    first = np.zeros(n_v, dtype=bool)
+    first[np.unique(ids, return_index=True)[1]] = True
+    next_id = max(next_id, int(index_number.max()) + 1)
+    new_index[bfs_order] = np.where(first, ids, next_id + np.cumsum(~first) - 1)
+
+    has_parent = bfs_parent >= 0
+    new_parent[has_parent] = new_index[bfs_parent[has_parent]]
+    keep_outside = ~has_parent & outside
+    new_parent[keep_outside] = parent_index[keep_outside]
+
+    return new_index, new_parent
+
+
+# Splice an edited region back into the morphology it was taken from: the nodes with the region's
+# original ids (region_ids) are replaced by the nodes of the region. Nodes left with a parent that is
+# no longer there become roots. Returns the spliced Morphology.
+def splice_region(morphology, region_ids, region):
+    outside = morphology.take(~np.isin(morphology.index_number, region_ids))
+    parent_index = np.r_[outside.parent_index, region.parent_index]
+    index_number = np.r_[outside.index_number, region.index_number]
+    parent_index[(parent_index >= 0) & ~np.isin(parent_index, index_number)] = -1
+    return Morphology(index_number, np.r_[outside.segment_type, region.segment_type],
+                      np.r_[outside.co, region.co], np.r_[outside.radius, region.radius], parent_index)
+
+
+#######################################################
+#######################################################
+# Spatial node index
+#######################################################
+#######################################################
+
+# Most grid cells along one axis, so the cell keys of a grid fit in an int64
+MAX_CELLS_PER_AXIS = 2 ** 20
+
+
+# Indexes of all the rows in the [starts, ends) ranges, concatenated
+def concatenate_ranges(starts, ends):
+    lengths = ends - starts
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+# Spatial index of node positions. The nodes are sorted into a uniform grid of cubic cells,
+# so a query only measures the nodes of the cells it overlaps. Building it is one sort, O(n log n).
+# The default cell size gives about one cell per node over the bounding cube.
+# A grid is used rather than a KD-tree: the core only depends on NumPy (SciPy is not bundled with
+# Blender), and a grid answers many queries at once with whole-array operations over cell keys,
+# where walking a tree in Python would cost one interpreter loop per query. Neuron nodes are spread
+# along cables at fairly even spacing, which is the case a uniform grid handles well.
+class NodeIndex:
+
+    def __init__(self, co, cell_size=None):
+        self.co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+        n = len(self.co)
+        self.origin = self.co.min(axis=0) if n > 0 else np.zeros(3)
+        extent = float((self.co.max(axis=0) - self.origin).max()) if n > 0 else 0.0
+        if cell_size is None:
+            cell_size = extent / max(1.0, n ** (1.0 / 3.0))
+        self.cell_size = max(cell_size, extent / (MAX_CELLS_PER_AXIS - 1), 1e-12)
+
+        cells = self.cell_of(self.co)
+        self.dims = cells.max(axis=0) + 1 if n > 0 else np.ones(3, dtype=np.int64)
+        keys = self.cell_key(cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts = np.unique(keys[self.order], return_index=True)
+        self.ends = np.r_[self.starts[1:], n].astype(np.int64)
+        # Cell (i, j, k) of each occupied cell
+        self.occupied = cells[self.order[self.starts]]
+
+    def __len__(self):
+        return len(self.co)
+
+    # Grid cell (i, j, k) of each point
+    def cell_of(self, points):
+        return np.floor((np.asarray(points, dtype=np.float64).reshape(-1, 3) - self.origin) / self.cell_size).astype(np.int64)
+
+    # One int64 key per cell
+    def cell_key(self, cells):
+        return cells[:, 0] + self.dims[0] * (cells[:, 1] + self.dims[1] * cells[:, 2])
+
+    # Rows of the nodes in each of the given cells (cells outside the grid hold none)
+    def rows_in_cells(self, cells):
+        cells = cells[((cells >= 0) & (cells < self.dims)).all(axis=1)]
+        keys = self.cell_key(cells)
+        pos = np.clip(np.searchsorted(self.keys, keys), 0, max(len(self.keys) - 1, 0))
+        found = self.keys[pos] == keys if len(self.keys) > 0 else np.zeros(len(keys), dtype=bool)
+        return self.order[concatenate_ranges(self.starts[pos[found]], self.ends[pos[found]])]
+
+    # Rows of the nodes within distance r of a point, nearest first, and their distances.
+    # When r covers more cells than are occupied, the occupied cells are filtered instead,
+    # so a query never visits more cells than the smaller of the two.
+    def query_radius(self, point, r):
+        point = np.asarray(point, dtype=np.float64).reshape(3)
+        lo = np.maximum(self.cell_of(point - r)[0], 0)
+        hi = np.minimum(self.cell_of(point + r)[0], self.dims - 1)
+        if (hi < lo).any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        if (hi - lo + 1).prod() > len(self.keys):
+            covered = np.nonzero(((self.occupied >= lo) & (self.occupied <= hi)).all(axis=1))[0]
+            rows = self.order[concatenate_ranges(self.starts[covered], self.ends[covered])]
+        else:
+            axes = [np.arange(lo[a], hi[a] + 1) for a in range(3)]
+            cells = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+            rows = self.rows_in_cells(cells)
+        distance = np.linalg.norm(self.co[rows] - point, axis=1)
+        inside = np.nonzero(distance <= r)[0]
+        inside = inside[np.argsort(distance[inside], kind='stable')]
+        return rows[inside], distance[inside]
+
+    # Row of the node nearest to a point and its distance, skipping the rows where exclude is True.
+    # The search radius doubles until it holds a node; returns (-1, inf) when there is none.
+    def nearest(self, point, exclude=None):
+        point = np.asarray(point, dtype=np.float64).reshape(3)
+        if len(self) == 0:
+            return -1, np.inf
+        far = np.linalg.norm(np.maximum(np.abs(point - self.origin), np.abs(point - self.origin - self.dims * self.cell_size)))
+        r = self.cell_size
+        while True:
+            rows, distance = self.query_radius(point, r)
+            if exclude is not None:
+                keep = ~exclude[rows]
+                rows, distance = rows[keep], distance[keep]
+            if len(rows) > 0:
+                return int(rows[0]), float(distance[0])
+            if r > far:
+                return -1, np.inf
+            r *= 2
+
+    # Rows of the nodes nearest to many points at once, and their distances (-1, inf when there are no nodes,
+    # or none within max_distance). Each point is compared with the nodes of its cell and the 26 around it,
+    # which is exact when the nearest of those is within one cell; the other points are looked up again in
+    # a grid with cells twice as wide (unless max_distance is within one cell, so nothing farther is wanted).
+    def nearest_rows(self, points, max_distance=np.inf):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        rows = np.full(len(points), -1, dtype=np.int64)
+        distance = np.full(len(points), np.inf)
+        if len(self) == 0:
+            return rows, distance
+
+        # Visit the points in the order of their cells, so the cell lookups run through the keys in order
+        cells = self.cell_of(points)
+        by_cell = np.argsort(self.cell_key(cells), kind='stable')
+        cells = cells[by_cell]
+        offsets = np.array([(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)])
+        for offset in offsets:
+            neighbor = cells + offset
+            inside = np.nonzero(((neighbor >= 0) & (neighbor < self.dims)).all(axis=1))[0]
+            keys = self.cell_key(neighbor[inside])
+            pos = np.clip(np.searchsorted(self.keys, keys), 0, len(self.keys) - 1)
+            found = self.keys[pos] == keys
+            inside, pos = inside[found], pos[found]
+
+            # Every point against every node of its neighbor cell; the nodes of each point come in one run
+            count = self.ends[pos] - self.starts[pos]
+            point = by_cell[np.repeat(inside, count)]
+            node = self.order[concatenate_ranges(self.starts[pos], self.ends[pos])]
+            d = np.linalg.norm(self.co[node] - points[point], axis=1)
+            if len(d) == 0:
+                continue
+            nearest_d = np.minimum.reduceat(d, np.cumsum(count) - count)
+            best = np.nonzero(d == np.repeat(nearest_d, count))[0]
+            best = best[np.r_[True, point[best][1:] != point[best][:-1]]]
+            point, node, d = point[best], node[best], d[best]
+            closer = d < distance[point]
+            rows[point[closer]] = node[closer]
+            distance[point[closer]] = d[closer]
+
+        # Points whose nearest node may be outside the cells searched
+        unsure = np.nonzero(distance > self.cell_size)[0]
+        if len(unsure) > 0 and max_distance > self.cell_size:
+            extent = float(np.abs(np.r_[points[unsure] - self.origin, self.co - self.origin]).max())
+            # Cells 4 times wider than everything hold every point's nearest node among their neighbors
+            coarse = NodeIndex(self.co, cell_size=min(2 * self.cell_size, 4 * extent))
+            rows[unsure], distance[unsure] = coarse.nearest_rows(points[unsure], max_distance)
+        far = distance > max_distance
+        rows[far], distance[far] = -1, np.inf
+        return rows, distance
+
+    # Whether each point is within distance r of some node, in one pass over the cells around the points
+    def within(self, points, r):
+        if r > self.cell_size:
+            return NodeIndex(self.co, cell_size=r).within(points, r)
+        return self.nearest_rows(points, max_distance=r)[0] >= 0
+
+    # All pairs (i, j), i < j, of nodes at most eps apart, found by comparing the nodes of each
+    # occupied cell with those of the same cell and half of its 26 neighbors (the cells are at least eps wide)
+    def close_pairs(self, eps):
+        if len(self) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        if eps > self.cell_size:
+            return NodeIndex(self.co, cell_size=eps).close_pairs(eps)
+
+        cells = self.occupied
+        counts = self.ends - self.starts
+        offsets = [(0, 0, 0)] + [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+                                 if (k, j, i) > (0, 0, 0)]
+        pairs = [np.zeros((0, 2), dtype=np.int64)]
+        for offset in offsets:
+            # Occupied cells a whose neighbor b at this offset is also occupied
+            neighbor = cells + offset
+            a = np.nonzero(((neighbor >= 0) & (neighbor < self.dims)).all(axis=1))[0]
+            keys = self.cell_key(neighbor[a])
+            b = np.clip(np.searchsorted(self.keys, keys), 0, len(self.keys) - 1)
+            found = self.keys[b] == keys
+            a, b = a[found], b[found]
+
+            # Every node of a against every node of b
+            num = counts[a] * counts[b]
+            cell_pair = np.repeat(np.arange(len(a)), num)
+            local = np.arange(num.sum()) - np.repeat(np.cumsum(num) - num, num)
+            ia = local // counts[b][cell_pair]
+            ib = local % counts[b][cell_pair]
+            keep = (ia < ib) if offset == (0, 0, 0) else np.ones(len(ia), dtype=bool)
+            i = self.order[self.starts[a][cell_pair] + ia]
+            j = self.order[self.starts[b][cell_pair] + ib]
+            keep &= np.linalg.norm(self.co[i] - self.co[j], axis=1) <= eps
+            pairs.append(np.column_stack((np.minimum(i, j)[keep], np.maximum(i, j)[keep])))
+        return np.concatenate(pairs)
+
+
+#######################################################
+#######################################################
+# Merging close nodes
+#######################################################
+#######################################################
+
+# Label the connected groups of n nodes joined by pairs: every node gets the smallest row of its group
+def group_labels(n, pairs):
+    label = np.arange(n)
+    a, b = np.asarray(pairs[:, 0]), np.asarray(pairs[:, 1])
+    while True:
+        # Pairs already in one group stay so
+        differ = label[a] != label[b]
+        if not differ.any():
+            break
+        a, b = a[differ], b[differ]
+
+        # Hook the larger label onto the smaller one, then point every node straight at its label
+        la, lb = label[a], label[b]
+        np.minimum.at(label, np.maximum(la, lb), np.minimum(la, lb))
+        while True:
+            jumped = label[label]
+            if np.array_equal(jumped, label):
+                break
+            label = jumped
+    return label
+
+
+# Merge the nodes that are at most eps apart (directly or through a chain of such nodes).
+# Each group of close nodes becomes its member nearest to the root, with the largest radius
+# of the group, and the children of the other members are moved to it. Since every merged
+# node keeps a parent that is closer to the root than all of its group, no cycles are made.
+# Returns the merged Morphology and the number of nodes removed.
+def merge_close_nodes(morphology, eps, index=None):
+    n = len(morphology)
+    if index is None:
+        index = NodeIndex(morphology.co, cell_size=eps)
+    pairs = index.close_pairs(eps)
+    if len(pairs) == 0:
+        return morphology, 0
+
+    parent = morphology.parent_rows()
+    label = group_labels(n, pairs)
+
+    # The representative of each group is its shallowest member
+    order = np.lexsort((np.arange(n), follow_links(parent)[0], label))
+    first = np.r_[True, label[order][1:] != label[order][:-1]]
+    group_rep = np.zeros(n, dtype=np.int64)
+    group_rep[label[order][first]] = order[first]
+    representative = group_rep[label]
+
+    radius = morphology.radius.copy()
+    np.maximum.at(radius, representative, morphology.radius)
+
+    # Parents of the merged nodes point to the representatives (parents missing from the file are kept)
+    parent_index = morphology.parent_index.copy()
+    has_parent = parent >= 0
+    parent_index[has_parent] = morphology.index_number[representative[parent[has_parent]]]
+
+    keep = representative == np.arange(n)
+    merged = Morphology(morphology.index_number[keep], morphology.segment_type[keep],
+                        morphology.co[keep], radius[keep], parent_index[keep])
+    return merged, n - len(merged)
+
+
+#######################################################
+#######################################################
+# Contacts between neurons
+#######################################################
+#######################################################
+
+# Pairs (i < j) of axis-aligned boxes (lo and hi as (n, 3) arrays) of different groups that overlap.
+# Every box is entered in each cell it touches of a uniform grid (of cells the size of the median box by
+# default), so only boxes sharing a cell are compared: one sort, O(n log n) for boxes of similar sizes.
+def overlapping_boxes(lo, hi, group, cell_size=None):
+    n = len(lo)
+    if n == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    origin = lo.min(axis=0)
+    extent = float((hi.max(axis=0) - origin).max())
+    if cell_size is None:
+        cell_size = float(np.median((hi - lo).max(axis=1)))
+    cell_size = max(cell_size, extent / (MAX_CELLS_PER_AXIS - 1), 1e-12)
+
+    # One entry for each cell touched by each box
+    first = np.floor((lo - origin) / cell_size).astype(np.int64)
+    last = np.floor((hi - origin) / cell_size).astype(np.int64)
+    span = last - first + 1
+    count = span.prod(axis=1)
+    box = np.repeat(np.arange(n), count)
+    k = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    sx, sy = span[box, 0], span[box, 1]
+    cells = first[box] + np.column_stack((k % sx, (k // sx) % sy, k // (sx * sy)))
+    dims = last.max(axis=0) + 1
+    keys = cells[:, 0] + dims[0] * (cells[:, 1] + dims[1] * cells[:, 2])
+
+    # Every pair of entries in the same cell, of boxes in different groups that really overlap
+    order = np.argsort(keys, kind='stable')
+    keys, box = keys[order], box[order]
+    run_start = np.r_[0, np.nonzero(np.diff(keys))[0] + 1]
+    run_end = np.r_[run_start[1:], len(keys)]
+    pos = np.arange(len(keys))
+    pos_end = np.repeat(run_end, run_end - run_start)
+    a = box[np.repeat(pos, pos_end - pos - 1)]
+    b = box[concatenate_ranges(pos + 1, pos_end)]
+    keep = group[a] != group[b]
+    a, b = np.minimum(a, b)[keep], np.maximum(a, b)[keep]
+    keep = (lo[a] <= hi[b]).all(axis=1) & (lo[b] <= hi[a]).all(axis=1)
+    pairs = np.unique(a[keep] * n + b[keep])
+    return np.column_stack((pairs // n, pairs % n))
+
+
+# Parameters s and t in [0, 1] of the closest points of segments p1 to q1 and p2 to q2 ((n, 3) arrays),
+# following Ericson's Real-Time Collision Detection, vectorized
+def closest_segment_parameters(p1, q1, p2, q2, eps=1e-12):
+    d1, d2, r = q1 - p1, q2 - p2, p1 - p2
+    a = (d1 * d1).sum(axis=1)
+    e = (d2 * d2).sum(axis=1)
+    b = (d1 * d2).sum(axis=1)
+    c = (d1 * r).sum(axis=1)
+    f = (d2 * r).sum(axis=1)
+    safe_a = np.where(a > eps, a, 1.0)
+    safe_e = np.where(e > eps, e, 1.0)
+
+    # Closest points of the lines (s = 0 for parallel lines), then clamped to the segments
+    denom = a * e - b * b
+    s = np.where(denom > eps * a * e, np.clip((b * f - c * e) / np.where(denom > 0, denom, 1.0), 0, 1), 0.0)
+    t = (b * s + f) / safe_e
+    s = np.where(t < 0, np.clip(-c / safe_a, 0, 1), np.where(t > 1, np.clip((b - c) / safe_a, 0, 1), s))
+    t = np.clip(t, 0, 1)
+
+    # Segments that are points
+    point2 = e <= eps
+    s = np.where(point2, np.clip(-c / safe_a, 0, 1), s)
+    t = np.where(point2, 0.0, t)
+    point1 = a <= eps
+    s = np.where(point1, 0.0, s)
+    t = np.where(point1, np.where(point2, 0.0, np.clip(f / safe_e, 0, 1)), t)
+    return s, t
+
+
+# Find where the cables of different morphologies (capsules tapering between the radii of their nodes)
+# touch or come closer than gap. The box of each segment, grown by its larger radius and half the gap,
+# is put in a grid (see overlapping_boxes) and only the segments whose boxes overlap are measured,
+# exactly between their centerlines with the radii interpolated at the closest points.
+# Returns a dict of arrays with one entry per pair of segments in contact, closest first:
+#   morphology_a, node_a, morphology_b, node_b   each morphology (a < b) and its row of the node nearest the contact
+#   gap                                          distance between the surfaces (negative where they overlap)
+#   location                                     (n, 3) points midway between the closest points of the centerlines
+def find_contacts(morphologies, gap=0.0):
+    edges = [m.edges() for m in morphologies]
+    row_offsets = np.cumsum([0] + [len(m) for m in morphologies])
+    group = np.concatenate([np.full(len(e), i, dtype=np.int64) for i, e in enumerate(edges)] + [np.zeros(0, dtype=np.int64)])
+    edges = np.concatenate([e + row_offsets[i] for i, e in enumerate(edges)] + [np.zeros((0, 2), dtype=np.int64)])
+    co = np.concatenate([m.co for m in morphologies] + [np.zeros((0, 3))])
+    radius = np.concatenate([m.radius for m in morphologies] + [np.zeros(0)])
+
+    p, q = co[edges[:, 0]], co[edges[:, 1]]
+    rp, rq = radius[edges[:, 0]], radius[edges[:, 1]]
+    grow = (np.maximum(rp, rq) + 0.5 * gap)[:, None]
+    i, j = overlapping_boxes(np.minimum(p, q) - grow, np.maximum(p, q) + grow, group).T
+
+    # Measure the candidate pairs exactly
+    s, t = closest_segment_parameters(p[i], q[i], p[j], q[j])
+    ci = p[i] + s[:, None] * (q[i] - p[i])
+    cj = p[j] + t[:, None] * (q[j] - p[j])
+    surface_gap = (np.linalg.norm(ci - cj, axis=1) - (rp[i] + s * (rq[i] - rp[i])) - (rp[j] + t * (rq[j] - rp[j])))
+
+    close = np.nonzero(surface_gap < gap)[0]
+    close = close[np.argsort(surface_gap[close], kind='stable')]
+    i, j, s, t = i[close], j[close], s[close], t[close]
+    node_a = np.where(s < 0.5, edges[i, 0], edges[i, 1])
+    node_b = np.where(t < 0.5, edges[j, 0], edges[j, 1])
+    return {"morphology_a": group[i],
+            "node_a": node_a - row_offsets[group[i]],
+            "morphology_b": group[j],
+            "node_b": node_b - row_offsets[group[j]],
+            "gap": surface_gap[close],
+            "location": 0.5 * (ci[close] + cj[close])}
+
+
+# Whether each point may lie within gap of a triangulated surface (co, triangles). Every point of a triangle is
+# within its longest edge of each of its corners, so a point farther than gap plus the longest edge from every
+# corner is ruled out, all in one query of the corners' NodeIndex; the others still need an exact distance.
+def points_near_surface(points, co, triangles, gap):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(triangles) == 0:
+        return np.zeros(len(points), dtype=bool)
+    corner = np.asarray(co, dtype=np.float64)[triangles]
+    longest = float(np.linalg.norm(corner - np.roll(corner, 1, axis=1), axis=2).max())
+    corners = np.unique(triangles)
+    return NodeIndex(co[corners]).within(points, gap + longest)
+
+
+#######################################################
+#######################################################
+# Simplification
+#######################################################
+#######################################################
+
+# Lay out every section as a chain of rows headed by the node it hangs from (its anchor), if any, so that
+# the edges of a section are between consecutive rows of its chain. Returns the rows of all the chains
+# concatenated, the offset of each chain, the chain of each position and the positions of the anchors.
+# Chains are in the order of the sections.
+def section_chains(topology):
+    section_length = np.diff(topology.section_offsets)
+    has_anchor = topology.section_parent >= 0
+    chain_length = section_length + has_anchor
+    chain_offsets = np.cumsum(chain_length) - chain_length
+    chain_rows = np.empty(chain_length.sum(), dtype=np.int64)
+    section = topology.section_of
+    node_pos = chain_offsets[section] + has_anchor[section] + topology.preorder_position - topology.section_offsets[section]
+    chain_rows[node_pos] = np.arange(len(topology))
+    anchor_sections = np.nonzero(has_anchor)[0]
+    anchor_pos = chain_offsets[anchor_sections]
+    chain_rows[anchor_pos] = topology.parent[topology.section_nodes[topology.section_offsets[anchor_sections]]]
+    chain_of = np.repeat(np.arange(len(chain_length)), chain_length)
+    return chain_rows, chain_offsets, chain_of, anchor_pos
+
+
+# Nodes that simplification and resampling always keep: roots, branch points, tips and soma nodes (type 1)
+def fixed_nodes(morphology, topology):
+    return (topology.parent < 0) | (topology.num_children != 1) | (morphology.segment_type == 1)
+
+
+# Runs (a, b) between consecutive kept positions of the same chain
+def chain_runs(keep, chain_of):
+    kept_pos = np.nonzero(keep)[0]
+    same_chain = chain_of[kept_pos[:-1]] == chain_of[kept_pos[1:]]
+    return kept_pos[:-1][same_chain], kept_pos[1:][same_chain]
+
+
+# Simplify every unbranched section with the Douglas-Peucker algorithm on both position and radius:
+# between two kept nodes, the node that strays furthest from the straight line joining them is kept
+# (and the two halves are split again) as long as it is more than position_tolerance from that line,
+# or its radius is more than radius_tolerance from the radius interpolated along it.
+# Roots, branch points, tips and soma nodes (type 1) are always kept. All the sections are split
+# together, one level of the recursion per pass. Returns the simplified Morphology and the number of nodes removed.
+def simplify_sections(morphology, position_tolerance, radius_tolerance):
+    n = len(morphology)
+    topology = morphology.topology()
+    parent = topology.parent
+
+    # Nodes that always stay: every chain starts and ends with one
+    chain_rows, chain_offsets, chain_of, anchor_pos = section_chains(topology)
+    keep = fixed_nodes(morphology, topology)[chain_rows]
+    keep[anchor_pos] = True
+
+    # Start with the runs between consecutive fixed nodes of each chain
+    a, b = chain_runs(keep, chain_of)
+
+    co = morphology.co[chain_rows]
+    radius = morphology.radius[chain_rows]
+    position_tolerance = max(position_tolerance, 1e-12)
+    radius_tolerance = max(radius_tolerance, 1e-12)
+    while True:
+        split = b - a >= 2
+        a, b = a[split], b[split]
+        if len(a) == 0:
+            break
+
+        # How far each node between a and b strays from the line from a to b, relative to the tolerances
+        inner = b - a - 1
+        run = np.repeat(np.arange(len(a)), inner)
+        k = concatenate_ranges(a + 1, b)
+        start, end = co[a[run]], co[b[run]]
+        direction = end - start
+        length2 = (direction * direction).sum(axis=1)
+        t = np.clip(np.divide(((co[k] - start) * direction).sum(axis=1), length2, out=np.zeros(len(k)), where=length2 > 0), 0, 1)
+        distance = np.linalg.norm(start + t[:, None] * direction - co[k], axis=1)
+        radius_error = np.abs(radius[a[run]] + t * (radius[b[run]] - radius[a[run]]) - radius[k])
+        error = np.maximum(distance / position_tolerance, radius_error / radius_tolerance)
+
+        # Keep the worst node of each run that is out of tolerance, and split the run there
+        worst = np.maximum.reduceat(error, np.cumsum(inner) - inner)
+        out = worst > 1
+        candidates = np.nonzero((error == worst[run]) & out[run])[0]
+        runs, first = np.unique(run[candidates], return_index=True)
+        m = k[candidates[first]]
+        keep[m] = True
+        a, b = np.concatenate((a[runs], m)), np.concatenate((m, b[runs]))
+
+    # Each kept node hangs from its nearest kept ancestor
+    node_keep = np.zeros(n, dtype=bool)
+    node_keep[chain_rows[keep]] = True
+    nearest_kept = follow_links(np.where(node_keep, -1, parent))[1]
+    parent_index = morphology.parent_index.copy()
+    has_parent = parent >= 0
+    parent_index[has_parent] = morphology.index_number[nearest_kept[parent[has_parent]]]
+
+    simplified = Morphology(morphology.index_number[node_keep], morphology.segment_type[node_keep],
+                            morphology.co[node_keep], morphology.radius[node_keep], parent_index[node_keep])
+    return simplified, n - len(simplified)
+
+
+#######################################################
+#######################################################
+# Resampling
+#######################################################
+#######################################################
+
+# Re-discretize every unbranched section at a target spacing, interpolating position and radius.
+# Between consecutive fixed nodes (roots, branch points, tips and soma nodes, which are kept as they are)
+# the path is cut into the whole number of equal steps closest to its length over the spacing.
+# With radius_factor > 0 the spacing follows the radius: it is radius_factor * radius wherever that is
+# larger than spacing, so thick stretches get fewer nodes. New nodes get index numbers above the
+# existing ones and the type of the node they replace. Returns the resampled Morphology.
+def resample_sections(morphology, spacing, radius_factor=0.0):
+    topology = morphology.topology()
+    chain_rows, chain_offsets, chain_of, anchor_pos = section_chains(topology)
+    keep = fixed_nodes(morphology, topology)[chain_rows]
+    keep[anchor_pos] = True
+    a, b = chain_runs(keep, chain_of)
+
+    # Distance along the chains in units of the local spacing (trapezoid rule between nodes)
+    co = morphology.co[chain_rows]
+    radius = morphology.radius[chain_rows]
+    local_spacing = np.full(len(chain_rows), max(spacing, 1e-12))
+    if radius_factor > 0:
+        local_spacing = np.maximum(local_spacing, radius_factor * radius)
+    step = np.zeros(len(chain_rows))
+    step[1:] = np.linalg.norm(co[1:] - co[:-1], axis=1) * (1 / local_spacing[1:] + 1 / local_spacing[:-1]) / 2
+    step[chain_offsets] = 0
+    u = np.cumsum(step)
+
+    # Number of steps of each run, and where its new nodes fall
+    run_length = u[b] - u[a]
+    count = np.maximum(np.rint(run_length), 1).astype(np.int64)
+    num_new = count - 1
+    run = np.repeat(np.arange(len(a)), num_new)
+    j = np.arange(num_new.sum()) - np.repeat(np.cumsum(num_new) - num_new, num_new) + 1
+    target = u[a[run]] + j * run_length[run] / count[run]
+    k = np.clip(np.searchsorted(u, target, side='right'), a[run] + 1, b[run])
+    frac = np.clip(np.divide(target - u[k - 1], u[k] - u[k - 1], out=np.zeros(len(k)), where=u[k] > u[k - 1]), 0, 1)
+
+    new_co = co[k - 1] + frac[:, None] * (co[k] - co[k - 1])
+    new_radius = radius[k - 1] + frac * (radius[k] - radius[k - 1])
+    new_type = morphology.segment_type[chain_rows[k]]
+    first_new_id = morphology.index_number.max() + 1 if len(morphology) > 0 else 1
+    new_id = first_new_id + np.arange(len(run))
+
+    # Each run is a -> new nodes -> b
+    new_parent = np.where(j == 1, morphology.index_number[chain_rows[a[run]]], new_id - 1)
+    parent_index = morphology.parent_index.copy()
+    b_rows = chain_rows[b]
+    last_new = new_id[np.cumsum(num_new) - 1] if len(run) > 0 else np.zeros(len(a), dtype=np.int64)
+    parent_index[b_rows] = np.where(num_new > 0, last_new, morphology.index_number[chain_rows[a]])
+
+    node_keep = np.zeros(len(morphology), dtype=bool)
+    node_keep[chain_rows[keep]] = True
+    return Morphology(np.concatenate((morphology.index_number[node_keep], new_id)),
+                      np.concatenate((morphology.segment_type[node_keep], new_type)),
+                      np.concatenate((morphology.co[node_keep], new_co)),
+                      np.concatenate((morphology.radius[node_keep], new_radius)),
+                      np.concatenate((parent_index[node_keep], new_parent)))
+
+
+#######################################################
+#######################################################
+# Metaball samples
+#######################################################
+#######################################################
+
+# Flatten segments (lists of [x, y, z, r] points, consecutive points connected) into (n, 4) arrays of start and end points
+def segment_point_pairs(segments):
+    starts = []
+    ends = []
+    for seg in segments:
+        for lc, c in zip(seg[:-1], seg[1:]):
+            starts.append(lc[:4])
+            ends.append(c[:4])
+    starts = np.array(starts, dtype=np.float64).reshape(-1, 4)
+    ends = np.array(ends, dtype=np.float64).reshape(-1, 4)
+    return starts, ends
+
+
+# Generate the metaball spheres along every segment: returns an (n, 3) array of centers and an (n,) array of radii.
+# Along a segment of length L from radius r1 to r2, a sphere is placed every half radius:
+#   s[0] = 0,  s[k+1] = s[k] + r(s[k]) / 2,  r(s) = r1 + s * (r2 - r1) / L
+# which is the geometric series s[k] = (r1 / 2) * ((1 + c)^k - 1) / c with c = (r2 - r1) / (2 L),
+# so the sphere count and positions of all segments are computed at once.
+def metaball_samples_from_segments(segments, scale_file_data=1.0, min_forced_radius=0.0, meta_ball_scale_factor=1.0):
+    starts, ends = segment_point_pairs(segments)
+    starts *= scale_file_data
+    ends *= scale_file_data
+
+    p1 = starts[:, :3]
+    p2 = ends[:, :3]
+    segment_length = np.linalg.norm(p2 - p1, axis=1)
+
+    # Be sure that the radii are non-zero
+    r1 = np.maximum(np.maximum(starts[:, 3], segment_length / 1000), min_forced_radius)
+    r2 = np.maximum(np.maximum(ends[:, 3], segment_length / 1000), min_forced_radius)
+
+    # Zero length segments make no spheres
+    keep = segment_length > 0
+    p1, p2, r1, r2, segment_length = p1[keep], p2[keep], r1[keep], r2[keep], segment_length[keep]
+    dr = r2 - r1
+    c = dr / (2 * segment_length)
+    b = r1 / 2
+
+    # Number of spheres on each segment: the number of k with s[k] < L (just one when the first step passes the end)
+    single = b >= segment_length
+    constant = np.abs(c) < 1e-12
+    safe_c = np.where(constant | single, 1.0, c)
+    count = np.where(constant,
+                     segment_length / b,
+                     np.log1p(safe_c * segment_length / b) / np.log1p(safe_c))
+    count = np.where(single, 1, np.maximum(np.ceil(count), 1)).astype(np.int64)
+
+    # Distance along its segment of every sphere
+    seg = np.repeat(np.arange(len(count)), count)
+    k = np.arange(len(seg)) - np.repeat(np.cumsum(count) - count, count)
+    s = np.where(constant[seg],
+                 b[seg] * k,
+                 b[seg] * np.expm1(k * np.log1p(safe_c[seg])) / safe_c[seg])
+
+    # Interpolate the centers and radii
+    t = (s / segment_length[seg])[:, None]
+    co = p1[seg] + t * (p2[seg] - p1[seg])
+    radius = (r1[seg] + s * dr[seg] / segment_length[seg]) * meta_ball_scale_factor
+
+    return co, radius
+
+
+#######################################################
+#######################################################
+# Surface mesh quality
+#######################################################
+#######################################################
+
+# The distinct values of an integer array and how often each occurs, from one sort
+# (np.unique with counts hashes large arrays, which is several times slower)
+def count_keys(keys):
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return keys, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.diff(np.r_[starts, len(keys)])
+
+
+# Check a triangle mesh (an (n, 3) array of vertex positions and an (m, 3) array of vertex numbers) in a few
+# sorts and passes over its arrays. Returns a dict with:
+#   num_vertices, num_triangles, area, volume   totals (the volume is negative if the triangles face inwards)
+#   boundary_edges, non_manifold_edges          (k, 2) arrays of the edges used by one, or by more than two, triangles
+#   flipped_edges                               (k, 2) array of the edges two triangles use in the same direction
+#   degenerate_triangles                        rows of the triangles with (near) zero area
+#   shell_of_triangle                           the shell (connected piece) of each triangle, numbered from 0
+#   shell_size, shell_volume                    the largest extent and the enclosed volume of each shell
+#   small_shells                                shells smaller than min_shell_size
+def mesh_quality(co, triangles, min_shell_size=0.0):
+    co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    n = len(co)
+
+    # Area and signed volume of every triangle
+    v0, v1, v2 = co[triangles[:, 0]], co[triangles[:, 1]], co[triangles[:, 2]]
+    cross = np.cross(v1 - v0, v2 - v0)
+    area = 0.5 * np.linalg.norm(cross, axis=1)
+    signed_volume = (v0 * np.cross(v1, v2)).sum(axis=1) / 6
+    extent = float((co.max(axis=0) - co.min(axis=0)).max()) if n > 0 else 0.0
+    degenerate = np.nonzero((area <= 1e-12 * extent * extent) |
+                            (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) |
+                            (triangles[:, 2] == triangles[:, 0]))[0]
+
+    # Count the uses of every edge, with and without its direction
+    directed = np.stack((triangles, np.roll(triangles, -1, axis=1)), axis=2).reshape(-1, 2)
+    undirected = np.sort(directed, axis=1)
+    edge_keys, edge_count = count_keys(undirected[:, 0] * n + undirected[:, 1])
+    directed_keys, directed_count = count_keys(directed[:, 0] * n + directed[:, 1])
+    flipped = np.unique(np.sort(np.column_stack(divmod(directed_keys[directed_count > 1], n)), axis=1), axis=0)
+    flipped_keys = flipped[:, 0] * n + flipped[:, 1]
+    manifold_keys = edge_keys[edge_count == 2]
+    flipped = flipped[manifold_keys[np.minimum(np.searchsorted(manifold_keys, flipped_keys), len(manifold_keys) - 1)] == flipped_keys
+                      if len(manifold_keys) > 0 else np.zeros(len(flipped), dtype=bool)]
+
+    # Shells are the pieces connected through the edges, numbered in the order of their lowest vertex
+    is_used = np.zeros(n, dtype=bool)
+    is_used[triangles.ravel()] = True
+    used = np.nonzero(is_used)[0]
+    vertex_shell = group_labels(n, np.column_stack(divmod(edge_keys, n)))
+    shell_number = np.cumsum(vertex_shell == np.arange(n)) - 1
+    shell_of_vertex = shell_number[vertex_shell[used]]
+    shell_of_triangle = shell_number[vertex_shell[triangles[:, 0]]]
+    num_shells = int(shell_number[used[-1]] + 1) if len(used) > 0 else 0
+
+    # Extent of each shell from the bounds of its vertices
+    order = np.argsort(shell_of_vertex, kind='stable')
+    starts = np.searchsorted(shell_of_vertex[order], np.arange(num_shells))
+    shell_co = co[used[order]]
+    shell_size = ((np.maximum.reduceat(shell_co, starts, axis=0) - np.minimum.reduceat(shell_co, starts, axis=0)).max(axis=1)
+                  if num_shells > 0 else np.zeros(0))
+    shell_volume = np.bincount(shell_of_triangle, weights=signed_volume, minlength=num_shells)
+
+    return {"num_vertices": n,
+            "num_triangles": len(triangles),
+            "area": float(area.sum()),
+            "volume": float(signed_volume.sum()),
+            "boundary_edges": np.column_stack(divmod(edge_keys[edge_count == 1], n)),
+            "non_manifold_edges": np.column_stack(divmod(edge_keys[edge_count > 2], n)),
+            "flipped_edges": flipped,
+            "degenerate_triangles": degenerate,
+            "shell_of_triangle": shell_of_triangle,
+            "shell_size": shell_size,
+            "shell_volume": shell_volume,
+            "small_shells": np.nonzero(shell_size < min_shell_size)[0]}
+
+
+# The checks of mesh_quality that find problems, with their descriptions
+MESH_QUALITY_PROBLEMS = [("boundary_edges", "edges on a hole (not watertight)"),
+                         ("non_manifold_edges", "non-manifold edges"),
+                         ("flipped_edges", "edges between triangles facing opposite ways"),
+                         ("degenerate_triangles", "degenerate triangles"),
+                         ("small_shells", "shells smaller than the mesh resolution")]
+
+
+# Describe the checks of mesh_quality in lines, comparing the area and volume with the cable estimates (if given)
+def describe_mesh_quality(quality, cable_area=None, cable_volume=None):
+    lines = ["%d vertices, %d triangles in %d shells" % (quality["num_vertices"], quality["num_triangles"], len(quality["shell_size"])),
+             "Area %g, volume %g" % (quality["area"], abs(quality["volume"]))]
+    if cable_area is not None and cable_area > 0:
+        lines.append("Area is %.2f times the cable estimate of %g" % (quality["area"] / cable_area, cable_area))
+    if cable_volume is not None and cable_volume > 0:
+        lines.append("Volume is %.2f times the cable estimate of %g" % (abs(quality["volume"]) / cable_volume, cable_volume))
+    for key, description in MESH_QUALITY_PROBLEMS:
+        if len(quality[key]) > 0:
+            lines.append("%d %s" % (len(quality[key]), description))
+    if quality["volume"] < 0:
+        lines.append("Triangles face inwards (negative volume)")
+    return lines
+
+
+#######################################################
+#######################################################
+# Surface mesh decimation
+#######################################################
+#######################################################
+
+# Bands of edge cost (length over limit) whose edges are collapsed in random order
+DECIMATE_COST_BANDS = 4
+
+# Passes picking edges in each round: the last passes of a round find few edges, which the next round picks up
+DECIMATE_PASSES = 8
+
+# Smallest cosine of the angle a triangle's normal may turn by in a collapse (about 78 degrees)
+DECIMATE_MIN_NORMAL_COSINE = 0.2
+
+
+# Radius of the neuron near each of the points: the radius of the nearest metaball sample,
+# the sphere the surface around the point was made from (inf when there are no samples)
+def local_radius(points, sample_co, sample_radius):
+    if len(sample_co) == 0:
+        return np.full(len(points), np.inf)
+    index = NodeIndex(sample_co, cell_size=max(float(np.median(sample_radius)), 1e-12))
+    rows, distance = index.nearest_rows(points)
+    return np.asarray(sample_radius, dtype=np.float64)[rows]
+
+
+# Error quadric of every vertex: the sum over its triangles of the squared distance to their planes,
+# stored as the 10 distinct terms of the symmetric 4x4 matrix (aa, ab, ac, ad, bb, bc, bd, cc, cd, dd)
+def vertex_quadrics(co, triangles):
+    v0, v1, v2 = co[triangles[:, 0]], co[triangles[:, 1]], co[triangles[:, 2]]
+    normal = np.cross(v1 - v0, v2 - v0)
+    length = np.linalg.norm(normal, axis=1)
+    normal /= np.where(length > 0, length, 1.0)[:, None]
+    plane = np.column_stack((normal, -(normal * v0).sum(axis=1)))
+    terms = np.column_stack([plane[:, i] * plane[:, j] for i in range(4) for j in range(i, 4)])
+    corner = triangles.ravel()
+    return np.column_stack([np.bincount(corner, weights=np.repeat(terms[:, k], 3), minlength=len(co))
+                            for k in range(10)])
+
+
+# Squared distance error of placing vertices with quadrics q at the points x
+def quadric_error(q, x):
+    aa, ab, ac, ad, bb, bc, bd, cc, cd, dd = q.T
+    px, py, pz = x.T
+    return (aa * px * px + bb * py * py + cc * pz * pz + 2 * (ab * px * py + ac * px * pz + bc * py * pz) +
+            2 * (ad * px + bd * py + cd * pz) + dd)
+
+
+# Edges (a, b) of a triangle mesh that can all be collapsed at once, and the positions of the merged vertices.
+# An edge can be collapsed when it is shorter than the limit of both of its vertices and:
+#   - it is used by exactly two triangles, and a and b share exactly their two opposite vertices (the link
+#     condition), which both keep more than 3 edges, so the mesh stays manifold and watertight
+#   - the merged vertex, placed at a, b or their midpoint (whichever fits the error quadrics best), is within
+#     max_error of the original surface and makes no edge longer than the limits of its neighbors
+#   - no triangle around it turns its normal by more than acos(DECIMATE_MIN_NORMAL_COSINE)
+# No two of the edges returned touch the same triangle. They are picked in passes over the short edges in order
+# of cost (length over limit) in a few bands, random within a band: each pass takes the edges that come before
+# every other edge touching their triangles, checks them, and rules out the edges next to the ones that passed.
+# The edges still left after DECIMATE_PASSES passes wait for the next round.
+def collapsible_edges(co, triangles, limit, quadric, max_error):
+    n = len(co)
+
+    # Every edge with the vertices opposite it in its triangles
+    start = triangles.ravel()
+    end = triangles[:, [1, 2, 0]].ravel()
+    opposite = triangles[:, [2, 0, 1]].ravel()
+    keys = np.minimum(start, end) * n + np.maximum(start, end)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    count = np.diff(np.r_[first, len(keys)])
+    edge_keys = keys[first]
+    u, v = np.divmod(edge_keys, n)
+
+    # Vertices on holes or non-manifold edges stay where they are
+    frozen = np.zeros(n, dtype=bool)
+    frozen[u[count != 2]] = True
+    frozen[v[count != 2]] = True
+    degree = np.bincount(np.r_[u, v], minlength=n)
+
+    # Short manifold edges, in the order they are tried
+    manifold = np.nonzero(count == 2)[0]
+    a, b = u[manifold], v[manifold]
+    c, d = opposite[order[first[manifold]]], opposite[order[first[manifold] + 1]]
+    length = np.linalg.norm(co[a] - co[b], axis=1)
+    allowed = np.minimum(limit[a], limit[b])
+    keep = np.nonzero((length < allowed) & ~frozen[a] & ~frozen[b] & (c != d) & (degree[c] > 3) & (degree[d] > 3))[0]
+    a, b, allowed = a[keep], b[keep], allowed[keep]
+    cost = length[keep] / allowed
+    order = np.lexsort((np.random.default_rng(len(a)).random(len(a)), np.floor(cost * DECIMATE_COST_BANDS)))
+    a, b, allowed = a[order], b[order], allowed[order]
+
+    # Neighbors and triangles of every vertex
+    ends = np.r_[u, v]
+    neighbor_order = np.argsort(ends, kind='stable')
+    neighbor_start = np.searchsorted(ends[neighbor_order], np.arange(n + 1))
+    neighbor = np.r_[v, u][neighbor_order]
+    corner_order = np.argsort(start, kind='stable')
+    triangle_start = np.searchsorted(start[corner_order], np.arange(n + 1))
+    triangle_of_corner = corner_order // 3
+
+    # Check the collapse of the edges (ea, eb): returns which can go, and where the merged vertices go
+    def check(ea, eb, eallowed):
+        m = len(ea)
+
+        # Place the merged vertex where it fits the surface best
+        q = quadric[ea] + quadric[eb]
+        places = np.stack((co[ea], co[eb], (co[ea] + co[eb]) / 2))
+        errors = np.stack([quadric_error(q, p) for p in places])
+        best = np.argmin(errors, axis=0)
+        p = places[best, np.arange(m)]
+        ok = errors[best, np.arange(m)] <= np.minimum(max_error[ea], max_error[eb]) ** 2
+
+        # The neighbors of a and of b: exactly two shared, and all close enough to the merged vertex
+        ends = np.r_[ea, eb]
+        num = neighbor_start[ends + 1] - neighbor_start[ends]
+        owner = np.repeat(np.r_[np.arange(m), np.arange(m)], num)
+        x = neighbor[concatenate_ranges(neighbor_start[ends], neighbor_start[ends + 1])]
+        other = np.repeat(np.r_[eb, ea], num)
+        other_keys = np.minimum(x, other) * n + np.maximum(x, other)
+        pos = np.minimum(np.searchsorted(edge_keys, other_keys), len(edge_keys) - 1)
+        shared = (edge_keys[pos] == other_keys) & (x != other)
+        ok &= np.bincount(owner, weights=shared, minlength=m) == 4
+        too_long = (x != other) & (np.linalg.norm(p[owner] - co[x], axis=1) > np.minimum(eallowed[owner], limit[x]))
+        ok &= np.bincount(owner, weights=too_long, minlength=m) == 0
+
+        # The triangles around a and b that remain must not flip
+        num = triangle_start[ends + 1] - triangle_start[ends]
+        owner = np.repeat(np.r_[np.arange(m), np.arange(m)], num)
+        moved = np.repeat(ends, num)
+        corners = triangles[triangle_of_corner[concatenate_ranges(triangle_start[ends], triangle_start[ends + 1])]]
+        remains = ~((corners == ea[owner][:, None]).any(axis=1) & (corners == eb[owner][:, None]).any(axis=1))
+        owner, moved, corners = owner[remains], moved[remains], corners[remains]
+        before = co[corners]
+        after = np.where((corners == moved[:, None])[:, :, None], p[owner][:, None, :], before)
+        n0 = np.cross(before[:, 1] - before[:, 0], before[:, 2] - before[:, 0])
+        n1 = np.cross(after[:, 1] - after[:, 0], after[:, 2] - after[:, 0])
+        flips = (n0 * n1).sum(axis=1) <= DECIMATE_MIN_NORMAL_COSINE * np.linalg.norm(n0, axis=1) * np.linalg.norm(n1, axis=1)
+        ok &= np.bincount(owner, weights=flips, minlength=m) == 0
+        return ok, p
+
+    alive = np.ones(len(a), dtype=bool)
+    chosen = np.zeros(len(a), dtype=bool)
+    position = np.zeros((len(a), 3))
+    for i_pass in range(DECIMATE_PASSES):
+        if not alive.any():
+            break
+
+        # The edges that come before every other live edge touching their triangles
+        live = np.nonzero(alive)[0]
+        vertex_rank = np.full(n, len(a))
+        np.minimum.at(vertex_rank, a[live], live)
+        np.minimum.at(vertex_rank, b[live], live)
+        claim = np.full(n, len(a))
+        np.minimum.at(claim, start, np.repeat(vertex_rank[triangles].min(axis=1), 3))
+        win = live[(claim[a[live]] == live) & (claim[b[live]] == live)]
+
+        ok, position[win] = check(a[win], b[win], allowed[win])
+        alive[win] = False
+        win = win[ok]
+        chosen[win] = True
+
+        # Rule out the edges touching the triangles of the collapses
+        taken = np.zeros(n, dtype=bool)
+        taken[a[win]] = True
+        taken[b[win]] = True
+        near = np.zeros(n, dtype=bool)
+        near[triangles[taken[triangles].any(axis=1)].ravel()] = True
+        alive &= ~near[a] & ~near[b]
+
+    return a[chosen], b[chosen], position[chosen]
+
+
+# Decimate a closed triangle mesh by collapsing edges in rounds of independent collapses, each round a few
+# passes over the arrays, until it has at most target_triangles triangles (0 for no target) or no edge can go.
+# radius is the radius of the neuron near each vertex (see local_radius): no collapse makes an edge longer
+# than radius_factor * radius or target_edge_length, or moves the surface by more than max_error * radius,
+# and vertices where the radius is below min_radius are kept, so thin processes keep their shape.
+# Holes and non-manifold edges are left as they are. Returns the new vertex positions and triangles.
+def decimate_mesh(co, triangles, radius, target_triangles=0, target_edge_length=np.inf, radius_factor=1.0,
+                  min_radius=0.0, max_error=0.1, max_rounds=200):
+    co = np.array(co, dtype=np.float64).reshape(-1, 3)
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+    radius = np.array(radius, dtype=np.float64)
+    n = len(co)
+
+    limit = np.minimum(radius_factor * radius, target_edge_length)
+    limit[radius < min_radius] = 0.0
+    error = max_error * radius
+    quadric = vertex_quadrics(co, triangles)
+
+    for i_round in range(max_rounds):
+        excess = len(triangles) - target_triangles if target_triangles > 0 else len(triangles)
+        if excess <= 0:
+            break
+        a, b, position = collapsible_edges(co, triangles, limit, quadric, error)
+        if len(a) == 0:
+            break
+
+        # Each collapse removes two triangles
+        if target_triangles > 0:
+            a, b, position = a[:(excess + 1) // 2], b[:(excess + 1) // 2], position[:(excess + 1) // 2]
+
+        # Merge b into a
+        co[a] = position
+        quadric[a] += quadric[b]
+        limit[a] = np.minimum(limit[a], limit[b])
+        error[a] = np.minimum(error[a], error[b])
+        merged = np.arange(n)
+        merged[b] = a
+        triangles = merged[triangles]
+        triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) &
+                              (triangles[:, 2] != triangles[:, 0])]
+
+    # Drop the vertices that were merged away
+    used = np.zeros(n, dtype=bool)
+    used[triangles.ravel()] = True
+    new_row = np.cumsum(used) - 1
+    return co[used], new_row[triangles]
+
+
+#######################################################
+#######################################################
+# SWC export
+#######################################################
+#######################################################
+
+# Number of SWC lines formatted and written at a time
+SWC_EXPORT_CHUNK_SIZE = 65536
+
+# Format of one SWC line: n T x y z R P (9 significant digits, so float32 values read back exactly)
+SWC_LINE_FORMAT = "%d %d %.9g %.9g %.9g %.9g %d\n"
+
+
+# Apply a 4x4 transformation matrix to an (n, 3) array of points in one multiply
+def transform_points(mat, co):
+    mat = np.asarray(mat, dtype=np.float64)
+    return np.asarray(co, dtype=np.float64) @ mat[:3, :3].T + mat[:3, 3]
+
+
+# Stream SWC rows (already in output order) to a file, formatting one chunk at a time
+def write_swc(fpath, index_number, segment_type, co, radius, parent_index, chunk_size=SWC_EXPORT_CHUNK_SIZE):
+    rows = np.column_stack((index_number, segment_type, co, radius, parent_index)).astype(np.float64)
+    with open(fpath, "w") as f:
+        f.write("# n T x y z R P\n")
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            f.write((SWC_LINE_FORMAT * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+#######################################################
+#######################################################
+# Surface mesh export
+#######################################################
+#######################################################
+
+# Number of vertices or triangles converted and written at a time
+MESH_EXPORT_CHUNK_SIZE = 1 << 20
+
+# Binary STL triangle: normal, three corners and an attribute byte count
+STL_TRIANGLE_DTYPE = np.dtype([("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attribute", "<u2")])
+
+# Binary PLY face: the vertex count (always 3) and the vertex numbers
+PLY_FACE_DTYPE = np.dtype([("count", "u1"), ("vertices", "<i4", 3)])
+
+
+# Write an array to a binary file one chunk of rows at a time, converting each chunk with convert(chunk)
+def write_chunks(f, rows, convert, chunk_size=MESH_EXPORT_CHUNK_SIZE):
+    for start in range(0, len(rows), chunk_size):
+        f.write(convert(rows[start:start + chunk_size]).tobytes())
+
+
+# Write text lines, each formatted from one row of an array, one chunk of rows at a time
+def write_text_chunks(f, line_format, rows, chunk_size=MESH_EXPORT_CHUNK_SIZE):
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        f.write((line_format * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+# Write a triangle mesh (an (n, 3) array of vertex positions and an (m, 3) array of vertex numbers) as binary little endian PLY
+def write_ply(fpath, co, triangles, name="mesh"):
+    with open(fpath, "wb") as f:
+        f.write(("ply\nformat binary_little_endian 1.0\ncomment %s\n"
+                 "element vertex %d\nproperty float x\nproperty float y\nproperty float z\n"
+                 "element face %d\nproperty list uchar int vertex_indices\nend_header\n"
+                 % (name, len(co), len(triangles))).encode("ascii"))
+        write_chunks(f, co, lambda chunk: np.ascontiguousarray(chunk, dtype="<f4"))
+
+        def faces(chunk):
+            rows = np.empty(len(chunk), dtype=PLY_FACE_DTYPE)
+            rows["count"] = 3
+            rows["vertices"] = chunk
+            return rows
+        write_chunks(f, triangles, faces)
+
+
+# Write a triangle mesh as binary STL, with the normal of each triangle computed from its corners
+def write_stl(fpath, co, triangles, name="mesh"):
+    co = np.asarray(co, dtype=np.float32)
+    with open(fpath, "wb") as f:
+        f.write(name.encode("ascii", "replace")[:80].ljust(80, b" "))
+        f.write(np.uint32(len(triangles)).astype("<u4").tobytes())
+
+        def facets(chunk):
+            rows = np.zeros(len(chunk), dtype=STL_TRIANGLE_DTYPE)
+            corners = co[chunk]
+            normal = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            length = np.linalg.norm(normal, axis=1)
+            rows["normal"] = normal / np.where(length > 0, length, 1)[:, None]
+            rows["corners"] = corners
+            return rows
+        write_chunks(f, triangles, facets)
+
+
+# Write a triangle mesh as a Wavefront OBJ file
+def write_obj(fpath, co, triangles, name="mesh"):
+    with open(fpath, "w") as f:
+        f.write("o %s\n" % name)
+        write_text_chunks(f, "v %.7g %.7g %.7g\n", np.asarray(co, dtype=np.float64))
+        write_text_chunks(f, "f %d %d %d\n", np.asarray(triangles, dtype=np.int64) + 1)
+
+
+# Write a triangle mesh as an MCell MDL polygon list object
+def write_mdl(fpath, co, triangles, name="mesh"):
+    with open(fpath, "w") as f:
+        f.write("%s POLYGON_LIST\n{\n  VERTEX_LIST\n  {\n" % name)
+        write_text_chunks(f, "    [ %.7g, %.7g, %.7g ]\n", np.asarray(co, dtype=np.float64))
+        f.write("  }\n  ELEMENT_CONNECTIONS\n  {\n")
+        write_text_chunks(f, "    [ %d, %d, %d ]\n", np.asarray(triangles, dtype=np.int64))
+        f.write("  }\n}\n")
+
+
+# Surface mesh writers by file suffix
+MESH_WRITERS = {".ply": write_ply, ".stl": write_stl, ".obj": write_obj, ".mdl": write_mdl}
+
+
+# Write a triangle mesh with the writer for the suffix of the file name
+def write_mesh(fpath, co, triangles, name="mesh"):
+    suffix = fpath[fpath.rfind("."):].lower() if "." in basename(fpath) else ""
+    if suffix not in MESH_WRITERS:
+        raise ValueError("Unsupported mesh file type (expected one of %s): %s" % (", ".join(MESH_WRITERS), fpath))
+    MESH_WRITERS[suffix](fpath, co, triangles, name)